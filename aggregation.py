@@ -0,0 +1,94 @@
+"""
+Post-level sentiment from already-scored comments
+
+Every strategy works on the labels and polarities the comments were stored
+with, never on their text, and on many posts at once: items (comments, or a
+tweet and its replies) carry the index of their post and are reduced with
+np.bincount.
+
+Strategies (SENTIMENT_CONFIG['aggregation'] in config.py):
+    majority    most frequent label (ties go to the first in SENTIMENT_ORDER)
+                and mean polarity; what the app always stored
+    mean        mean polarity, labeled with the scorer's ±threshold
+    engagement  like majority, but every item counts 1 + its like count
+"""
+
+import numpy as np
+
+from sentiment import LABEL_DTYPE, SENTIMENT_THRESHOLD
+
+SENTIMENT_ORDER = ('positive', 'negative', 'neutral')
+STRATEGIES = ('majority', 'mean', 'engagement')
+
+try:
+    from config import SENTIMENT_CONFIG
+    STRATEGY = SENTIMENT_CONFIG.get('aggregation', 'majority')
+except ImportError:
+    STRATEGY = 'majority'
+
+
+def label_codes(labels):
+    """Index into SENTIMENT_ORDER of every label; unknown labels count as neutral"""
+    labels = np.asarray(labels)
+    return np.select([labels == label for label in SENTIMENT_ORDER[:-1]], range(len(SENTIMENT_ORDER) - 1),
+                     default=len(SENTIMENT_ORDER) - 1)
+
+
+def aggregate_codes(group_index, codes, polarities, size, strategy=None, engagement=None):
+    """Aggregate label codes and polarities of items into size groups
+
+    group_index holds the group (0..size-1) of every item. Returns
+    (codes, polarities) arrays of length size; groups without items get code
+    -1 and polarity NaN.
+    """
+    strategy = strategy or STRATEGY
+    if strategy not in STRATEGIES:
+        raise ValueError(f"Unknown aggregation strategy {strategy!r}, expected one of {STRATEGIES}")
+    group_index = np.asarray(group_index, dtype=np.int64)
+    codes = np.asarray(codes, dtype=np.int64)
+    polarities = np.asarray(polarities, dtype=np.float64)
+    weights = None
+    if strategy == 'engagement' and engagement is not None:
+        weights = 1.0 + np.maximum(np.asarray(engagement, dtype=np.float64), 0.0)
+
+    totals = np.bincount(group_index, weights=weights, minlength=size)
+    sums = np.bincount(group_index, weights=polarities if weights is None else polarities * weights, minlength=size)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        means = np.where(totals > 0, sums / totals, np.nan)
+
+    if strategy == 'mean':
+        result = np.where(means > SENTIMENT_THRESHOLD, 0, np.where(means < -SENTIMENT_THRESHOLD, 1, 2))
+    else:
+        counts = np.bincount(group_index * len(SENTIMENT_ORDER) + codes, weights=weights,
+                             minlength=size * len(SENTIMENT_ORDER)).reshape(size, len(SENTIMENT_ORDER))
+        result = counts.argmax(axis=1)
+    return np.where(totals > 0, result, -1), means
+
+
+def aggregate(group_index, labels, polarities, size, strategy=None, engagement=None,
+              fallback_labels=None, fallback_polarities=None):
+    """Aggregate item labels and polarities into size groups (posts)
+
+    Returns (labels, polarities) arrays of length size. Groups without items
+    get their fallback label and polarity (usually the post's own score), or
+    neutral and 0.0.
+    """
+    codes, means = aggregate_codes(group_index, label_codes(labels), polarities, size, strategy, engagement)
+    empty = codes < 0
+    labels = np.array(SENTIMENT_ORDER, dtype=LABEL_DTYPE)[np.where(empty, 2, codes)]
+    if fallback_labels is not None:
+        labels = np.where(empty, np.asarray(fallback_labels, dtype=LABEL_DTYPE), labels)
+    fallback = 0.0 if fallback_polarities is None else np.asarray(fallback_polarities, dtype=np.float64)
+    return labels, np.where(empty, fallback, means)
+
+
+def aggregate_post(labels, polarities, strategy=None, engagement=None, fallback=('neutral', 0.0)):
+    """(label, polarity) of one post from the labels and polarities of its items
+
+    Returns fallback when there are no items.
+    """
+    if len(labels) == 0:
+        return fallback
+    overall_labels, overall_polarities = aggregate(np.zeros(len(labels), dtype=np.int64), labels, polarities, 1,
+                                                   strategy, engagement)
+    return str(overall_labels[0]), float(overall_polarities[0])
@@ -1,13 +1,16 @@
-from flask import Flask, render_template, request, redirect, url_for, flash, session, send_file
+from flask import Flask, render_template, request, redirect, url_for, flash, session, send_file, jsonify
 
 from config import INSTAGRAM_ACCESS_TOKEN, INSTAGRAM_USER_ID
 from instagram_api import get_hashtag_id, fetch_recent_posts, fetch_post_comments
-from sentiment import analyze_sentiment
-from models import db, Post, User, Comment
+from sentiment import (analyze, analyze_sentiment_batch, get_cache_stats,
+                       get_cascade_stats, get_lexicons, get_profile_stats, reload_lexicons, scorer_version)
+from models import db, Post, User, Comment, add_missing_columns
+from aggregation import aggregate, aggregate_post
 from tiktok_api import search_tiktok_hashtag, TikTokAPI
 from twitter_api import search_twitter_hashtag, fetch_tweet_comments
 import os
-from functools import wraps
+import re
+from functools import lru_cache, wraps
 from collections import defaultdict
 import calendar
 from datetime import datetime, timedelta
@@ -40,6 +43,23 @@ app.config['SESSION_PERMANENT'] = True
 print(f"DEBUG: Flask app created")
 print(f"DEBUG: Secret key set: {app.secret_key[:20]}...")
 
+# Arabic letters; only text containing them needs reshaping for display
+ARABIC_LETTERS = re.compile('[\u0600-\u06ff\u0750-\u077f\u08a0-\u08ff\ufb50-\ufdff\ufe70-\ufeff]')
+
+@app.template_filter('arabic_display')
+@lru_cache(maxsize=4096)
+def arabic_display(text):
+    """Reshape and reorder Arabic text into visual order for renderers without bidi support
+    
+    Browsers shape Arabic themselves; ReportLab PDFs do not. Sentiment scoring
+    always uses the logical-order text, so this only runs when rendering.
+    """
+    if not text or not ARABIC_LETTERS.search(text):
+        return text
+    import arabic_reshaper
+    from bidi.algorithm import get_display
+    return get_display(arabic_reshaper.reshape(text))
+
 # Global storage for Twitter results (temporary solution)
 twitter_results_storage = {}
 
@@ -103,6 +123,7 @@ db.init_app(app)
 # Create tables and initial admin user when the app starts
 with app.app_context():
     db.create_all()
+    add_missing_columns(db.engine)
     
     # Create initial admin user if it doesn't exist
     admin_user = User.query.filter_by(username=ADMIN_USERNAME).first()
@@ -250,6 +271,43 @@ def admin_users():
     users = User.query.order_by(User.created_at.desc()).all()
     return render_template('admin_users.html', users=users)
 
+@app.route('/admin/metrics/sentiment')
+@admin_required
+def sentiment_metrics():
+    """Per-stage sentiment timings, score cache and cascade counters of this worker process, as JSON
+    
+    Stage timings are collected when SENTIMENT_CONFIG['profiling'] is enabled.
+    """
+    return jsonify({
+        'pid': os.getpid(),
+        'profile': get_profile_stats(),
+        'cache': get_cache_stats(),
+        'cascade': get_cascade_stats(),
+        'lexicons': get_lexicons().info(),
+    })
+
+@app.route('/admin/lexicons/reload', methods=['POST'])
+@admin_required
+def reload_sentiment_lexicons():
+    """Rebuild the sentiment lexicons from their data file and swap them in, without a restart
+    
+    Requests being scored meanwhile finish on the previous lexicons. Only
+    this worker reloads at once; the others notice the changed file within
+    SENTIMENT_CONFIG['lexicon_check_interval'] seconds.
+    """
+    start = time.perf_counter()
+    try:
+        previous, lexicons = reload_lexicons()
+    except (OSError, ValueError) as e:
+        return jsonify({'pid': os.getpid(), 'error': str(e), 'lexicons': get_lexicons().info()}), 400
+    return jsonify({
+        'pid': os.getpid(),
+        'previous': previous.info(),
+        'lexicons': lexicons.info(),
+        'scorer_version': scorer_version(),
+        'elapsed_ms': (time.perf_counter() - start) * 1000,
+    })
+
 @app.route('/admin/users/add', methods=['GET', 'POST'])
 @admin_required
 def add_user():
@@ -424,6 +482,11 @@ def dashboard():
         
         total_posts_analyzed = 0
         
+        # New posts with their caption scores, and the post index, label,
+        # polarity and likes of their comments, aggregated once at the end
+        new_posts = []
+        comment_post_index, comment_labels, comment_scores, comment_likes = [], [], [], []
+        
         for hashtag in hashtags:
             if not hashtag:
                 continue
@@ -483,8 +546,15 @@ def dashboard():
                     'comments_count': post.get('comments_count', 0)
                 })
             
+            # Analyze all captions in one batch
+            caption_sentiments, caption_polarities, caption_components, caption_languages = analyze_sentiment_batch(
+                [post.get('caption', '') for post in posts_to_process], components=True, languages=True
+            )
+            caption_sentiments = caption_sentiments.tolist()
+            caption_polarities = caption_polarities.tolist()
+            
             # Process the real Instagram posts
-            for post in posts_to_process:
+            for post_index, post in enumerate(posts_to_process):
                 caption = post.get('caption', '')
                 post_id = post.get('id')
                 created_at = post.get('created_at')
@@ -492,7 +562,8 @@ def dashboard():
                 if not caption or not post_id:
                     continue
                 
-                sentiment, polarity = analyze_sentiment(caption)
+                sentiment = caption_sentiments[post_index]
+                polarity = caption_polarities[post_index]
                 
                 # Check if post already exists
                 existing = Post.query.filter_by(post_id=post_id).first()
@@ -505,13 +576,16 @@ def dashboard():
                         hashtag=hashtag,
                         created_at=created_at,
                         source='instagram',
+                        detected_language=caption_languages[post_index],
                         media_url=post.get('media_url', ''),
                         permalink=post.get('permalink', ''),
                         like_count=post.get('like_count', 0),
                         comments_count=post.get('comments_count', 0)
                     )
+                    new_post.set_components(caption_components[post_index])
                     db.session.add(new_post)
                     db.session.flush()  # Get the ID of the new post
+                    new_posts.append((new_post, sentiment, polarity))
                     
                     # Fetch and analyze comments for this post
                     try:
@@ -519,49 +593,37 @@ def dashboard():
                         comments_data = fetch_post_comments(post_id, INSTAGRAM_USER_ID, INSTAGRAM_ACCESS_TOKEN)
                         
                         if comments_data:
-                            comment_sentiments = []
-                            comment_polarities = []
+                            comments_data = [
+                                comment_data for comment_data in comments_data
+                                if comment_data.get('text', '') and len(comment_data.get('text', '').strip()) > 0
+                            ]
+                            comment_texts = [comment_data.get('text', '') for comment_data in comments_data]
                             
-                            for comment_data in comments_data:
-                                comment_text = comment_data.get('text', '')
-                                if comment_text and len(comment_text.strip()) > 0:
-                                    comment_sentiment, comment_polarity = analyze_sentiment(comment_text)
-                                    
-                                    # Store comment in database
-                                    new_comment = Comment(
-                                        post_id=new_post.id,
-                                        comment_text=comment_text,
-                                        sentiment=comment_sentiment,
-                                        polarity=comment_polarity
-                                    )
-                                    db.session.add(new_comment)
-                                    
-                                    comment_sentiments.append(comment_sentiment)
-                                    comment_polarities.append(comment_polarity)
+                            # Analyze all comments of the post in one batch
+                            comment_sentiments, comment_polarities, comment_components = analyze_sentiment_batch(
+                                comment_texts, components=True
+                            )
+                            comment_sentiments = comment_sentiments.tolist()
+                            comment_polarities = comment_polarities.tolist()
                             
-                            # Calculate overall sentiment including comments
-                            if comment_sentiments:
-                                # Count sentiment occurrences
-                                sentiment_counts = {'positive': 0, 'negative': 0, 'neutral': 0}
-                                for sent in comment_sentiments:
-                                    sentiment_counts[sent] += 1
-                                
-                                # Determine overall sentiment based on majority
-                                overall_sentiment = max(sentiment_counts, key=sentiment_counts.get)
-                                
-                                # Calculate average polarity
-                                overall_polarity = sum(comment_polarities) / len(comment_polarities)
-                                
-                                # Update post with overall sentiment
-                                new_post.overall_sentiment = overall_sentiment
-                                new_post.overall_polarity = overall_polarity
-                                
-                                print(f"Post {post_id}: Caption sentiment: {sentiment}, Overall sentiment (with {len(comment_sentiments)} comments): {overall_sentiment}")
-                            else:
-                                # No comments, use caption sentiment
-                                new_post.overall_sentiment = sentiment
-                                new_post.overall_polarity = polarity
-                                print(f"Post {post_id}: No comments found, using caption sentiment: {sentiment}")
+                            for comment_text, comment_sentiment, comment_polarity, components in zip(
+                                    comment_texts, comment_sentiments, comment_polarities, comment_components):
+                                # Store comment in database
+                                new_comment = Comment(
+                                    post_id=new_post.id,
+                                    comment_text=comment_text,
+                                    sentiment=comment_sentiment,
+                                    polarity=comment_polarity
+                                )
+                                new_comment.set_components(components)
+                                db.session.add(new_comment)
+                            
+                            # Overall sentiment is aggregated from the comments after the loop
+                            comment_post_index.extend([len(new_posts) - 1] * len(comment_texts))
+                            comment_labels.extend(comment_sentiments)
+                            comment_scores.extend(comment_polarities)
+                            comment_likes.extend(comment_data.get('like_count', 0) or 0 for comment_data in comments_data)
+                            print(f"Post {post_id}: Caption sentiment: {sentiment}, {len(comment_texts)} comments")
                         
                         else:
                             # No comments returned from API, try to add some demo comments for testing
@@ -572,12 +634,14 @@ def dashboard():
                                 "Amazing work, keep it up! 🔥"
                             ]
                             
-                            comment_sentiments = []
-                            comment_polarities = []
+                            comment_sentiments, comment_polarities, comment_components = analyze_sentiment_batch(
+                                demo_comments, components=True
+                            )
+                            comment_sentiments = comment_sentiments.tolist()
+                            comment_polarities = comment_polarities.tolist()
                             
-                            for i, demo_text in enumerate(demo_comments):
-                                comment_sentiment, comment_polarity = analyze_sentiment(demo_text)
-                                
+                            for demo_text, comment_sentiment, comment_polarity, components in zip(
+                                    demo_comments, comment_sentiments, comment_polarities, comment_components):
                                 # Store demo comment in database
                                 new_comment = Comment(
                                     post_id=new_post.id,
@@ -585,33 +649,34 @@ def dashboard():
                                     sentiment=comment_sentiment,
                                     polarity=comment_polarity
                                 )
+                                new_comment.set_components(components)
                                 db.session.add(new_comment)
-                                
-                                comment_sentiments.append(comment_sentiment)
-                                comment_polarities.append(comment_polarity)
                             
-                            # Calculate overall sentiment including demo comments
-                            if comment_sentiments:
-                                sentiment_counts = {'positive': 0, 'negative': 0, 'neutral': 0}
-                                for sent in comment_sentiments:
-                                    sentiment_counts[sent] += 1
-                                
-                                overall_sentiment = max(sentiment_counts, key=sentiment_counts.get)
-                                overall_polarity = sum(comment_polarities) / len(comment_polarities)
-                                
-                                new_post.overall_sentiment = overall_sentiment
-                                new_post.overall_polarity = overall_polarity
-                                
-                                print(f"Post {post_id}: Added {len(demo_comments)} demo comments, overall sentiment: {overall_sentiment}")
+                            comment_post_index.extend([len(new_posts) - 1] * len(demo_comments))
+                            comment_labels.extend(comment_sentiments)
+                            comment_scores.extend(comment_polarities)
+                            comment_likes.extend([0] * len(demo_comments))
+                            print(f"Post {post_id}: Added {len(demo_comments)} demo comments")
                         
                     except Exception as e:
+                        # Posts whose comments failed keep their caption sentiment
                         print(f"Error fetching comments for post {post_id}: {e}")
-                        # Use caption sentiment if comment analysis fails
-                        new_post.overall_sentiment = sentiment
-                        new_post.overall_polarity = polarity
                     
                     total_posts_analyzed += 1
         
+        # Overall sentiment of every new post from its comments, or its caption
+        # sentiment when it has none
+        if new_posts:
+            overall_sentiments, overall_polarities = aggregate(
+                comment_post_index, comment_labels, comment_scores, len(new_posts), engagement=comment_likes,
+                fallback_labels=[sentiment for _, sentiment, _ in new_posts],
+                fallback_polarities=[polarity for _, _, polarity in new_posts]
+            )
+            for (new_post, _, _), overall_sentiment, overall_polarity in zip(
+                    new_posts, overall_sentiments.tolist(), overall_polarities.tolist()):
+                new_post.overall_sentiment = overall_sentiment
+                new_post.overall_polarity = overall_polarity
+        
         db.session.commit()
         # Store the most recent hashtags in the session
         session['last_analyzed_hashtags'] = hashtags
@@ -1057,7 +1122,7 @@ def export_pdf():
             caption = post.caption[:100] + "..." if post.caption and len(post.caption) > 100 else (post.caption or 'N/A')
             table_data.append([
                 post.created_at.strftime('%Y-%m-%d') if post.created_at else 'N/A',
-                caption,
+                arabic_display(caption),
                 post.sentiment.title() if post.sentiment else 'N/A',
                 f"{post.polarity:.2f}" if post.polarity is not None else 'N/A',
                 post.hashtag,
@@ -1256,7 +1321,7 @@ def export_database_pdf(posts, hashtag_filter, platform_filter=''):
             caption = post.caption[:80] + "..." if post.caption and len(post.caption) > 80 else (post.caption or 'N/A')
             table_data.append([
                 str(post.id),
-                caption,
+                arabic_display(caption),
                 post.sentiment.title() if post.sentiment else 'N/A',
                 f"{post.polarity:.2f}" if post.polarity is not None else 'N/A',
                 post.hashtag,
@@ -1419,11 +1484,20 @@ def tiktok_analysis():
             # Process and analyze each video
             total_videos_analyzed = 0
             
-            for video in tiktok_videos:
+            # Analyze all transcripts in one batch
+            (transcript_sentiments, transcript_polarities, transcript_components,
+             transcript_languages) = analyze_sentiment_batch(
+                [video.get('transcript', '') for video in tiktok_videos], components=True, languages=True
+            )
+            transcript_sentiments = transcript_sentiments.tolist()
+            transcript_polarities = transcript_polarities.tolist()
+            
+            for video_index, video in enumerate(tiktok_videos):
                 # Analyze the video transcript
                 transcript = video.get('transcript', '')
                 if transcript:
-                    sentiment, polarity = analyze_sentiment(transcript)
+                    sentiment = transcript_sentiments[video_index]
+                    polarity = transcript_polarities[video_index]
                     
                     # Check if post already exists
                     existing_post = Post.query.filter_by(post_id=video['id']).first()
@@ -1442,9 +1516,11 @@ def tiktok_analysis():
                         video_url=video['video_url'],
                         video_transcript=transcript,
                         video_duration=video['duration'],
+                        detected_language=transcript_languages[video_index],
                         like_count=video['like_count'],
                         comments_count=video['comment_count']
                     )
+                    new_post.set_components(transcript_components[video_index])
                     
                     db.session.add(new_post)
                     total_videos_analyzed += 1
@@ -1523,7 +1599,8 @@ def tiktok_video_analysis():
             transcript = result.get('translated_transcript', result.get('original_transcript', ''))
             
             # Analyze sentiment of the transcript
-            sentiment, polarity = analyze_sentiment(transcript)
+            transcript_result = analyze(transcript)
+            sentiment, polarity = transcript_result.label, transcript_result.polarity
             
             temp_hashtag = f"video_{video_id[:8]}"
             
@@ -1542,6 +1619,7 @@ def tiktok_video_analysis():
                 like_count=0,  # We don't have this info from URL
                 comments_count=0
             )
+            new_post.set_components(transcript_result.components)
             
             # Add to database
             db.session.add(new_post)
@@ -1746,7 +1824,7 @@ def twitter_search():
         
         try:
             from twitter_api import search_twitter_hashtag, fetch_tweet_comments
-            from sentiment import analyze_sentiment
+            from sentiment import analyze
             import time
             
             # COMPLETELY CLEAR ALL TWITTER-RELATED SESSION DATA
@@ -1788,9 +1866,10 @@ def twitter_search():
                     print(f"Processing tweet {i+1}/{max_tweets_to_process}: {tweet['id']}")
                     
                     # Analyze tweet sentiment
-                    sentiment_result = analyze_sentiment(tweet['text'])
-                    tweet['sentiment'] = sentiment_result[0]  # sentiment
-                    tweet['polarity'] = sentiment_result[1]   # polarity
+                    sentiment_result = analyze(tweet['text'])
+                    tweet['sentiment'] = sentiment_result.label
+                    tweet['polarity'] = sentiment_result.polarity
+                    tweet['confidence'] = sentiment_result.confidence
                     tweet['subjectivity'] = 0.0  # subjectivity not available in current sentiment function
                     
                     # Fetch comments for the tweet (reduced to 3 for faster processing)
@@ -1803,21 +1882,24 @@ def twitter_search():
                     # Analyze sentiment for comments (limit to first 2 to save time)
                     for j, comment in enumerate(comments[:2]):
                         try:
-                            comment_sentiment = analyze_sentiment(comment['text'])
-                            comment['sentiment'] = comment_sentiment[0]  # sentiment
-                            comment['polarity'] = comment_sentiment[1]   # polarity
+                            comment_sentiment = analyze(comment['text'])
+                            comment['sentiment'] = comment_sentiment.label
+                            comment['polarity'] = comment_sentiment.polarity
+                            comment['confidence'] = comment_sentiment.confidence
                             comment['subjectivity'] = 0.0  # subjectivity not available
                         except Exception as comment_error:
                             print(f"Error analyzing comment {j+1} sentiment: {comment_error}")
                             comment['sentiment'] = 'neutral'
                             comment['polarity'] = 0.0
+                            comment['confidence'] = 0.0
                             comment['subjectivity'] = 0.0
                     
-                    # Calculate overall sentiment
-                    all_texts = [tweet['text']] + [comment['text'] for comment in comments[:2]]
-                    overall_sentiment = analyze_sentiment(' '.join(all_texts))
-                    tweet['overall_sentiment'] = overall_sentiment[0]  # sentiment
-                    tweet['overall_polarity'] = overall_sentiment[1]   # polarity
+                    # Overall sentiment of the tweet and its analyzed comments
+                    scored = [tweet] + comments[:2]
+                    tweet['overall_sentiment'], tweet['overall_polarity'] = aggregate_post(
+                        [item['sentiment'] for item in scored], [item['polarity'] for item in scored],
+                        engagement=[item.get('like_count', 0) or 0 for item in scored]
+                    )
                     
                     # Save tweet to database
                     try:
@@ -1831,6 +1913,7 @@ def twitter_search():
                                 polarity=tweet['polarity'],
                                 hashtag=hashtag,
                                 source='twitter',
+                                detected_language=sentiment_result.language,
                                 tweet_text=tweet['text'],
                                 author_username=tweet.get('username', 'Unknown'),
                                 like_count=tweet.get('like_count', 0),
@@ -1840,6 +1923,7 @@ def twitter_search():
                                 overall_sentiment=tweet['overall_sentiment'],
                                 overall_polarity=tweet['overall_polarity']
                             )
+                            new_tweet_post.set_components(sentiment_result.components)
                             db.session.add(new_tweet_post)
                             print(f"Saved tweet {tweet['id']} to database")
                         else:
@@ -2027,7 +2111,7 @@ def export_twitter_excel():
         headers = [
             'Tweet ID', 'Author', 'Username', 'Tweet Text', 'Created At', 
             'Likes', 'Retweets', 'Replies', 'Quotes', 'Comments Count',
-            'Sentiment', 'Polarity', 'Subjectivity', 'Overall Sentiment', 
+            'Sentiment', 'Polarity', 'Confidence', 'Subjectivity', 'Overall Sentiment', 
             'Overall Polarity', 'Permalink'
         ]
         
@@ -2051,10 +2135,11 @@ def export_twitter_excel():
             ws.cell(row=row, column=10, value=tweet.get('comments_count', 0))
             ws.cell(row=row, column=11, value=tweet.get('sentiment', ''))
             ws.cell(row=row, column=12, value=tweet.get('polarity', 0))
-            ws.cell(row=row, column=13, value=tweet.get('subjectivity', 0))
-            ws.cell(row=row, column=14, value=tweet.get('overall_sentiment', ''))
-            ws.cell(row=row, column=15, value=tweet.get('overall_polarity', 0))
-            ws.cell(row=row, column=16, value=tweet.get('permalink', ''))
+            ws.cell(row=row, column=13, value=tweet.get('confidence', abs(tweet.get('polarity', 0))))
+            ws.cell(row=row, column=14, value=tweet.get('subjectivity', 0))
+            ws.cell(row=row, column=15, value=tweet.get('overall_sentiment', ''))
+            ws.cell(row=row, column=16, value=tweet.get('overall_polarity', 0))
+            ws.cell(row=row, column=17, value=tweet.get('permalink', ''))
         
         # Auto-adjust column widths
         for column in ws.columns:
@@ -2148,7 +2233,7 @@ def export_twitter_pdf():
             tweet_text = tweet.get('text', '')[:100] + '...' if len(tweet.get('text', '')) > 100 else tweet.get('text', '')
             tweets_data.append([
                 tweet.get('username', ''),
-                tweet_text,
+                arabic_display(tweet_text),
                 str(tweet.get('like_count', 0)),
                 str(tweet.get('comments_count', 0)),
                 tweet.get('overall_sentiment', '')
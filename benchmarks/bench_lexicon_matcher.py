@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark: keyword lexicon matching cost per text vs lexicon size
+
+Compares the old per-entry substring scan (``word in text_lower`` for every
+lexicon entry), an Aho-Corasick LexiconMatcher (the matcher sentiment.py used
+before keywords were looked up per token), and the TokenLexicon hash lookups
+over word tokens that sentiment.py now uses. Texts are tokenized
+outside the timing for TokenLexicon, as preprocess() already does it.
+"""
+
+import os
+import random
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sentiment import (  # noqa: E402
+    ARABIC_NEGATIVE_WORDS,
+    ARABIC_POSITIVE_WORDS,
+    PROMOTIONAL_INDICATORS,
+    TokenLexicon,
+    preprocess,
+)
+
+SAMPLE_TEXTS = [
+    "Amazing new technology! This is incredible! 🚀 #innovation",
+    "This is really frustrating, nothing is working 😤",
+    "MTC يقدم خدمات رائعة في التحول الرقمي! 🚀 #تحول_رقمي #تقنية",
+    "الخدمة سيئة ومخيب للأمل، هذا مثير للاشمئزاز",
+    "The fastest broadband wifi deal in town, great service!",
+]
+
+
+class LexiconMatcher:
+    """Aho-Corasick automaton that finds every lexicon entry in a text in one pass.
+
+    Entries are matched as substrings (overlapping matches and multi-word
+    phrases included), so results are the same as checking ``entry in text``
+    for each entry, but the cost per text depends on the text length only.
+    """
+
+    def __init__(self, patterns):
+        self._goto = [{}]
+        self._fail = [0]
+        self._output = [frozenset()]
+
+        # Build the trie
+        for pattern in patterns:
+            if not pattern:
+                continue
+            state = 0
+            for char in pattern:
+                next_state = self._goto[state].get(char)
+                if next_state is None:
+                    next_state = len(self._goto)
+                    self._goto[state][char] = next_state
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._output.append(frozenset())
+                state = next_state
+            self._output[state] = self._output[state] | {pattern}
+
+        # Breadth-first pass to compute failure links and merge outputs
+        queue = list(self._goto[0].values())
+        for state in queue:
+            for char, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fallback = self._fail[state]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                self._fail[next_state] = self._goto[fallback].get(char, 0)
+                self._output[next_state] = self._output[next_state] | self._output[self._fail[next_state]]
+
+    def find(self, text):
+        """Return the set of patterns that occur anywhere in text"""
+        goto = self._goto
+        fail = self._fail
+        output = self._output
+        found = set()
+        state = 0
+        for char in text:
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            if output[state]:
+                found.update(output[state])
+        return found
+
+
+def synthetic_words(count, seed=0):
+    """Generate lexicon entries that never occur in the sample texts"""
+    rnd = random.Random(seed)
+    alphabet = 'qxzjvkw'
+    return {''.join(rnd.choice(alphabet) for _ in range(rnd.randint(4, 10))) for _ in range(count)}
+
+
+def naive_scan(lexicon, texts):
+    for text in texts:
+        text_lower = text.lower()
+        sum(1 for word in lexicon if word.lower() in text_lower)
+
+
+def matcher_scan(matcher, texts):
+    for text in texts:
+        matcher.find(text.lower())
+
+
+def token_scan(lexicon, word_lists):
+    for words in word_lists:
+        lexicon.find(words)
+
+
+def main():
+    base = set(ARABIC_POSITIVE_WORDS) | set(ARABIC_NEGATIVE_WORDS) | set(PROMOTIONAL_INDICATORS)
+    rounds = 200
+    word_lists = [preprocess(text).words for text in SAMPLE_TEXTS]
+    print(f"{'entries':>8} {'naive us/text':>14} {'matcher us/text':>16} {'tokens us/text':>15}")
+    for multiplier in (1, 4, 16, 64):
+        lexicon = base | synthetic_words(len(base) * (multiplier - 1))
+        matcher = LexiconMatcher(lexicon)
+        token_lexicon = TokenLexicon(lexicon)
+        naive = timeit.timeit(lambda: naive_scan(lexicon, SAMPLE_TEXTS), number=rounds)
+        compiled = timeit.timeit(lambda: matcher_scan(matcher, SAMPLE_TEXTS), number=rounds)
+        hashed = timeit.timeit(lambda: token_scan(token_lexicon, word_lists), number=rounds)
+        per_text = rounds * len(SAMPLE_TEXTS) / 1e6
+        print(f"{len(lexicon):>8} {naive / per_text:>14.1f} {compiled / per_text:>16.1f} {hashed / per_text:>15.1f}")
+
+
+if __name__ == "__main__":
+    main()
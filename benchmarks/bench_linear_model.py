@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Benchmark: hashed-feature linear model vs the VADER/TextBlob ensemble
+
+Labels a deterministic corpus (benchmarks/corpus.py) with the ensemble, the
+way stored Post/Comment rows were labeled, trains the linear model on the
+first part and reports on the held-out rest: label agreement with the
+ensemble, texts/sec of analyze_sentiment and analyze_sentiment_batch with
+each scorer, training time and model file size. Score caches are disabled.
+
+Usage:
+    python benchmarks/bench_linear_model.py [--texts 20000] [--holdout 0.25] [--features 18]
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import linear_model  # noqa: E402
+import sentiment  # noqa: E402
+from corpus import generate_corpus  # noqa: E402
+
+
+def texts_per_sec(function, texts, repeat=3):
+    best = min(_timed(function, texts) for _ in range(repeat))
+    return len(texts) / best
+
+
+def _timed(function, texts):
+    start = time.perf_counter()
+    function(texts)
+    return time.perf_counter() - start
+
+
+def single(texts):
+    for text in texts:
+        sentiment.analyze_sentiment(text)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare the linear model with the ensemble scorer')
+    parser.add_argument('--texts', type=int, default=20000)
+    parser.add_argument('--holdout', type=float, default=0.25)
+    parser.add_argument('--features', type=int, default=linear_model.DEFAULT_FEATURE_BITS)
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    sentiment.configure_cache(enabled=False)
+    sentiment.configure_disk_cache(None)
+    sentiment.warmup()
+
+    texts = generate_corpus(args.texts, args.seed)
+    labels = [sentiment.analyze_sentiment(text)[0] for text in texts]
+    split = int(len(texts) * (1 - args.holdout))
+    train_texts, test_texts = texts[:split], texts[split:]
+
+    start = time.perf_counter()
+    model = linear_model.train(train_texts, labels[:split], feature_bits=args.features)
+    training_seconds = time.perf_counter() - start
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'model.npz')
+        model.save(path)
+        size_kb = os.path.getsize(path) / 1024
+
+        rates = {}
+        for scorer in sentiment.SCORERS:
+            sentiment.set_scorer(scorer, path)
+            rates[scorer] = (texts_per_sec(single, test_texts), texts_per_sec(sentiment.analyze_sentiment_batch, test_texts))
+            if scorer == 'linear':
+                predicted = [sentiment.analyze_sentiment(text)[0] for text in test_texts]
+        sentiment.set_scorer('ensemble')
+
+    agreement = sum(a == b for a, b in zip(predicted, labels[split:])) / len(test_texts)
+    majority = max(labels[split:].count(label) for label in linear_model.CLASSES) / len(test_texts)
+    print(f"Trained on {model.metadata['examples']} texts in {training_seconds:.1f}s, "
+          f"model file {size_kb:.0f} KB (2^{args.features} buckets)")
+    print(f"Held-out agreement with the ensemble: {agreement:.1%} on {len(test_texts)} texts "
+          f"(majority label: {majority:.1%})")
+    print(f"{'scorer':<10} {'single/sec':>11} {'batch/sec':>10}")
+    for scorer, (single_rate, batch_rate) in rates.items():
+        print(f"{scorer:<10} {single_rate:>11.0f} {batch_rate:>10.0f}")
+
+
+if __name__ == "__main__":
+    main()
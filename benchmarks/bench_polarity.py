@@ -0,0 +1,46 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark: TextBlob polarity vs the native pattern_polarity port
+
+Reports microseconds per text for TextBlob(text).sentiment.polarity and
+pattern_polarity.polarity(text), and checks that both return the same scores.
+"""
+
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from textblob import TextBlob  # noqa: E402
+
+from pattern_polarity import polarity  # noqa: E402
+
+SAMPLE_TEXTS = [
+    "Amazing new technology! This is incredible! 🚀 #innovation",
+    "This product is really not very good at all!!",
+    "I absolutely love it :) best purchase ever",
+    "Terrible service, never again. The staff were rude.",
+    "It isn't bad, it's not a terrible idea... honestly a pleasant surprise",
+    "MTC يقدم خدمات رائعة في التحول الرقمي! 🚀 #تحول_رقمي #تقنية",
+    "Great post! Love the content! 👍 Check https://example.com for more details",
+]
+
+
+def textblob_polarity(text):
+    return TextBlob(text).sentiment.polarity
+
+
+def main():
+    mismatches = sum(1 for text in SAMPLE_TEXTS if polarity(text) != textblob_polarity(text))
+    rounds = 500
+    per_text = rounds * len(SAMPLE_TEXTS) / 1e6
+    results = {}
+    for name, scorer in (('textblob', textblob_polarity), ('pattern', polarity)):
+        results[name] = timeit.timeit(lambda: [scorer(text) for text in SAMPLE_TEXTS], number=rounds) / per_text
+        print(f"{name:>10}: {results[name]:8.1f} us/text")
+    print(f"speedup: {results['textblob'] / results['pattern']:.1f}x, mismatching scores: {mismatches}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+Benchmark: SentimentPool throughput vs number of worker processes
+
+Scores a deterministic 10k-text corpus with analyze_sentiment_batch in a
+single process and with SentimentPool at 1, 2, 4, ... workers up to the CPU
+count, and prints texts/sec and speed-up for each.
+
+Usage:
+    python benchmarks/bench_pool.py [--texts 10000]
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import sentiment  # noqa: E402
+
+FRAGMENTS = [
+    "Amazing new technology! This is incredible! 🚀",
+    "Great day at the conference, learned so much! 😊",
+    "This is really frustrating, nothing is working 😤",
+    "Terrible experience with the service today 😞",
+    "MTC يقدم خدمات رائعة في التحول الرقمي!",
+    "الخدمة سيئة ومخيب للأمل 😡",
+    "Regular update on the project 📈",
+    "MTC offre des services incroyables de transformation numérique !",
+]
+
+
+def build_corpus(count, seed=0):
+    """Unique texts of varied length so caches never hit"""
+    rnd = random.Random(seed)
+    return [f"{' '.join(rnd.choice(FRAGMENTS) for _ in range(rnd.randint(1, 6)))} #{i}" for i in range(count)]
+
+
+def worker_counts():
+    """2, 4, 8, ... workers up to the CPU count (one worker runs in-process)"""
+    cpus = os.cpu_count() or 1
+    counts = []
+    workers = 2
+    while workers < cpus:
+        counts.append(workers)
+        workers *= 2
+    if cpus > 1:
+        counts.append(cpus)
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--texts', type=int, default=10000)
+    args = parser.parse_args()
+
+    sentiment.configure_cache(enabled=False)
+    sentiment.configure_disk_cache(None)
+    texts = build_corpus(args.texts)
+
+    start = time.perf_counter()
+    sentiment.analyze_sentiment_batch(texts)
+    baseline = time.perf_counter() - start
+    print(f"{'single process':>16}: {len(texts) / baseline:8.0f} texts/sec")
+
+    if (os.cpu_count() or 1) == 1:
+        print("Only one CPU available; nothing to parallelize")
+
+    for workers in worker_counts():
+        with sentiment.SentimentPool(workers=workers, min_parallel=0) as pool:
+            pool.analyze(texts[:workers * 10])  # start and warm up the workers
+            start = time.perf_counter()
+            pool.analyze(texts)
+            elapsed = time.perf_counter() - start
+        print(f"{workers:>8} workers: {len(texts) / elapsed:8.0f} texts/sec  (x{baseline / elapsed:.2f})")
+
+
+if __name__ == "__main__":
+    main()
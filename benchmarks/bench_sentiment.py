@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+"""
+Benchmark suite: sentiment.py end to end and per component
+
+Scores a deterministic multilingual corpus (benchmarks/corpus.py) with
+analyze_sentiment, clean_text, preprocess and each scorer component (VADER,
+TextBlob, emojis, keywords) separately. For each target it reports texts/sec,
+p50/p99/mean latency per text and the peak memory traced by tracemalloc
+while scoring the corpus. Score caches are disabled so every text is scored.
+
+Results are written as JSON together with the git commit, so runs on
+different commits can be compared:
+
+    python benchmarks/bench_sentiment.py --output before.json
+    git checkout my-branch
+    python benchmarks/bench_sentiment.py --output after.json --compare before.json
+
+Usage:
+    python benchmarks/bench_sentiment.py [--texts 2000] [--seed 0] [--min-words 4] [--max-words 40]
+                                         [--only analyze_sentiment,vader] [--output FILE] [--compare FILE]
+"""
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timezone
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import sentiment  # noqa: E402
+from corpus import generate_corpus  # noqa: E402
+
+
+def _keywords(document):
+    positive, negative, promotional = sentiment.count_keywords(document.words)
+    return sentiment.keyword_score(positive, negative), promotional
+
+
+# name -> (input, function); 'text' targets get the raw text, 'document'
+# targets the preprocessed SentimentDocument, so components are timed alone
+TARGETS = {
+    'analyze_sentiment': ('text', sentiment.analyze_sentiment),
+    'clean_text': ('text', sentiment.clean_text),
+    'preprocess': ('text', sentiment.preprocess),
+    'vader': ('document', lambda document: sentiment.vader_score(document.cleaned)),
+    'textblob': ('document', lambda document: sentiment.textblob_score(document.cleaned)),
+    'emoji': ('document', lambda document: sentiment.average_emoji_score(document.emojis)),
+    'keywords': ('document', _keywords),
+}
+
+
+def git_commit():
+    """Current commit hash, with '-dirty' when the work tree has changes, or None outside git"""
+    try:
+        commit = subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=ROOT, capture_output=True, text=True,
+                                check=True).stdout.strip()
+        dirty = subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'], cwd=ROOT,
+                               capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return f"{commit}-dirty" if dirty else commit
+
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an already sorted list"""
+    index = min(len(sorted_values) - 1, max(0, int(round(fraction * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[index]
+
+
+def measure(function, inputs):
+    """Latency statistics (microseconds) and throughput of function over inputs"""
+    timings = []
+    clock = time.perf_counter_ns
+    for value in inputs:
+        start = clock()
+        function(value)
+        timings.append(clock() - start)
+    total = sum(timings)
+    timings.sort()
+    return {
+        'texts_per_sec': len(inputs) / (total / 1e9) if total else 0.0,
+        'p50_us': percentile(timings, 0.50) / 1000,
+        'p99_us': percentile(timings, 0.99) / 1000,
+        'mean_us': total / len(inputs) / 1000,
+    }
+
+
+def peak_memory(function, inputs):
+    """Peak traced allocation (KB) while running function over inputs, in a separate untimed pass"""
+    tracemalloc.start()
+    try:
+        tracemalloc.reset_peak()
+        baseline = tracemalloc.get_traced_memory()[0]
+        for value in inputs:
+            function(value)
+        return (tracemalloc.get_traced_memory()[1] - baseline) / 1024
+    finally:
+        tracemalloc.stop()
+
+
+def run(texts, targets):
+    documents = [sentiment.preprocess(text) for text in texts]
+    results = {}
+    for name in targets:
+        kind, function = TARGETS[name]
+        inputs = texts if kind == 'text' else documents
+        # Warm up: load analyzers and lexicons outside the measurement
+        for value in inputs[:20]:
+            function(value)
+        results[name] = measure(function, inputs)
+        results[name]['peak_kb'] = peak_memory(function, inputs)
+    return results
+
+
+def print_results(results, baseline=None):
+    header = f"{'target':<18} {'texts/sec':>10} {'p50 us':>9} {'p99 us':>9} {'mean us':>9} {'peak KB':>9}"
+    print(header + ("  vs baseline" if baseline else ""))
+    for name, stats in results.items():
+        line = (f"{name:<18} {stats['texts_per_sec']:>10.0f} {stats['p50_us']:>9.1f} {stats['p99_us']:>9.1f} "
+                f"{stats['mean_us']:>9.1f} {stats['peak_kb']:>9.1f}")
+        previous = (baseline or {}).get(name)
+        if previous and previous['texts_per_sec']:
+            line += f"  {stats['texts_per_sec'] / previous['texts_per_sec']:.2f}x"
+        print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark sentiment.py on a multilingual synthetic corpus')
+    parser.add_argument('--texts', type=int, default=2000)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--min-words', type=int, default=4)
+    parser.add_argument('--max-words', type=int, default=40)
+    parser.add_argument('--only', help=f"Comma-separated targets out of {', '.join(TARGETS)}")
+    parser.add_argument('--output', help='Write the results as JSON to this file')
+    parser.add_argument('--compare', help='JSON results of an earlier run to compare throughput with')
+    args = parser.parse_args()
+
+    targets = args.only.split(',') if args.only else list(TARGETS)
+    unknown = [name for name in targets if name not in TARGETS]
+    if unknown:
+        parser.error(f"unknown targets: {', '.join(unknown)}")
+
+    sentiment.configure_cache(enabled=False)
+    sentiment.configure_disk_cache(None)
+    sentiment.warmup()
+
+    texts = generate_corpus(args.texts, args.seed, args.min_words, args.max_words)
+    report = {
+        'commit': git_commit(),
+        'timestamp': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'scorer_version': sentiment.SCORER_VERSION,
+        'polarity_scorer': sentiment.POLARITY_SCORER,
+        'corpus': {'texts': args.texts, 'seed': args.seed, 'min_words': args.min_words,
+                   'max_words': args.max_words, 'characters': sum(len(text) for text in texts)},
+        'results': run(texts, targets),
+    }
+
+    baseline = None
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            previous = json.load(f)
+        print(f"Baseline: commit {previous.get('commit')} ({previous.get('timestamp')})")
+        baseline = previous['results']
+    print(f"Commit {report['commit']}, {args.texts} texts, {report['corpus']['characters']} characters")
+    print_results(report['results'], baseline)
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+"""
+Benchmark: cost of importing sentiment.py in a fresh interpreter
+
+Reports the median wall time of
+  - ``import sentiment`` (analyzers load lazily on first use),
+  - ``import sentiment`` followed by ``warmup()``, which is what every
+    import used to cost when VADER, TextBlob, arabic_reshaper and bidi were
+    loaded eagerly at module load,
+  - the first ``analyze_sentiment`` call after a lazy import.
+
+Usage:
+    python benchmarks/bench_startup.py [--runs 5]
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SCENARIOS = {
+    'import (lazy)': "import sentiment",
+    'import + warmup() (old eager import)': "import sentiment; sentiment.warmup()",
+    'import + first analyze_sentiment': "import sentiment; sentiment.analyze_sentiment('Great post! 👍')",
+}
+
+TIMER = """
+import time
+start = time.perf_counter()
+{code}
+print(time.perf_counter() - start)
+"""
+
+
+def measure(code, runs):
+    timings = []
+    for _ in range(runs):
+        output = subprocess.run(
+            [sys.executable, '-c', TIMER.format(code=code)],
+            cwd=REPO_DIR, capture_output=True, text=True, check=True,
+        ).stdout
+        timings.append(float(output.strip().splitlines()[-1]))
+    return statistics.median(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure sentiment.py import time')
+    parser.add_argument('--runs', type=int, default=5)
+    args = parser.parse_args()
+
+    for name, code in SCENARIOS.items():
+        print(f"{name:>40}: {measure(code, args.runs) * 1000:8.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
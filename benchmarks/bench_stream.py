@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""
+Benchmark: peak memory of analyze_stream vs input size
+
+Streams generated texts (never held in a list) through analyze_stream and
+reports throughput and the tracemalloc peak for growing input sizes, in
+process and through a SentimentPool. The peak should stay flat: it depends
+on batch_size and max_pending, not on the number of texts. Worker processes
+are not traced, so the pool rows show the parent's queued batches only.
+Throughput is measured with tracemalloc running and is therefore lower than
+in bench_sentiment.py or bench_pool.py.
+
+Usage:
+    python benchmarks/bench_stream.py [--batch-size 500] [--workers 2]
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import sentiment  # noqa: E402
+from corpus import LANGUAGES, generate_text  # noqa: E402
+
+SIZES = (2000, 10000, 50000)
+
+
+def texts(count, seed=0):
+    """Generate count corpus texts lazily"""
+    rnd = random.Random(seed)
+    for i in range(count):
+        yield generate_text(rnd, LANGUAGES[i % len(LANGUAGES)], rnd.randint(4, 40))
+
+
+def run(count, batch_size, pool):
+    tracemalloc.start()
+    start = time.perf_counter()
+    scored = 0
+    for _ in sentiment.analyze_stream(texts(count), batch_size=batch_size, pool=pool):
+        scored += 1
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return scored / elapsed, peak / 1024 / 1024
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--batch-size', type=int, default=500)
+    parser.add_argument('--workers', type=int, default=2)
+    args = parser.parse_args()
+
+    sentiment.configure_cache(enabled=False)
+    sentiment.configure_disk_cache(None)
+    sentiment.warmup()
+
+    print(f"{'mode':<10} {'texts':>8} {'texts/sec':>10} {'peak MB':>8}")
+    with sentiment.SentimentPool(workers=args.workers) as pool:
+        for mode, mode_pool in (('in-process', None), (f'pool x{args.workers}', pool)):
+            for count in SIZES:
+                rate, peak = run(count, args.batch_size, mode_pool)
+                print(f"{mode:<10} {count:>8} {rate:>10.0f} {peak:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
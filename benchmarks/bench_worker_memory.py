@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+Benchmark: resident memory per forked worker, like gunicorn's prefork model
+
+For each setup a fresh master process forks WORKERS workers that each score
+the same texts, then every worker reports its RSS, PSS (shared pages split
+between the processes mapping them) and private (unshared) memory from
+/proc/self/smaps_rollup. Linux only.
+
+Setups:
+    private dicts      - no preload: every worker loads NLTK, TextBlob data and its own lexicon dicts
+    preload + dicts    - master loads everything and gc.freeze()s before forking (gunicorn.conf.py)
+    shared file        - no preload, lexicons read from the memory-mapped file
+    preload + shared   - preload and the memory-mapped lexicon file (the deployed setup)
+"""
+
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+WORKERS = 4
+
+SAMPLE_TEXTS = [
+    "Amazing new technology! This is incredible! 🚀 #innovation",
+    "This is really frustrating, nothing is working 😤",
+    "MTC يقدم خدمات رائعة في التحول الرقمي! 🚀 #تحول_رقمي #تقنية",
+    "Terrible service, never again. The staff were rude :(",
+    "I absolutely love it :) best purchase ever, not bad at all",
+]
+
+SETUPS = (
+    ('private dicts', False, False),
+    ('preload + dicts', True, False),
+    ('shared file', False, True),
+    ('preload + shared', True, True),
+)
+
+MASTER = r'''
+import gc, json, os, sys
+sys.path.insert(0, {root!r})
+import sentiment
+
+sentiment.configure_cache(enabled=False)
+sentiment.configure_lexicon_store({lexicon_path!r})
+if {preload!r}:
+    sentiment.warmup()
+    gc.freeze()
+
+def memory():
+    stats = {{}}
+    with open('/proc/self/smaps_rollup') as f:
+        for line in f:
+            parts = line.split()
+            if parts[0] in ('Rss:', 'Pss:', 'Private_Clean:', 'Private_Dirty:'):
+                stats[parts[0][:-1]] = int(parts[1]) / 1024
+    return {{'rss': stats['Rss'], 'pss': stats['Pss'],
+             'private': stats['Private_Clean'] + stats['Private_Dirty']}}
+
+# Workers measure only once all of them have scored their texts, and exit only
+# after all of them have measured, so shared pages are split between all workers
+go_read, go_write = os.pipe()
+done_read, done_write = os.pipe()
+workers = []
+for _ in range({workers}):
+    read_fd, write_fd = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        os.close(read_fd)
+        os.close(go_write)
+        os.close(done_write)
+        texts = [f"{{text}} {{i}}" for i in range(200) for text in {texts!r}]
+        sentiment.analyze_sentiment_batch(texts)
+        os.write(write_fd, b'scored\n')
+        os.read(go_read, 1)
+        os.write(write_fd, json.dumps(memory()).encode() + b'\n')
+        os.read(done_read, 1)
+        os._exit(0)
+    os.close(write_fd)
+    workers.append((pid, os.fdopen(read_fd, 'rb')))
+
+for pid, status in workers:
+    status.readline()
+os.write(go_write, b'x' * len(workers))
+results = [json.loads(status.readline()) for pid, status in workers]
+os.close(done_write)
+for pid, status in workers:
+    os.waitpid(pid, 0)
+print(json.dumps(results))
+'''
+
+
+def run_setup(preload, lexicon_path):
+    code = MASTER.format(root=ROOT, lexicon_path=lexicon_path, preload=preload, workers=WORKERS, texts=SAMPLE_TEXTS)
+    output = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, check=True, cwd=ROOT).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    if not os.path.exists('/proc/self/smaps_rollup'):
+        print("This benchmark needs Linux (/proc/self/smaps_rollup)")
+        return
+
+    with tempfile.TemporaryDirectory() as directory:
+        lexicon_path = os.path.join(directory, 'sentiment_lexicons.bin')
+        from lexicon_store import build_default
+        build_default(lexicon_path)
+
+        print(f"{WORKERS} workers, MB per worker (mean)")
+        print(f"{'setup':<18} {'RSS':>8} {'PSS':>8} {'private':>8}")
+        for name, preload, shared in SETUPS:
+            workers = run_setup(preload, lexicon_path if shared else None)
+            mean = {key: sum(w[key] for w in workers) / len(workers) for key in ('rss', 'pss', 'private')}
+            print(f"{name:<18} {mean['rss']:>8.1f} {mean['pss']:>8.1f} {mean['private']:>8.1f}")
+
+
+if __name__ == "__main__":
+    sys.path.insert(0, ROOT)
+    main()
@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+Deterministic multilingual corpus for the sentiment benchmarks
+
+Texts look like the captions, comments and transcripts the app scores (see
+demo_data.py and get_demo_tiktok_data in app.py): Arabic, English and French
+sentences with sentiment words, emojis, hashtags, mentions and the odd URL,
+plus mixed Arabic/English texts. The same arguments always give the same
+corpus, so benchmark runs on different commits score identical input.
+
+Usage:
+    python benchmarks/corpus.py [--texts 10] [--seed 0] [--min-words 4] [--max-words 40]
+"""
+
+import argparse
+import random
+
+LANGUAGES = ('arabic', 'english', 'french', 'mixed')
+
+WORDS = {
+    'arabic': (
+        "MTC", "يقدم", "خدمات", "رائعة", "في", "التحول", "الرقمي", "مرحباً", "بكم", "هذا", "الفيديو",
+        "نحن", "نقدم", "أحدث", "التقنيات", "والحلول", "المبتكرة", "لمساعدة", "الشركات", "على", "النمو",
+        "ممتاز", "جميل", "رائع", "مذهل", "سيء", "مخيب", "للأمل", "مزعج", "بطيء", "الخدمة", "جدا",
+        "شكرا", "لكم", "الفريق", "الدعم", "سريع", "أفضل", "مشكلة", "تطبيق", "الجديد",
+    ),
+    'english': (
+        "MTC", "digital", "transformation", "services", "are", "amazing", "this", "is", "incredible",
+        "great", "day", "at", "the", "conference", "learned", "so", "much", "working", "on", "new",
+        "features", "today", "really", "frustrating", "nothing", "terrible", "experience", "with",
+        "service", "not", "happy", "results", "complete", "disaster", "love", "team", "fastest",
+        "deal", "update", "project", "slow", "best", "support", "never", "again", "good", "bad",
+    ),
+    'french': (
+        "MTC", "offre", "des", "services", "incroyables", "de", "transformation", "numérique",
+        "bienvenue", "dans", "cette", "vidéo", "sur", "les", "nous", "fournissons", "dernières",
+        "technologies", "et", "solutions", "innovantes", "très", "bien", "génial", "mauvais",
+        "déçu", "excellent", "équipe", "merci", "rapide", "lent", "service", "client",
+    ),
+}
+
+HASHTAGS = {
+    'arabic': ("#تحول_رقمي", "#تقنية", "#خدمات", "#ابتكار"),
+    'english': ("#innovation", "#digital", "#tech", "#mtc"),
+    'french': ("#transformation", "#innovation", "#numérique"),
+}
+
+EMOJIS = ("🚀", "😊", "😍", "👍", "❤️", "🔥", "🎉", "🌟", "😤", "😞", "😡", "💔", "📈", "🏢", "🤔", "😂", "👏🏽")
+
+PUNCTUATION = ("!", ".", "?", "!!", ",", "...")
+
+
+def generate_text(rnd, language, words):
+    """One text of about words words in language"""
+    if language == 'mixed':
+        vocabularies = (WORDS['arabic'], WORDS['english'])
+        hashtags = HASHTAGS['arabic'] + HASHTAGS['english']
+    else:
+        vocabularies = (WORDS[language],)
+        hashtags = HASHTAGS[language]
+
+    parts = []
+    vocabulary = rnd.choice(vocabularies)
+    for _ in range(words):
+        # Mixed texts switch language every few words
+        if len(vocabularies) > 1 and rnd.random() < 0.2:
+            vocabulary = rnd.choice(vocabularies)
+        parts.append(rnd.choice(vocabulary))
+        roll = rnd.random()
+        if roll < 0.08:
+            parts[-1] += rnd.choice(PUNCTUATION)
+        elif roll < 0.14:
+            parts.append(rnd.choice(EMOJIS))
+
+    for _ in range(rnd.randint(0, 3)):
+        parts.append(rnd.choice(hashtags))
+    if rnd.random() < 0.15:
+        parts.insert(rnd.randint(0, len(parts)), f"@user{rnd.randint(1, 999)}")
+    if rnd.random() < 0.1:
+        parts.append(f"https://example.com/{rnd.choice(('video', 'post', 'p'))}/{rnd.randint(1000, 99999)}")
+    return ' '.join(parts)
+
+
+def generate_corpus(count, seed=0, min_words=4, max_words=40, languages=LANGUAGES):
+    """count deterministic texts with lengths between min_words and max_words words
+
+    Languages rotate in order, so every language gets the same share of texts.
+    """
+    rnd = random.Random(seed)
+    return [generate_text(rnd, languages[i % len(languages)], rnd.randint(min_words, max_words))
+            for i in range(count)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Print a sample of the benchmark corpus')
+    parser.add_argument('--texts', type=int, default=10)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--min-words', type=int, default=4)
+    parser.add_argument('--max-words', type=int, default=40)
+    args = parser.parse_args()
+
+    for text in generate_corpus(args.texts, args.seed, args.min_words, args.max_words):
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
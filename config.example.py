@@ -35,7 +35,36 @@ TIKTOK_API_CONFIG = {
 # Sentiment Analysis Configuration
 SENTIMENT_CONFIG = {
     'use_demo_data': True,  # Set to False for production
-    'confidence_threshold': 0.6
+    'confidence_threshold': 0.6,
+    'polarity_scorer': 'pattern',  # 'pattern' (fast native port) or 'textblob' (reference implementation)
+    # 'ensemble' (VADER, TextBlob, emojis, keywords) or 'linear': the hashed-feature model
+    # trained from the stored posts and comments with `python linear_model.py train`
+    'scorer': 'ensemble',
+    'linear_model_path': 'sentiment_model.npz',
+    # Read-only VADER/pattern lexicons compiled into one memory-mapped file shared by all
+    # gunicorn workers (built on first use, or with `python lexicon_store.py build`).
+    # Saves little memory per worker and makes pattern lookups about 2x slower, so it is
+    # off (None, per-worker dicts) by default; e.g. 'sentiment_lexicons.bin' to enable.
+    'lexicon_path': None,
+    # Record time per analysis stage (preprocess, VADER, TextBlob, emojis, keywords),
+    # served by /admin/metrics/sentiment; `python -m sentiment profile FILE` works either way
+    'profiling': False,
+    # Cascade mode: skip VADER/TextBlob when emojis, keywords and promotional indicators
+    # already put the score more than cascade_band beyond the ±0.05 thresholds. Faster,
+    # with a small label disagreement; measure it with `python -m sentiment cascade FILE`.
+    # Every cascade_audit_every-th early exit is also fully scored (0 = never).
+    'cascade': False,
+    'cascade_band': 0.15,
+    'cascade_audit_every': 100,
+    # Overall post sentiment from its comments (aggregation.py): 'majority' (most frequent
+    # label, mean polarity), 'mean' (mean polarity) or 'engagement' (majority weighted by likes)
+    'aggregation': 'majority',
+    # Keyword and emoji lexicons: a JSON data file (None = lexicons/sentiment_words.json).
+    # Workers reload it without a restart when it changes (checked every lexicon_check_interval
+    # seconds, 0 = never) or on POST /admin/lexicons/reload; check and install a new version with
+    # `python -m sentiment lexicons NEW_FILE --install`
+    'lexicon_data_path': None,
+    'lexicon_check_interval': 30
 }
 
 # Demo Data Configuration (for testing)
@@ -76,11 +105,14 @@ LOGGING_CONFIG = {
     'file': 'app.log'
 }
 
-# Cache Configuration
+# Cache Configuration (in-process sentiment score cache in sentiment.py)
 CACHE_CONFIG = {
     'enabled': True,
-    'timeout': 300,  # 5 minutes
-    'max_size': 1000
+    'timeout': 300,  # 5 minutes; cached scores older than this are recomputed
+    'max_size': 1000,  # Maximum number of cached texts per worker (LRU eviction)
+    'disk_path': 'sentiment_cache.sqlite3',  # Persistent cache shared by all workers (None to disable)
+    'disk_max_age': 30 * 24 * 3600,  # 30 days
+    'disk_max_entries': 1000000
 }
 
 # Rate Limiting
@@ -5,7 +5,7 @@ Demo data generator for testing the sentiment analysis application
 
 from app import app, db
 from models import Post, User
-from sentiment import analyze_sentiment
+from sentiment import analyze
 from datetime import datetime, timedelta
 import random
 
@@ -54,14 +54,14 @@ def generate_demo_data():
             caption = random.choice(sample_captions)
             
             # Analyze sentiment
-            sentiment, polarity = analyze_sentiment(caption)
+            result = analyze(caption)
             
             # Create post
             post = Post(
                 post_id=f"demo_{i}_{hashtag}",
                 caption=caption,
-                sentiment=sentiment,
-                polarity=polarity,
+                sentiment=result.label,
+                polarity=result.polarity,
                 hashtag=hashtag,
                 created_at=created_at,
                 source='instagram',
@@ -70,6 +70,7 @@ def generate_demo_data():
                 like_count=random.randint(0, 100),
                 comments_count=random.randint(0, 20)
             )
+            post.set_components(result.components)
             
             db.session.add(post)
             total_posts += 1
@@ -88,13 +89,13 @@ def generate_demo_data():
             created_at = datetime.now() - timedelta(days=days_ago)
             
             caption = random.choice(facebook_captions)
-            sentiment, polarity = analyze_sentiment(caption)
+            result = analyze(caption)
             
             post = Post(
                 post_id=f"fb_demo_{i}",
                 caption=caption,
-                sentiment=sentiment,
-                polarity=polarity,
+                sentiment=result.label,
+                polarity=result.polarity,
                 hashtag='facebook',
                 created_at=created_at,
                 source='facebook',
@@ -103,6 +104,7 @@ def generate_demo_data():
                 like_count=random.randint(0, 50),
                 comments_count=random.randint(0, 10)
             )
+            post.set_components(result.components)
             
             db.session.add(post)
             total_posts += 1
@@ -0,0 +1,30 @@
+# Gunicorn settings (Procfile: gunicorn -c gunicorn.conf.py app:app)
+
+# Import the app once in the master process (and load the sentiment analyzers
+# there, see when_ready); forked workers then share those pages copy-on-write
+preload_app = True
+
+
+def when_ready(server):
+    # With the app preloaded, load the sentiment analyzers and lexicons in the
+    # master too, so every forked worker shares them, and move everything created
+    # so far out of the garbage collector's reach so collections in the workers
+    # do not write to (and copy) those shared pages. Scripts that import the app
+    # keep loading the analyzers lazily.
+    if not server.cfg.preload_app:
+        return
+    import gc
+
+    from sentiment import warmup
+
+    warmup()
+    gc.freeze()
+
+
+def post_fork(server, worker):
+    # Database connections opened while the app was imported in the master must
+    # not be shared with the workers
+    from app import app, db
+
+    with app.app_context():
+        db.engine.dispose(close=False)
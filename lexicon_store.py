@@ -0,0 +1,280 @@
+#!/usr/bin/env python3
+"""
+Compact read-only sentiment lexicons shared by all worker processes
+
+The VADER lexicon and the pattern (TextBlob) lexicon are compiled once into a
+single binary file: for every lexicon a sorted UTF-8 string table, a float64
+array with one or more value columns and an open-addressing hash index. The
+file is memory-mapped, so every gunicorn worker (and every SentimentPool
+process) reads the same page-cache pages instead of building its own dicts,
+and lookups never write to those pages.
+
+Usage:
+    python lexicon_store.py build [--path sentiment_lexicons.bin]
+    python lexicon_store.py info [--path sentiment_lexicons.bin]
+"""
+
+import argparse
+import json
+import mmap
+import os
+import struct
+import tempfile
+from array import array
+from collections.abc import Mapping
+from zlib import crc32
+
+DEFAULT_PATH = 'sentiment_lexicons.bin'
+
+MAGIC = b'SLEX'
+FORMAT_VERSION = 1
+
+# Magic, format version and JSON header length
+_PREAMBLE = struct.Struct('<4sII')
+
+
+def _align(offset, boundary=8):
+    return (offset + boundary - 1) // boundary * boundary
+
+
+def _table_size(count):
+    """Power-of-two hash table size with a load factor of at most 0.5"""
+    size = 8
+    while size < count * 2:
+        size *= 2
+    return size
+
+
+def _encode_lexicon(lexicon):
+    """Return (header fields, [(relative offset, bytes)]) for one lexicon"""
+    words = sorted(lexicon)
+    values = [lexicon[word] for word in words]
+    columns = len(values[0]) if values and isinstance(values[0], (tuple, list)) else 1
+
+    keys = bytearray()
+    offsets = array('I', [0])
+    for word in words:
+        keys += word.encode('utf-8')
+        offsets.append(len(keys))
+
+    floats = array('d')
+    for value in values:
+        if columns == 1:
+            floats.append(float(value))
+        else:
+            floats.extend(float(v) for v in value)
+
+    size = _table_size(len(words))
+    slots = array('I', bytes(4 * size))
+    for index, word in enumerate(words):
+        slot = crc32(word.encode('utf-8')) & (size - 1)
+        while slots[slot]:
+            slot = (slot + 1) & (size - 1)
+        slots[slot] = index + 1
+
+    blocks = []
+    position = 0
+    fields = {'count': len(words), 'columns': columns, 'table_size': size}
+    for name, data in (('offsets', offsets.tobytes()), ('values', floats.tobytes()),
+                       ('slots', slots.tobytes()), ('keys', bytes(keys))):
+        position = _align(position)
+        fields[name] = position
+        blocks.append((position, data))
+        position += len(data)
+    fields['size'] = position
+    return fields, blocks
+
+
+def build(lexicons, path=DEFAULT_PATH):
+    """Write {name: {word: value or tuple of values}} to path atomically and return path
+
+    Workers that already mapped an older file keep using it until they reopen.
+    """
+    header = {'sections': {}}
+    encoded = {}
+    base = 0
+    for name, lexicon in lexicons.items():
+        fields, blocks = _encode_lexicon(lexicon)
+        base = _align(base)
+        fields['base'] = base
+        header['sections'][name] = fields
+        encoded[name] = (base, blocks)
+        base += fields['size']
+
+    header_bytes = json.dumps(header, sort_keys=True).encode('utf-8')
+    data_start = _align(_PREAMBLE.size + len(header_bytes))
+
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, temp_path = tempfile.mkstemp(prefix='.lexicons-', dir=directory)
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(_PREAMBLE.pack(MAGIC, FORMAT_VERSION, len(header_bytes)))
+            f.write(header_bytes)
+            for section_base, blocks in encoded.values():
+                for offset, data in blocks:
+                    f.seek(data_start + section_base + offset)
+                    f.write(data)
+            f.truncate(data_start + base)
+        os.replace(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.unlink(temp_path)
+        raise
+    return path
+
+
+class CompactLexicon(Mapping):
+    """Read-only {word: value} mapping over one section of a memory-mapped lexicon file
+
+    Values are floats for single-column lexicons and tuples of floats otherwise.
+    """
+
+    def __init__(self, buffer, start, fields):
+        view = memoryview(buffer)
+        count = fields['count']
+        self.columns = fields['columns']
+        self._count = count
+        self._buffer = buffer
+        self._keys_start = start + fields['keys']
+        self._offsets = view[start + fields['offsets']:start + fields['offsets'] + 4 * (count + 1)].cast('I')
+        self._values = view[start + fields['values']:start + fields['values'] + 8 * count * self.columns].cast('d')
+        self._slots = view[start + fields['slots']:start + fields['slots'] + 4 * fields['table_size']].cast('I')
+        self._row = struct.Struct(f'<{self.columns}d').unpack_from
+        self._row_start = start + fields['values']
+        self._index = self._make_index(fields['table_size'] - 1)
+
+    def _make_index(self, mask):
+        """Return index(word) -> position of word in the string table, or -1
+
+        Lookups run once per token, so the table views are bound in a closure
+        instead of being read from the instance on every call.
+        """
+        slots, offsets, buffer, keys_start = self._slots, self._offsets, self._buffer, self._keys_start
+
+        def index(word):
+            if type(word) is not str:
+                return -1
+            data = word.encode('utf-8', 'surrogatepass')
+            slot = crc32(data) & mask
+            while True:
+                position = slots[slot]
+                if not position:
+                    return -1
+                position -= 1
+                if buffer[keys_start + offsets[position]:keys_start + offsets[position + 1]] == data:
+                    return position
+                slot = (slot + 1) & mask
+
+        return index
+
+    def _value(self, index):
+        if self.columns == 1:
+            return self._values[index]
+        return self._row(self._buffer, self._row_start + 8 * self.columns * index)
+
+    def __getitem__(self, word):
+        index = self._index(word)
+        if index < 0:
+            raise KeyError(word)
+        return self._value(index)
+
+    def get(self, word, default=None):
+        index = self._index(word)
+        return default if index < 0 else self._value(index)
+
+    def __contains__(self, word):
+        return self._index(word) >= 0
+
+    def __len__(self):
+        return self._count
+
+    def __iter__(self):
+        buffer, offsets, keys_start = self._buffer, self._offsets, self._keys_start
+        for index in range(self._count):
+            yield buffer[keys_start + offsets[index]:keys_start + offsets[index + 1]].decode('utf-8')
+
+
+class LexiconStore:
+    """Memory-mapped lexicon file; store[name] is a CompactLexicon"""
+
+    def __init__(self, path=DEFAULT_PATH):
+        self.path = path
+        with open(path, 'rb') as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, header_length = _PREAMBLE.unpack_from(self._mmap, 0)
+        if magic != MAGIC or version != FORMAT_VERSION:
+            self._mmap.close()
+            raise ValueError(f"{path} is not a version {FORMAT_VERSION} lexicon file")
+        header = json.loads(self._mmap[_PREAMBLE.size:_PREAMBLE.size + header_length])
+        data_start = _align(_PREAMBLE.size + header_length)
+        self.sections = {
+            name: CompactLexicon(self._mmap, data_start + fields['base'], fields)
+            for name, fields in header['sections'].items()
+        }
+
+    def __getitem__(self, name):
+        return self.sections[name]
+
+    def __contains__(self, name):
+        return name in self.sections
+
+    def size(self):
+        return len(self._mmap)
+
+
+def vader_lexicon():
+    """NLTK's VADER lexicon as {word: valence}, parsed like SentimentIntensityAnalyzer.make_lex_dict"""
+    import nltk
+
+    lexicon_file = nltk.data.load("sentiment/vader_lexicon.zip/vader_lexicon/vader_lexicon.txt")
+    lexicon = {}
+    for line in lexicon_file.split("\n"):
+        (word, measure) = line.strip().split("\t")[0:2]
+        lexicon[word] = float(measure)
+    return lexicon
+
+
+def pattern_lexicon():
+    """TextBlob's pattern lexicon as {word: (polarity, intensity, is_adverb)}"""
+    from pattern_polarity import load_lexicon
+
+    return load_lexicon()
+
+
+def build_default(path=DEFAULT_PATH):
+    """Compile the VADER and pattern lexicons (whichever are installed) into path"""
+    lexicons = {}
+    for name, loader in (('vader', vader_lexicon), ('pattern', pattern_lexicon)):
+        try:
+            lexicons[name] = loader()
+        except (ImportError, LookupError) as e:
+            print(f"Skipping {name} lexicon: {e}")
+    return build(lexicons, path)
+
+
+def open_store(path=DEFAULT_PATH, build_missing=True):
+    """Map the lexicon file at path, compiling it first if it does not exist yet"""
+    if build_missing and not os.path.exists(path):
+        build_default(path)
+    return LexiconStore(path)
+
+
+def main(argv=None):
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument('--path', default=DEFAULT_PATH, help='Lexicon file')
+    parser = argparse.ArgumentParser(description='Compile or inspect the shared sentiment lexicon file')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    subparsers.add_parser('build', parents=[common], help='Compile the VADER and pattern lexicons')
+    subparsers.add_parser('info', parents=[common], help='Show the lexicons in the file')
+    args = parser.parse_args(argv)
+
+    if args.command == 'build':
+        build_default(args.path)
+    store = LexiconStore(args.path)
+    print(f"📦 Lexicon file: {store.path} ({store.size() / 1024:.1f} KB)")
+    for name, lexicon in store.sections.items():
+        print(f"   - {name}: {len(lexicon)} words, {lexicon.columns} value column(s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,372 @@
+#!/usr/bin/env python3
+"""
+Hashed-feature linear sentiment model
+
+A lightweight alternative to the VADER/TextBlob ensemble in sentiment.py.
+Every text is turned into a sparse vector of hashed features: normalized
+words (sentiment.lexicon_key), word bigrams, character 3- and 4-grams of
+each word and the sentiment emojis. Features are hashed with crc32 into a
+fixed number of buckets with a sign bit, so there is no vocabulary to store.
+A multinomial logistic regression over negative/neutral/positive is trained
+with mini-batch AdaGrad in NumPy and saved as a compact .npz file.
+
+Scoring a text is one sparse dot product of its feature vector with the
+weight matrix; select the model with sentiment.set_scorer('linear', path) or
+SENTIMENT_CONFIG['scorer'] = 'linear' in config.py.
+
+Usage:
+    python linear_model.py train [--output sentiment_model.npz] [--features 18] [--epochs 8]
+    python linear_model.py train --input labeled.jsonl [--field text] [--label-field sentiment]
+    python linear_model.py evaluate sentiment_model.npz --input labeled.jsonl
+
+Without --input, training uses the labeled Post and Comment rows of the
+app database.
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import tempfile
+import time
+from functools import lru_cache
+from zlib import crc32
+
+import numpy as np
+
+from sentiment import POLARITY_CAP, SENTIMENT_THRESHOLD, lexicon_key, preprocess, read_records
+
+DEFAULT_PATH = 'sentiment_model.npz'
+FORMAT_VERSION = 1
+
+CLASSES = ('negative', 'neutral', 'positive')
+_CLASS_INDEX = {label: index for index, label in enumerate(CLASSES)}
+
+DEFAULT_FEATURE_BITS = 18
+CHAR_NGRAMS = (3, 4)
+
+_SIGN_BIT = 0x80000000
+_HASH_MASK = 0xffffffff
+
+
+def _hash(feature):
+    return crc32(feature.encode('utf-8', 'surrogatepass'))
+
+
+@lru_cache(maxsize=65536)
+def _word_hashes(word):
+    """32-bit hashes of the features of one word token: its lexicon key and the key's character n-grams"""
+    key = lexicon_key(word)
+    padded = f"<{key}>"
+    hashes = [_hash('w:' + key)]
+    for size in CHAR_NGRAMS:
+        for start in range(len(padded) - size + 1):
+            hashes.append(_hash('c:' + padded[start:start + size]))
+    return tuple(hashes)
+
+
+@lru_cache(maxsize=1024)
+def _emoji_hash(emoji_char):
+    return _hash('e:' + emoji_char)
+
+
+def feature_hashes(document):
+    """32-bit hashes of every feature of a SentimentDocument, repeated features included"""
+    hashes = []
+    previous = None
+    for word in document.words:
+        word_hashes = _word_hashes(word)
+        hashes.extend(word_hashes)
+        if previous is not None:
+            # Bigram: combine the two word hashes instead of hashing the pair again
+            hashes.append((previous * 0x01000193 ^ word_hashes[0]) & _HASH_MASK)
+        previous = word_hashes[0]
+    for emoji_char in document.emojis:
+        hashes.append(_emoji_hash(emoji_char))
+    return hashes
+
+
+def vectorize(document, n_features):
+    """Return the (indices, values) of the hashed feature vector of a document
+
+    Repeated features keep one entry each, which sums to the same dot product
+    as merging them. Values are the hash signs scaled by 1/sqrt(feature count).
+    """
+    hashes = feature_hashes(document)
+    if not hashes:
+        return np.zeros(0, dtype=np.int64), np.zeros(0)
+    hashes = np.array(hashes, dtype=np.int64)
+    values = np.where(hashes & _SIGN_BIT, -1.0, 1.0)
+    values /= np.sqrt(len(hashes))
+    return hashes % n_features, values
+
+
+def vectorize_many(documents, n_features):
+    """Feature vectors of documents as CSR arrays (indptr, indices, values)"""
+    indptr = [0]
+    index_parts = []
+    value_parts = []
+    for document in documents:
+        indices, values = vectorize(document, n_features)
+        index_parts.append(indices)
+        value_parts.append(values)
+        indptr.append(indptr[-1] + len(indices))
+    indices = np.concatenate(index_parts) if index_parts else np.zeros(0, dtype=np.int64)
+    values = np.concatenate(value_parts) if value_parts else np.zeros(0)
+    return np.array(indptr, dtype=np.int64), indices, values
+
+
+def _row_ids(indptr):
+    return np.repeat(np.arange(len(indptr) - 1), np.diff(indptr))
+
+
+def _softmax(logits):
+    logits = logits - logits.max(axis=1, keepdims=True)
+    np.exp(logits, out=logits)
+    logits /= logits.sum(axis=1, keepdims=True)
+    return logits
+
+
+def _label_polarity(probabilities):
+    """Label and polarity arrays from class probabilities, consistent with the ensemble's thresholds
+
+    Polarity is P(positive) - P(negative), kept within the range of the
+    predicted label: up to the threshold for neutral, up to the cap otherwise.
+    """
+    predicted = probabilities.argmax(axis=1)
+    polarities = probabilities[:, 2] - probabilities[:, 0]
+    polarities = np.where(predicted == 2, np.clip(polarities, SENTIMENT_THRESHOLD, POLARITY_CAP), polarities)
+    polarities = np.where(predicted == 0, np.clip(polarities, -POLARITY_CAP, -SENTIMENT_THRESHOLD), polarities)
+    polarities = np.where(predicted == 1, np.clip(polarities, -SENTIMENT_THRESHOLD, SENTIMENT_THRESHOLD), polarities)
+    return np.array(CLASSES)[predicted], polarities
+
+
+class LinearSentimentModel:
+    """Trained weights of the hashed-feature logistic regression"""
+
+    def __init__(self, weights, bias, metadata=None, digest=None):
+        self.weights = weights
+        self.bias = bias
+        self.n_features = weights.shape[0]
+        self.metadata = metadata or {}
+        self.digest = digest
+
+    def probabilities(self, documents):
+        """Class probabilities (negative, neutral, positive) for each document"""
+        indptr, indices, values = vectorize_many(documents, self.n_features)
+        rows = _row_ids(indptr)
+        contributions = self.weights[indices] * values[:, None]
+        logits = np.empty((len(documents), len(CLASSES)))
+        for k in range(len(CLASSES)):
+            logits[:, k] = np.bincount(rows, weights=contributions[:, k], minlength=len(documents))
+        logits += self.bias
+        return _softmax(logits)
+
+    def score(self, document):
+        """Return (sentiment, polarity) for one SentimentDocument
+
+        Goes through predict(), so a text scores exactly the same alone and in
+        a batch (and whichever path put it in the score caches).
+        """
+        labels, polarities = self.predict([document])
+        return str(labels[0]), float(polarities[0])
+
+    def predict(self, documents):
+        """Return (labels, polarities) arrays for a list of SentimentDocuments"""
+        if not documents:
+            return np.array([], dtype='<U8'), np.zeros(0)
+        return _label_polarity(self.probabilities(documents))
+
+    def save(self, path):
+        """Write the model to path atomically as a compressed .npz file"""
+        directory = os.path.dirname(os.path.abspath(path))
+        fd, temporary = tempfile.mkstemp(suffix='.npz', dir=directory)
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                np.savez_compressed(
+                    f,
+                    format_version=np.int64(FORMAT_VERSION),
+                    weights=self.weights.astype(np.float32),
+                    bias=self.bias.astype(np.float32),
+                    classes=np.array(CLASSES),
+                    metadata=np.array(json.dumps(self.metadata)),
+                )
+            os.replace(temporary, path)
+        except BaseException:
+            os.unlink(temporary)
+            raise
+        self.digest = file_digest(path)
+
+
+def file_digest(path):
+    """Short content hash of a model file, used to tell models apart in the score caches"""
+    digest = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()[:16]
+
+
+def load(path=DEFAULT_PATH):
+    """Load a model saved by LinearSentimentModel.save"""
+    with np.load(path) as data:
+        if int(data['format_version']) != FORMAT_VERSION:
+            raise ValueError(f"{path}: unsupported model format {int(data['format_version'])}")
+        if tuple(data['classes']) != CLASSES:
+            raise ValueError(f"{path}: unexpected classes {tuple(data['classes'])}")
+        weights = data['weights'].astype(np.float64)
+        bias = data['bias'].astype(np.float64)
+        metadata = json.loads(str(data['metadata']))
+    return LinearSentimentModel(weights, bias, metadata, file_digest(path))
+
+
+def train(texts, labels, feature_bits=DEFAULT_FEATURE_BITS, epochs=8, learning_rate=0.5, l2=1e-6,
+          batch_size=256, seed=0):
+    """Fit a LinearSentimentModel to texts labeled 'negative', 'neutral' or 'positive'
+
+    Mini-batch AdaGrad on the multinomial log loss; only the weight rows of
+    features present in a batch are read and updated, and L2 regularization
+    is applied to those rows lazily. Texts without any feature are skipped.
+    """
+    n_features = 1 << feature_bits
+    documents = []
+    targets = []
+    for text, label in zip(texts, labels):
+        if label not in _CLASS_INDEX:
+            continue
+        document = preprocess(text)
+        if document.words or document.emojis:
+            documents.append(document)
+            targets.append(_CLASS_INDEX[label])
+    if not documents:
+        raise ValueError("no labeled texts with features to train on")
+
+    indptr, indices, values = vectorize_many(documents, n_features)
+    targets = np.array(targets)
+    weights = np.zeros((n_features, len(CLASSES)))
+    bias = np.zeros(len(CLASSES))
+    squared_gradients = np.full((n_features, len(CLASSES)), 1e-8)
+    squared_bias = np.full(len(CLASSES), 1e-8)
+    rng = np.random.default_rng(seed)
+    one_hot = np.eye(len(CLASSES))
+
+    for _ in range(epochs):
+        order = rng.permutation(len(documents))
+        for start in range(0, len(order), batch_size):
+            rows = order[start:start + batch_size]
+            # Gather the batch as CSR slices of the full matrix
+            lengths = indptr[rows + 1] - indptr[rows]
+            positions = np.repeat(indptr[rows] - np.cumsum(lengths) + lengths, lengths) + np.arange(lengths.sum())
+            batch_rows = np.repeat(np.arange(len(rows)), lengths)
+            features, inverse = np.unique(indices[positions], return_inverse=True)
+            batch_values = values[positions]
+
+            active = weights[features]
+            contributions = active[inverse] * batch_values[:, None]
+            logits = np.empty((len(rows), len(CLASSES)))
+            for k in range(len(CLASSES)):
+                logits[:, k] = np.bincount(batch_rows, weights=contributions[:, k], minlength=len(rows))
+            delta = (_softmax(logits + bias) - one_hot[targets[rows]]) / len(rows)
+
+            gradient = np.empty_like(active)
+            for k in range(len(CLASSES)):
+                gradient[:, k] = np.bincount(inverse, weights=batch_values * delta[batch_rows, k],
+                                             minlength=len(features))
+            gradient += l2 * active
+            squared_gradients[features] += gradient ** 2
+            weights[features] = active - learning_rate * gradient / np.sqrt(squared_gradients[features])
+
+            bias_gradient = delta.sum(axis=0)
+            squared_bias += bias_gradient ** 2
+            bias -= learning_rate * bias_gradient / np.sqrt(squared_bias)
+
+    model = LinearSentimentModel(weights, bias, {
+        'examples': len(documents),
+        'feature_bits': feature_bits,
+        'epochs': epochs,
+        'class_counts': {label: int((targets == index).sum()) for index, label in enumerate(CLASSES)},
+    })
+    predicted = model.predict(documents)[0]
+    model.metadata['training_accuracy'] = float(np.mean(predicted == np.array(CLASSES)[targets]))
+    return model
+
+
+def evaluate(model, texts, labels):
+    """Accuracy of model on labeled texts and its scoring speed"""
+    pairs = [(preprocess(text), label) for text, label in zip(texts, labels) if label in _CLASS_INDEX]
+    documents = [document for document, _ in pairs]
+    start = time.perf_counter()
+    predicted = [model.score(document)[0] for document in documents]
+    elapsed = time.perf_counter() - start
+    correct = sum(prediction == label for prediction, (_, label) in zip(predicted, pairs))
+    return {
+        'texts': len(pairs),
+        'accuracy': correct / len(pairs) if pairs else 0.0,
+        'texts_per_sec': len(pairs) / elapsed if elapsed else 0.0,
+    }
+
+
+def read_labeled(path, field='text', label_field='sentiment'):
+    """(texts, labels) from a .jsonl or .csv file with a text and a label column"""
+    texts = []
+    labels = []
+    for record in read_records(path):
+        texts.append(record.get(field) or '')
+        labels.append(record.get(label_field))
+    return texts, labels
+
+
+def load_database_rows():
+    """(texts, labels) of every Post (its scored_text) and Comment in the app database"""
+    from app import app
+    from models import Comment, Post
+
+    texts = []
+    labels = []
+    with app.app_context():
+        for post in Post.query.yield_per(1000):
+            texts.append(post.scored_text)
+            labels.append(post.sentiment)
+        for comment in Comment.query.yield_per(1000):
+            texts.append(comment.comment_text)
+            labels.append(comment.sentiment)
+    return texts, labels
+
+
+def main(argv=None):
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument('--input', help='Labeled .jsonl or .csv file (default: Post and Comment rows of the app database)')
+    common.add_argument('--field', default='text', help='JSON field or CSV column holding the text')
+    common.add_argument('--label-field', default='sentiment', help='JSON field or CSV column holding the label')
+    parser = argparse.ArgumentParser(description='Train or evaluate the hashed-feature linear sentiment model')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    train_parser = subparsers.add_parser('train', parents=[common], help='Train a model and save it as .npz')
+    train_parser.add_argument('--output', default=DEFAULT_PATH, help='Model file to write')
+    train_parser.add_argument('--features', type=int, default=DEFAULT_FEATURE_BITS, help='log2 of the number of hash buckets')
+    train_parser.add_argument('--epochs', type=int, default=8)
+    train_parser.add_argument('--learning-rate', type=float, default=0.5)
+    evaluate_parser = subparsers.add_parser('evaluate', parents=[common], help='Accuracy and speed of a saved model')
+    evaluate_parser.add_argument('model', help='Model file')
+    args = parser.parse_args(argv)
+
+    if args.input:
+        texts, labels = read_labeled(args.input, args.field, args.label_field)
+    else:
+        texts, labels = load_database_rows()
+    print(f"📚 {len(texts)} labeled texts")
+
+    if args.command == 'train':
+        start = time.perf_counter()
+        model = train(texts, labels, args.features, args.epochs, args.learning_rate)
+        model.save(args.output)
+        print(f"✅ Trained on {model.metadata['examples']} texts in {time.perf_counter() - start:.1f}s, "
+              f"training accuracy {model.metadata['training_accuracy']:.1%}")
+        print(f"📦 Model written to {args.output} ({os.path.getsize(args.output) / 1024:.1f} KB)")
+    else:
+        result = evaluate(load(args.model), texts, labels)
+        print(f"🎯 Accuracy {result['accuracy']:.1%} on {result['texts']} texts, "
+              f"{result['texts_per_sec']:.0f} texts/sec")
+
+
+if __name__ == "__main__":
+    main()
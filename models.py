@@ -1,7 +1,10 @@
 from flask_sqlalchemy import SQLAlchemy
 from datetime import datetime
+from sqlalchemy import inspect, text
 from werkzeug.security import generate_password_hash, check_password_hash
 
+from sentiment import scorer_version as current_scorer_version
+
 db = SQLAlchemy()
 
 class User(db.Model):
@@ -68,7 +71,35 @@ class User(db.Model):
             'created_at': self.created_at.isoformat() if self.created_at else None
         }
 
-class Post(db.Model):
+# Columns holding sentiment.COMPONENT_NAMES, in the same order
+COMPONENT_COLUMNS = ('vader_score', 'textblob_score', 'emoji_score', 'keyword_score', 'promotional_count')
+
+
+class SentimentComponents:
+    """Component scores behind sentiment/polarity, kept so another weighting can be
+    applied with reweight.py without re-analyzing the text (NULL: no components)"""
+    vader_score = db.Column(db.Float(precision=24), nullable=True)
+    textblob_score = db.Column(db.Float(precision=24), nullable=True)
+    emoji_score = db.Column(db.Float(precision=24), nullable=True)
+    keyword_score = db.Column(db.Float(precision=24), nullable=True)
+    promotional_count = db.Column(db.SmallInteger, nullable=True)
+    
+    def set_components(self, components):
+        """Store a components tuple or array row from the sentiment module; None or NaN clear them
+
+        VADER and TextBlob scores skipped by cascade mode (None or NaN) are
+        stored as NULL, so reweight.py leaves the row alone.
+        """
+        if components is None or components[2] is None or components[2] != components[2]:
+            values = (None,) * len(COMPONENT_COLUMNS)
+        else:
+            values = tuple(None if value is None or value != value else float(value)
+                           for value in components[:4]) + (int(components[4]),)
+        for column, value in zip(COMPONENT_COLUMNS, values):
+            setattr(self, column, value)
+
+
+class Post(SentimentComponents, db.Model):
     id = db.Column(db.Integer, primary_key=True)
     post_id = db.Column(db.String(100), unique=True, nullable=False)  # Changed from insta_post_id
     caption = db.Column(db.Text, nullable=False)
@@ -90,7 +121,7 @@ class Post(db.Model):
     video_url = db.Column(db.String(500), nullable=True)
     video_transcript = db.Column(db.Text, nullable=True)
     video_duration = db.Column(db.Integer, default=0)  # in seconds
-    detected_language = db.Column(db.String(10), nullable=True)  # Language code (e.g., 'en', 'ar', 'fr')
+    detected_language = db.Column(db.String(10), nullable=True)  # Language code (e.g., 'en', 'ar', 'fr', or 'mixed' from sentiment.detect_language)
     
     # Twitter specific fields
     tweet_text = db.Column(db.Text, nullable=True)
@@ -102,9 +133,18 @@ class Post(db.Model):
     overall_sentiment = db.Column(db.String(20), nullable=True)
     overall_polarity = db.Column(db.Float, nullable=True)
     
+    # sentiment.scorer_version() that computed sentiment/polarity (NULL: before versioning);
+    # stale rows are re-scored with `python rescore.py`
+    scorer_version = db.Column(db.String(40), nullable=True, default=current_scorer_version, index=True)
+    
     def __repr__(self):
         return f'<Post {self.post_id}>'
     
+    @property
+    def scored_text(self):
+        """The text sentiment/polarity are computed from: transcript, tweet text or caption"""
+        return self.video_transcript or self.tweet_text or self.caption
+    
     def to_dict(self):
         return {
             'id': self.id,
@@ -133,7 +173,7 @@ class Post(db.Model):
         return self.polarity
 
 
-class Comment(db.Model):
+class Comment(SentimentComponents, db.Model):
     """Model for storing comments on posts"""
     id = db.Column(db.Integer, primary_key=True)
     post_id = db.Column(db.Integer, db.ForeignKey('post.id'), nullable=False)
@@ -141,6 +181,7 @@ class Comment(db.Model):
     sentiment = db.Column(db.String(20), nullable=False)
     polarity = db.Column(db.Float, nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    scorer_version = db.Column(db.String(40), nullable=True, default=current_scorer_version, index=True)
     
     # Relationship
     post = db.relationship('Post', backref=db.backref('comments', lazy=True))
@@ -156,4 +197,28 @@ class Comment(db.Model):
             'sentiment': self.sentiment,
             'polarity': self.polarity,
             'created_at': self.created_at.isoformat() if self.created_at else None
-        }
\ No newline at end of file
+        }
+
+
+def add_missing_columns(engine):
+    """Add nullable columns of the models that an existing database does not have yet
+
+    db.create_all() only creates missing tables; this covers columns added
+    later (such as scorer_version) with ALTER TABLE, plus their indexes.
+    """
+    inspector = inspect(engine)
+    existing_tables = set(inspector.get_table_names())
+    with engine.begin() as connection:
+        for table in db.metadata.sorted_tables:
+            if table.name not in existing_tables:
+                continue
+            existing = {column['name'] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing or not column.nullable:
+                    continue
+                column_type = column.type.compile(dialect=engine.dialect)
+                connection.execute(text(f'ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}'))
+                print(f"Added column {table.name}.{column.name}")
+                for index in table.indexes:
+                    if column in index.columns.values():
+                        index.create(connection, checkfirst=True)
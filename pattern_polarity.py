@@ -0,0 +1,276 @@
+#!/usr/bin/env python3
+"""
+TextBlob-compatible polarity scorer without TextBlob
+
+TextBlob(text).sentiment.polarity builds a blob, a tokenizer and the pattern
+analyzer for every call, and every lexicon lookup goes through pattern's lazy
+dictionary. This module loads the same pattern lexicon (en-sentiment.xml from
+the installed textblob package) into plain dicts and applies the same
+tokenization, modifier, negation, exclamation and emoticon rules, so
+polarity(text) returns the same value as TextBlob several times faster.
+
+TextBlob remains the reference implementation: test_sentiment.py compares the
+two on a regression corpus.
+"""
+
+import os
+import re
+import threading
+from importlib.util import find_spec
+from xml.etree import ElementTree
+
+# Tokenizer settings from pattern (textblob/_text.py)
+PUNCTUATION = ".,;:!?()[]{}`''\"@#$^&*+-|=~_"
+
+ABBREVIATIONS = frozenset((
+    "a.", "adj.", "adv.", "al.", "a.m.", "c.", "cf.", "comp.", "conf.", "def.",
+    "ed.", "e.g.", "esp.", "etc.", "ex.", "f.", "fig.", "gen.", "id.", "i.e.",
+    "int.", "l.", "m.", "Med.", "Mil.", "Mr.", "n.", "n.q.", "orig.", "pl.",
+    "pred.", "pres.", "p.m.", "ref.", "v.", "vs.", "w/"
+))
+
+EMOTICONS = {  # (facial expression, sentiment)-keys
+    ("love", +1.00): ("<3", "♥"),
+    ("grin", +1.00): (">:D", ":-D", ":D", "=-D", "=D", "X-D", "x-D", "XD", "xD", "8-D"),
+    ("taunt", +0.75): (">:P", ":-P", ":P", ":-p", ":p", ":-b", ":b", ":c)", ":o)", ":^)"),
+    ("smile", +0.50): (">:)", ":-)", ":)", "=)", "=]", ":]", ":}", ":>", ":3", "8)", "8-)"),
+    ("wink", +0.25): (">;]", ";-)", ";)", ";-]", ";]", ";D", ";^)", "*-)", "*)"),
+    ("gasp", +0.05): (">:o", ":-O", ":O", ":o", ":-o", "o_O", "o.O", "°O°", "°o°"),
+    ("worry", -0.25): (">:/", ":-/", ":/", ":\\", ">:\\", ":-.", ":-s", ":s", ":S", ":-S", ">.>"),
+    ("frown", -0.75): (">:[", ":-(", ":(", "=(", ":-[", ":[", ":{", ":-<", ":c", ":-c", "=/"),
+    ("cry", -1.00): (":'(", ":'''(", ";'("),
+}
+
+NEGATIONS = frozenset(("no", "not", "n't", "never"))
+
+# Contractions split from the preceding word, applied in this order
+REPLACEMENTS = ("'d", "'m", "'s", "'ll", "'re", "'ve", "n't")
+
+END_OF_SENTENCE = "END-OF-SENTENCE"
+
+_LEADING_PUNCTUATION = tuple(PUNCTUATION.replace(".", ""))
+_TRAILING_PUNCTUATION = _LEADING_PUNCTUATION + (".",)
+_PUNCTUATION_CHARS = frozenset(PUNCTUATION)
+_SENTENCE_ENDS = frozenset(("...", ".", "!", "?", END_OF_SENTENCE))
+_SENTENCE_TAILS = frozenset(("'", "\"", "”", "’", "...", ".", "!", "?", ")", END_OF_SENTENCE))
+
+_REPLACEMENT_PATTERN = re.compile("|".join(re.escape(r) for r in REPLACEMENTS))
+_QUOTE_PATTERN = re.compile("[“”‘’'\"]")
+_LINEBREAK_PATTERN = re.compile(r"\n{2,}")
+_ABBREVIATION_PATTERNS = (
+    re.compile(r"^[A-Za-z]\.$"),  # single letter, "T. De Smedt"
+    re.compile(r"^([A-Za-z]\.)+$"),  # alternating letters, "U.S."
+    re.compile("^[A-Z][" + "|".join("bcdfghjklmnpqrstvwxz") + "]+.$"),  # capital followed by consonants, "Mr."
+)
+_SARCASM_PATTERN = re.compile(r"\( ?\! ?\)")
+_EMOTICON_PATTERN = re.compile(r"(%s)($|\s)" % "|".join(
+    r" ?".join(re.escape(c) for c in e) for emoticons in EMOTICONS.values() for e in emoticons
+))
+
+# Lowercased emoticon -> polarity; the first matching expression wins, as in pattern
+_EMOTICON_POLARITY = {}
+for (_, _polarity), _emoticons in EMOTICONS.items():
+    for _emoticon in _emoticons:
+        _EMOTICON_POLARITY.setdefault(_emoticon.lower(), _polarity)
+
+
+def _split_punctuation(token, tokens):
+    """Append token to tokens with leading/trailing punctuation split off (pattern.find_tokens)"""
+    tail = []
+    while token.startswith(_LEADING_PUNCTUATION) and token not in REPLACEMENTS:
+        tokens.append(token[0])
+        token = token[1:]
+    while token.endswith(_TRAILING_PUNCTUATION) and token not in REPLACEMENTS:
+        if token.endswith(_LEADING_PUNCTUATION):
+            tail.append(token[-1])
+            token = token[:-1]
+        # Split ellipsis (...) before splitting period
+        if token.endswith("..."):
+            tail.append("...")
+            token = token[:-3].rstrip(".")
+        # Split period (if not an abbreviation)
+        if token.endswith("."):
+            if token in ABBREVIATIONS or any(p.match(token) is not None for p in _ABBREVIATION_PATTERNS):
+                break
+            tail.append(token[-1])
+            token = token[:-1]
+    if token != "":
+        tokens.append(token)
+    tokens.extend(reversed(tail))
+
+
+def find_tokens(text):
+    """Return the sentences of text as space-separated token strings, exactly like TextBlob's tokenizer"""
+    # Every contraction starts with or contains an apostrophe
+    if "'" in text:
+        text = _REPLACEMENT_PATTERN.sub(lambda m: " " + m.group(), text)
+    text = _QUOTE_PATTERN.sub(lambda m: " " + m.group() + " ", text)
+    if "\n" in text:
+        text = _LINEBREAK_PATTERN.sub(f" {END_OF_SENTENCE} ", text.replace("\r\n", "\n"))
+
+    tokens = []
+    for token in text.split():
+        if token[0] in _PUNCTUATION_CHARS or token[-1] in _PUNCTUATION_CHARS:
+            _split_punctuation(token, tokens)
+        else:
+            tokens.append(token)
+
+    # Group tokens into sentences; citations, parentheses and repeated
+    # punctuation after a sentence end stay with that sentence
+    sentences = [[]]
+    i = j = 0
+    while j < len(tokens):
+        if tokens[j] in _SENTENCE_ENDS:
+            while j < len(tokens) and tokens[j] in _SENTENCE_TAILS:
+                if tokens[j] in ("'", "\"") and sentences[-1].count(tokens[j]) % 2 == 0:
+                    break  # Balanced quotes
+                j += 1
+            sentences[-1].extend(t for t in tokens[i:j] if t != END_OF_SENTENCE)
+            sentences.append([])
+            i = j
+        j += 1
+    sentences[-1].extend(tokens[i:j])
+
+    results = []
+    for sentence in sentences:
+        if not sentence:
+            continue
+        sentence = " ".join(sentence)
+        if "(" in sentence:
+            sentence = _SARCASM_PATTERN.sub("(!)", sentence)
+        sentence = _EMOTICON_PATTERN.sub(lambda m: m.group(1).replace(" ", "") + m.group(2), sentence)
+        results.append(sentence)
+    return results
+
+
+def lexicon_path():
+    """Path of en-sentiment.xml inside the installed textblob package (textblob is not imported)"""
+    spec = find_spec("textblob")
+    if spec is None or not spec.submodule_search_locations:
+        raise ImportError("textblob is not installed")
+    return os.path.join(list(spec.submodule_search_locations)[0], "en", "en-sentiment.xml")
+
+
+def _average(values):
+    return sum(values) / float(len(values) or 1)
+
+
+def load_lexicon(path=None):
+    """Load the pattern sentiment lexicon into {word: (polarity, intensity, is_adverb)}
+
+    Scores are averaged per part-of-speech tag and then across tags, and every
+    adjective gets an "-ly" adverb entry, in the same order as pattern so the
+    floating-point values are identical.
+    """
+    words = {}
+    root = ElementTree.parse(path or lexicon_path()).getroot()
+    for element in root.findall("word"):
+        form = element.attrib.get("form")
+        if form:
+            scores = (
+                float(element.attrib.get("polarity", 0.0)),
+                float(element.attrib.get("subjectivity", 0.0)),
+                float(element.attrib.get("intensity", 1.0)),
+            )
+            words.setdefault(form, {}).setdefault(element.attrib.get("pos"), []).append(scores)
+
+    for word in words:
+        words[word] = dict((pos, [_average(each) for each in zip(*scores)]) for pos, scores in words[word].items())
+    for word, tags in list(words.items()):
+        words[word][None] = [_average(each) for each in zip(*tags.values())]
+
+    # Map "terrible" to adverb "terribly"
+    for word, tags in list(words.items()):
+        if "JJ" in tags:
+            if word.endswith("y"):
+                word = word[:-1] + "i"
+            if word.endswith("le"):
+                word = word[:-2]
+            adverb = words.setdefault(word + "ly", {})
+            adverb["RB"] = adverb[None] = tuple(tags["JJ"])
+
+    return {word: (tags[None][0], tags[None][2], "RB" in tags) for word, tags in words.items()}
+
+
+class PatternPolarity:
+    """Polarity scorer equivalent to TextBlob's default PatternAnalyzer
+
+    The lexicon is loaded from path on the first call, unless a prebuilt
+    {word: (polarity, intensity, is_adverb)} mapping is given (for example the
+    shared read-only lexicon from lexicon_store.py).
+    """
+
+    def __init__(self, path=None, lexicon=None):
+        self.path = path
+        self._lexicon = lexicon
+        self._lock = threading.Lock()
+
+    @property
+    def lexicon(self):
+        if self._lexicon is None:
+            with self._lock:
+                if self._lexicon is None:
+                    self._lexicon = load_lexicon(self.path)
+        return self._lexicon
+
+    def polarity(self, text):
+        """Polarity between -1.0 and 1.0, the same value as TextBlob(text).sentiment.polarity"""
+        lexicon = self.lexicon
+        # Each assessment is [polarity, intensity, negated]
+        assessments = []
+        modifier = None  # Preceding known adverb ("really good")
+        negation = None  # Preceding negation ("not good")
+        for word in " ".join(find_tokens(text)).split():
+            word = word.lower()
+            entry = lexicon.get(word)
+            if entry is not None:
+                p, i, is_adverb = entry
+                if modifier is None:
+                    assessments.append([p, i, False])
+                else:
+                    last = assessments[-1]
+                    last[0] = max(-1.0, min(p * last[1], +1.0))
+                    last[1] = i
+                if negation is not None:
+                    assessments[-1][1] = 1.0 / assessments[-1][1]
+                    assessments[-1][2] = True
+                # A known word may itself be a modifier or a negation
+                modifier = word if is_adverb else None
+                negation = word if word in NEGATIONS else None
+            else:
+                if word in NEGATIONS:
+                    negation = word
+                # Retain negation across small words ("not a good")
+                elif negation and len(word.strip("'")) > 1:
+                    negation = None
+                # Negation preceded by a modifier ("really not good")
+                if negation is not None and modifier is not None and modifier.endswith("ly"):
+                    assessments[-1][2] = True
+                    negation = None
+                # Retain modifier across small words ("really is a good")
+                elif modifier and len(word) > 2:
+                    modifier = None
+                # Exclamation marks boost the previous word
+                if word == "!" and assessments:
+                    assessments[-1][0] = max(-1.0, min(assessments[-1][0] * 1.25, +1.0))
+                # Exclamation marks in parentheses indicate sarcasm
+                if word == "(!)":
+                    assessments.append([0.0, 1.0, False])
+                if word.isalpha() is False and len(word) <= 5 and word not in PUNCTUATION:
+                    emoticon = _EMOTICON_POLARITY.get(word)
+                    if emoticon is not None:
+                        assessments.append([emoticon, 1.0, False])
+
+        # "not good" = slightly bad, "not bad" = slightly good
+        total = 0
+        for p, _, negated in assessments:
+            total += p * -0.5 if negated else p
+        return total / float(len(assessments) or 1)
+
+
+_default_scorer = PatternPolarity()
+
+
+def polarity(text):
+    """TextBlob-compatible polarity of text using the shared scorer"""
+    return _default_scorer.polarity(text)
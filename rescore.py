@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+"""
+Re-score stored posts and comments after the sentiment scorer changed
+
+Rows whose scorer_version differs from sentiment.scorer_version() (or is
+NULL) are streamed in id order, one checkpoint of rows at a time (a
+server-side cursor where the database driver supports one), scored in
+batches with analyze_sentiment_batch and written back with an executemany
+UPDATE. Reads and the write of every checkpoint are short transactions, so
+the app keeps serving and writing while this runs (a cursor held open for
+the whole run would block SQLite writers); interrupting it loses at most
+the current checkpoint, and running it again continues with the rows that
+are still stale.
+
+Comments are re-scored first, then posts, whose overall_sentiment and
+overall_polarity are recomputed from their comments with the configured
+aggregation strategy (see aggregation.py). Posts without comment rows keep
+their stored overall: a tweet's also covers its replies, which are not
+stored. The component scores are stored as well, so reweight.py can work
+on them.
+
+Usage:
+    python rescore.py [--batch-size 500] [--checkpoint 5000] [--force] [--only comments|posts]
+"""
+
+import argparse
+import time
+
+from sqlalchemy import bindparam, func, or_, select
+
+from aggregation import aggregate
+from models import COMPONENT_COLUMNS, Comment, Post
+from sentiment import analyze_sentiment_batch, scorer_version
+
+
+def _stale(table, version, force):
+    return table.c.id > bindparam('last_id') if force else (
+        (table.c.id > bindparam('last_id')) & or_(table.c.scorer_version.is_(None), table.c.scorer_version != version)
+    )
+
+
+def _count(engine, table, version, force):
+    with engine.connect() as connection:
+        return connection.execute(select(func.count()).select_from(table).where(_stale(table, version, force)),
+                                  {'last_id': 0}).scalar()
+
+
+def _read(engine, columns, table, version, force, last_id, limit):
+    """Next checkpoint of stale rows after last_id, read in a short transaction"""
+    query = select(*columns).where(_stale(table, version, force)).order_by(table.c.id).limit(limit)
+    with engine.connect() as connection:
+        return connection.execution_options(stream_results=True).execute(query, {'last_id': last_id}).all()
+
+
+def _score(texts, batch_size):
+    """UPDATE parameters (sentiment, polarity and component columns) for texts, scored in batches"""
+    parameters = []
+    for start in range(0, len(texts), batch_size):
+        labels, polarities, components = analyze_sentiment_batch(texts[start:start + batch_size], components=True)
+        for label, polarity, row in zip(labels.tolist(), polarities.tolist(), components.tolist()):
+            values = {'new_sentiment': label, 'new_polarity': polarity}
+            if row[2] != row[2]:
+                # NaN: scored without components
+                values.update(dict.fromkeys(COMPONENT_COLUMNS))
+            else:
+                # VADER and TextBlob skipped by cascade mode are NaN, stored as NULL
+                values.update(zip(COMPONENT_COLUMNS, [None if value != value else value for value in row[:4]]
+                                  + [int(row[4])]))
+            parameters.append(values)
+    return parameters
+
+
+def _update(table, version, **values):
+    """executemany UPDATE of the scores of one row per parameter set, keyed by row_id"""
+    return table.update().where(table.c.id == bindparam('row_id')).values(
+        sentiment=bindparam('new_sentiment'), polarity=bindparam('new_polarity'), scorer_version=version,
+        **{column: bindparam(column) for column in COMPONENT_COLUMNS}, **values)
+
+
+class Progress:
+    """Prints rows done, total and rows/sec after every checkpoint"""
+
+    def __init__(self, name, total):
+        self.name = name
+        self.total = total
+        self.done = 0
+        self.start = time.perf_counter()
+
+    def update(self, rows):
+        self.done += rows
+        elapsed = time.perf_counter() - self.start
+        rate = self.done / elapsed if elapsed else 0.0
+        print(f"🔄 {self.name}: {self.done}/{self.total} rows ({rate:.0f} rows/sec)", flush=True)
+        return rate
+
+
+def rescore_comments(engine, version, batch_size=500, checkpoint=5000, force=False):
+    """Re-score stale comments; returns the number of rows updated"""
+    table = Comment.__table__
+    update = _update(table, version)
+    progress = Progress('comments', _count(engine, table, version, force))
+    last_id = 0
+    while True:
+        rows = _read(engine, (table.c.id, table.c.comment_text), table, version, force, last_id, checkpoint)
+        if not rows:
+            return progress.done
+        parameters = _score([row.comment_text for row in rows], batch_size)
+        for row, values in zip(rows, parameters):
+            values['row_id'] = row.id
+        with engine.begin() as connection:
+            connection.execute(update, parameters)
+        last_id = rows[-1].id
+        progress.update(len(rows))
+
+
+def rescore_posts(engine, version, batch_size=500, checkpoint=5000, force=False):
+    """Re-score stale posts and recompute the overall sentiment of those with comments; returns the rows updated"""
+    table = Post.__table__
+    comments = Comment.__table__
+    update = _update(table, version, overall_sentiment=bindparam('new_overall_sentiment'),
+                     overall_polarity=bindparam('new_overall_polarity'))
+    columns = (table.c.id, table.c.video_transcript, table.c.tweet_text, table.c.caption,
+               table.c.overall_sentiment, table.c.overall_polarity)
+    progress = Progress('posts', _count(engine, table, version, force))
+    last_id = 0
+    while True:
+        rows = _read(engine, columns, table, version, force, last_id, checkpoint)
+        if not rows:
+            return progress.done
+        parameters = _score([row.video_transcript or row.tweet_text or row.caption for row in rows], batch_size)
+        with engine.begin() as connection:
+            # Comments are read in the same transaction as the update, so
+            # comments added meanwhile are either all counted or all not
+            position = {row.id: index for index, row in enumerate(rows)}
+            post_comments = connection.execute(
+                select(comments.c.post_id, comments.c.sentiment, comments.c.polarity)
+                .where(comments.c.post_id.in_(list(position)))).all()
+            overall_labels, overall_polarities = aggregate(
+                [position[post_id] for post_id, _, _ in post_comments], [label for _, label, _ in post_comments],
+                [polarity or 0.0 for _, _, polarity in post_comments], len(rows))
+            commented = {post_id for post_id, _, _ in post_comments}
+            for row, values, overall_label, overall_polarity in zip(
+                    rows, parameters, overall_labels.tolist(), overall_polarities.tolist()):
+                values['row_id'] = row.id
+                if row.id in commented:
+                    values['new_overall_sentiment'] = overall_label
+                    values['new_overall_polarity'] = overall_polarity
+                else:
+                    values['new_overall_sentiment'] = row.overall_sentiment
+                    values['new_overall_polarity'] = row.overall_polarity
+            connection.execute(update, parameters)
+        last_id = rows[-1].id
+        progress.update(len(rows))
+
+
+def rescore(engine, batch_size=500, checkpoint=5000, force=False, only=None):
+    """Re-score comments, then posts, whose scorer_version is not the current one
+
+    Returns {'comments': rows, 'posts': rows}.
+    """
+    version = scorer_version()
+    print(f"🎯 Scorer version {version}")
+    result = {}
+    if only in (None, 'comments'):
+        result['comments'] = rescore_comments(engine, version, batch_size, checkpoint, force)
+    if only in (None, 'posts'):
+        result['posts'] = rescore_posts(engine, version, batch_size, checkpoint, force)
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Re-score stored posts and comments with the current sentiment scorer')
+    parser.add_argument('--batch-size', type=int, default=500, help='Texts per analyze_sentiment_batch call')
+    parser.add_argument('--checkpoint', type=int, default=5000, help='Rows per transaction')
+    parser.add_argument('--force', action='store_true', help='Re-score every row, not only stale ones')
+    parser.add_argument('--only', choices=('comments', 'posts'), help='Re-score one table only')
+    args = parser.parse_args(argv)
+
+    # Importing the app also adds the scorer_version columns to an older database
+    from app import app, db
+
+    with app.app_context():
+        start = time.perf_counter()
+        result = rescore(db.engine, args.batch_size, args.checkpoint, args.force, args.only)
+        elapsed = time.perf_counter() - start
+    total = sum(result.values())
+    print(f"✅ Re-scored {total} rows in {elapsed:.1f}s ({total / elapsed if elapsed else 0:.0f} rows/sec): "
+          + ', '.join(f"{count} {name}" for name, count in result.items()))
+
+
+if __name__ == "__main__":
+    main()
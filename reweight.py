@@ -0,0 +1,233 @@
+#!/usr/bin/env python3
+"""
+Try another weighting of the stored component scores without re-analysing any text
+
+Posts and comments keep the VADER, TextBlob, emoji, keyword and promotional
+scores their sentiment was combined from (see models.SentimentComponents).
+This loads those columns into NumPy arrays, recombines them with the given
+weights, threshold, promotional boost and cap (sentiment.combine_score_arrays)
+and reports how the label distribution would change. With --apply the rows
+whose label or polarity changed are written back in executemany batches, one
+short transaction per checkpoint, stamped with a scorer_version that names
+the weighting; posts' overall sentiment is recomputed from their comments
+(posts without comment rows, such as tweets, keep their stored overall).
+
+Rows without stored components (scored before they were kept, by the
+linear scorer, or in cascade mode without VADER and TextBlob) are left
+alone; rescore.py fills them in. Note that rescore.py
+treats reweighted rows as stale, so re-scoring returns them to the configured
+weights.
+
+Usage:
+    python reweight.py --weights 0.35 0.2 0.25 0.2 [--threshold 0.05] [--boost 0.1] [--cap 0.9] [--apply]
+"""
+
+import argparse
+import hashlib
+import time
+
+import numpy as np
+from sqlalchemy import bindparam, case, select
+
+from aggregation import SENTIMENT_ORDER, aggregate_codes, label_codes
+from models import COMPONENT_COLUMNS, Comment, Post
+from sentiment import (KEYWORD_WEIGHT, EMOJI_WEIGHT, POLARITY_CAP, PROMOTIONAL_BOOST, SCORER_VERSION,
+                       SENTIMENT_THRESHOLD, TEXTBLOB_WEIGHT, VADER_WEIGHT, combine_score_arrays, scorer_version)
+
+
+def weighting_version(weights, threshold, boost, cap):
+    """scorer_version stamped on reweighted rows: SCORER_VERSION plus a digest of the weighting
+
+    The digest also covers the full scorer_version() the components came
+    from, and is fixed length so the stamp always fits the scorer_version
+    column.
+    """
+    key = repr((scorer_version(), tuple(float(weight) for weight in weights), float(threshold), float(boost),
+                float(cap)))
+    return f"{SCORER_VERSION}+w:{hashlib.sha1(key.encode()).hexdigest()[:16]}"
+
+
+def load_components(engine, table, extra=(), scored_only=True, fetch_size=50000):
+    """Rows of table as one float array, by default only those that have stored components
+
+    Columns are id, label code (index into SENTIMENT_ORDER), polarity, the
+    five COMPONENT_COLUMNS (NaN where not stored), then any extra columns. Rows are
+    fetched in blocks of fetch_size.
+    """
+    label_code = case(*((table.c.sentiment == label, code) for code, label in enumerate(SENTIMENT_ORDER)),
+                      else_=len(SENTIMENT_ORDER) - 1)
+    query = (select(table.c.id, label_code, table.c.polarity,
+                    *(table.c[column] for column in COMPONENT_COLUMNS), *extra)
+             .order_by(table.c.id))
+    if scored_only:
+        query = query.where(table.c.vader_score.is_not(None))
+    # Plain DB-API tuples convert to an array an order of magnitude faster
+    # than result rows, so the (literal, parameter-free) query runs on the
+    # driver's own cursor
+    sql = str(query.compile(dialect=engine.dialect, compile_kwargs={'literal_binds': True}))
+    blocks = []
+    with engine.connect() as connection:
+        cursor = connection.connection.cursor()
+        try:
+            cursor.execute(sql)
+            while True:
+                rows = cursor.fetchmany(fetch_size)
+                if not rows:
+                    break
+                # None (NULL) becomes NaN
+                blocks.append(np.array(rows, dtype=np.float64))
+        finally:
+            cursor.close()
+    if not blocks:
+        return np.empty((0, 8 + len(extra)))
+    return np.concatenate(blocks)
+
+
+def recombine(rows, weights, threshold, boost, cap):
+    """(label codes, polarities) of load_components() rows under the given weighting"""
+    labels, polarities = combine_score_arrays(*rows[:, 3:8].T, weights=weights, threshold=threshold,
+                                              boost=boost, cap=cap)
+    return label_codes(labels), polarities
+
+
+def _changed(old, new):
+    # Component columns are single precision, so recombined polarities can
+    # differ from the stored ones in the last digits without any change
+    return ~np.isclose(old, new, rtol=0.0, atol=1e-6, equal_nan=True)
+
+
+def _distribution(codes):
+    counts = np.bincount(codes.astype(np.int64), minlength=len(SENTIMENT_ORDER))
+    return {label: int(count) for label, count in zip(SENTIMENT_ORDER, counts)}
+
+
+def _write(engine, update, parameters, checkpoint):
+    for start in range(0, len(parameters), checkpoint):
+        with engine.begin() as connection:
+            connection.execute(update, parameters[start:start + checkpoint])
+
+
+def reweight(engine, weights=None, threshold=None, boost=None, cap=None, apply=False, checkpoint=5000):
+    """Recombine stored components of comments and posts with a new weighting
+
+    Returns a report: for 'comments' and 'posts' the rows considered, the
+    label distribution before and after and the number of rows whose label
+    (or, for posts, overall label) changed; 'version' is the scorer_version
+    the weighting is stamped with and 'written' the rows updated when apply
+    is set.
+    """
+    weights = tuple(weights or (VADER_WEIGHT, TEXTBLOB_WEIGHT, EMOJI_WEIGHT, KEYWORD_WEIGHT))
+    threshold = SENTIMENT_THRESHOLD if threshold is None else threshold
+    boost = PROMOTIONAL_BOOST if boost is None else boost
+    cap = POLARITY_CAP if cap is None else cap
+    version = weighting_version(weights, threshold, boost, cap)
+    report = {'version': version, 'written': 0}
+
+    comments, posts = Comment.__table__, Post.__table__
+    # Every comment is loaded, as comments without components still count
+    # towards their post's overall sentiment with their stored score
+    all_comments = load_components(engine, comments, extra=(comments.c.post_id,), scored_only=False)
+    scored = ~np.isnan(all_comments[:, 3])
+    comment_rows = all_comments[scored]
+    comment_codes, comment_polarities = recombine(comment_rows, weights, threshold, boost, cap)
+    comment_changed = (comment_codes != comment_rows[:, 1]) | _changed(comment_rows[:, 2], comment_polarities)
+    report['comments'] = {
+        'rows': len(comment_rows), 'before': _distribution(comment_rows[:, 1]),
+        'after': _distribution(comment_codes), 'changed': int((comment_codes != comment_rows[:, 1]).sum()),
+    }
+
+    overall_code = case(*((posts.c.overall_sentiment == label, code) for code, label in enumerate(SENTIMENT_ORDER)),
+                        else_=-1)
+    post_rows = load_components(engine, posts, extra=(overall_code, posts.c.overall_polarity))
+    post_codes, post_polarities = recombine(post_rows, weights, threshold, boost, cap)
+
+    # Overall scores from the recombined comments of each post (stored scores
+    # for comments without components). Posts without comment rows keep their
+    # stored overall: for tweets it also covers replies that are not stored
+    codes = all_comments[:, 1].astype(np.int64)
+    polarities = np.nan_to_num(all_comments[:, 2])
+    codes[scored] = comment_codes
+    polarities[scored] = comment_polarities
+    post_ids = post_rows[:, 0].astype(np.int64)
+    comment_post_ids = np.nan_to_num(all_comments[:, 8], nan=-1).astype(np.int64)
+    position = np.minimum(np.searchsorted(post_ids, comment_post_ids), max(len(post_ids) - 1, 0))
+    counted = (post_ids[position] == comment_post_ids) if len(post_ids) else np.zeros(len(codes), dtype=bool)
+    overall_codes, overall_polarities = aggregate_codes(position[counted], codes[counted], polarities[counted],
+                                                        len(post_rows))
+    no_comments = overall_codes < 0
+    overall_codes = np.where(no_comments, post_rows[:, 8].astype(np.int64), overall_codes)
+    overall_polarities = np.where(no_comments, post_rows[:, 9], overall_polarities)
+    post_changed = ((post_codes != post_rows[:, 1]) | _changed(post_rows[:, 2], post_polarities)
+                    | (overall_codes != post_rows[:, 8]) | _changed(post_rows[:, 9], overall_polarities))
+    report['posts'] = {
+        'rows': len(post_rows), 'before': _distribution(post_rows[:, 1]), 'after': _distribution(post_codes),
+        'changed': int((post_codes != post_rows[:, 1]).sum()),
+        'overall_changed': int((overall_codes != post_rows[:, 8]).sum()),
+    }
+
+    if apply:
+        update = comments.update().where(comments.c.id == bindparam('row_id')).values(
+            sentiment=bindparam('new_sentiment'), polarity=bindparam('new_polarity'), scorer_version=version)
+        parameters = [
+            {'row_id': row_id, 'new_sentiment': SENTIMENT_ORDER[code], 'new_polarity': polarity}
+            for row_id, code, polarity in zip(comment_rows[comment_changed, 0].astype(np.int64).tolist(),
+                                              comment_codes[comment_changed].tolist(),
+                                              comment_polarities[comment_changed].tolist())
+        ]
+        _write(engine, update, parameters, checkpoint)
+        report['written'] += len(parameters)
+
+        update = posts.update().where(posts.c.id == bindparam('row_id')).values(
+            sentiment=bindparam('new_sentiment'), polarity=bindparam('new_polarity'),
+            overall_sentiment=bindparam('new_overall_sentiment'), overall_polarity=bindparam('new_overall_polarity'),
+            scorer_version=version)
+        # A missing overall (code -1, NaN polarity) stays NULL
+        parameters = [
+            {'row_id': row_id, 'new_sentiment': SENTIMENT_ORDER[code], 'new_polarity': polarity,
+             'new_overall_sentiment': SENTIMENT_ORDER[overall] if overall >= 0 else None,
+             'new_overall_polarity': None if np.isnan(overall_polarity) else overall_polarity}
+            for row_id, code, polarity, overall, overall_polarity in zip(
+                post_ids[post_changed].tolist(), post_codes[post_changed].tolist(),
+                post_polarities[post_changed].tolist(), overall_codes[post_changed].tolist(),
+                overall_polarities[post_changed].tolist())
+        ]
+        _write(engine, update, parameters, checkpoint)
+        report['written'] += len(parameters)
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Recombine stored component scores with another weighting')
+    parser.add_argument('--weights', type=float, nargs=4, metavar=('VADER', 'TEXTBLOB', 'EMOJI', 'KEYWORD'),
+                        default=[VADER_WEIGHT, TEXTBLOB_WEIGHT, EMOJI_WEIGHT, KEYWORD_WEIGHT])
+    parser.add_argument('--threshold', type=float, default=SENTIMENT_THRESHOLD, help='Neutral band half-width')
+    parser.add_argument('--boost', type=float, default=PROMOTIONAL_BOOST, help='Polarity added per promotional indicator')
+    parser.add_argument('--cap', type=float, default=POLARITY_CAP, help='Maximum absolute polarity')
+    parser.add_argument('--apply', action='store_true', help='Write changed rows (default: report only)')
+    parser.add_argument('--checkpoint', type=int, default=5000, help='Rows per transaction with --apply')
+    args = parser.parse_args(argv)
+
+    # Importing the app also adds the component columns to an older database
+    from app import app, db
+
+    with app.app_context():
+        start = time.perf_counter()
+        report = reweight(db.engine, args.weights, args.threshold, args.boost, args.cap, args.apply, args.checkpoint)
+        elapsed = time.perf_counter() - start
+
+    print(f"🎯 Weighting {report['version']}: weights {args.weights}, threshold {args.threshold}, "
+          f"boost {args.boost}, cap {args.cap}")
+    for name in ('comments', 'posts'):
+        table = report[name]
+        print(f"📊 {name}: {table['rows']} rows, {table['changed']} labels changed")
+        for label in SENTIMENT_ORDER:
+            print(f"   {label:<9} {table['before'][label]:>9} -> {table['after'][label]:>9}")
+    print(f"   {report['posts']['overall_changed']} post overall labels changed")
+    if args.apply:
+        print(f"✅ Wrote {report['written']} rows in {elapsed:.1f}s")
+    else:
+        print(f"✅ Dry run in {elapsed:.1f}s; pass --apply to write the changes")
+
+
+if __name__ == "__main__":
+    main()
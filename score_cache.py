@@ -0,0 +1,240 @@
+#!/usr/bin/env python3
+"""
+Persistent sentiment score cache shared by all worker processes
+
+Scores are stored in a SQLite table keyed by the content hash computed in
+sentiment.py (which already includes the scorer version). SQLite in WAL mode
+gives concurrent readers and serialized writers across gunicorn workers, and
+the cache survives restarts, so texts seen before skip VADER and TextBlob.
+
+Usage:
+    python score_cache.py stats [--path sentiment_cache.sqlite3]
+    python score_cache.py prune [--max-age SECONDS] [--max-entries N] [--keep-version V]
+    python score_cache.py clear
+"""
+
+import argparse
+import os
+import sqlite3
+import threading
+import time
+
+DEFAULT_PATH = 'sentiment_cache.sqlite3'
+
+# Recorded access times are refreshed at most this often to keep reads cheap
+TOUCH_INTERVAL = 3600
+
+# Run automatic eviction after this many writes
+PRUNE_EVERY = 1000
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sentiment_scores (
+    key BLOB PRIMARY KEY,
+    scorer_version TEXT NOT NULL,
+    sentiment TEXT NOT NULL,
+    polarity REAL NOT NULL,
+    vader REAL,
+    textblob REAL,
+    emoji REAL,
+    keyword REAL,
+    promotional INTEGER,
+    created_at REAL NOT NULL,
+    accessed_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS ix_sentiment_scores_accessed_at ON sentiment_scores (accessed_at);
+"""
+
+
+class DiskScoreCache:
+    """SQLite-backed score cache that is safe to share between processes
+
+    Each process (and thread) opens its own connection lazily, so the object
+    can be created before gunicorn forks its workers.
+    """
+
+    def __init__(self, path=DEFAULT_PATH, max_age=None, max_entries=None, timeout=5.0):
+        self.path = path
+        self.max_age = max_age
+        self.max_entries = max_entries
+        self.timeout = timeout
+        self._local = threading.local()
+        self._writes = 0
+
+    def _connection(self):
+        """Connection for the current process and thread"""
+        connection = getattr(self._local, 'connection', None)
+        if connection is not None and self._local.pid == os.getpid():
+            return connection
+
+        connection = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None)
+        connection.execute('PRAGMA journal_mode=WAL')
+        connection.execute('PRAGMA synchronous=NORMAL')
+        connection.executescript(SCHEMA)
+        self._local.connection = connection
+        self._local.pid = os.getpid()
+        return connection
+
+    def get_many(self, keys):
+        """Return {key: (sentiment, polarity, components)} for the keys that are cached and not expired
+
+        components is (vader, textblob, emoji, keyword, promotional_count), or
+        None for texts scored without the component analyzers; vader and
+        textblob alone are None when cascade mode skipped them.
+        """
+        keys = list(keys)
+        if not keys:
+            return {}
+
+        connection = self._connection()
+        now = time.time()
+        results = {}
+        stale = []
+        # Stay well below SQLite's bound-parameter limit
+        for start in range(0, len(keys), 500):
+            chunk = keys[start:start + 500]
+            placeholders = ','.join('?' * len(chunk))
+            rows = connection.execute(
+                f'SELECT key, sentiment, polarity, vader, textblob, emoji, keyword, promotional, '
+                f'created_at, accessed_at FROM sentiment_scores '
+                f'WHERE key IN ({placeholders})',
+                chunk,
+            ).fetchall()
+            for key, sentiment, polarity, *components, created_at, accessed_at in rows:
+                if self.max_age and now - created_at > self.max_age:
+                    continue
+                results[key] = (sentiment, polarity, tuple(components) if components[2] is not None else None)
+                if now - accessed_at > TOUCH_INTERVAL:
+                    stale.append((now, key))
+
+        if stale:
+            connection.executemany('UPDATE sentiment_scores SET accessed_at = ? WHERE key = ?', stale)
+        return results
+
+    def get(self, key):
+        """Return (sentiment, polarity, components) for key, or None"""
+        return self.get_many([key]).get(key)
+
+    def put_many(self, entries):
+        """Store entries of (key, scorer_version, sentiment, polarity, components)
+
+        components is (vader, textblob, emoji, keyword, promotional_count) or None.
+        """
+        now = time.time()
+        rows = []
+        for key, scorer_version, sentiment, polarity, components in entries:
+            vader, textblob, emoji_score, keyword, promotional = components or (None, None, None, None, None)
+            rows.append((key, scorer_version, sentiment, polarity, vader, textblob, emoji_score,
+                         keyword, promotional, now, now))
+        if not rows:
+            return
+
+        connection = self._connection()
+        with connection:
+            connection.execute('BEGIN IMMEDIATE')
+            connection.executemany(
+                'INSERT OR REPLACE INTO sentiment_scores '
+                '(key, scorer_version, sentiment, polarity, vader, textblob, emoji, keyword, promotional, '
+                'created_at, accessed_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                rows,
+            )
+
+        self._writes += len(rows)
+        if self._writes >= PRUNE_EVERY and (self.max_age or self.max_entries):
+            self._writes = 0
+            self.prune(self.max_age, self.max_entries)
+
+    def put(self, key, scorer_version, sentiment, polarity, components=None):
+        self.put_many([(key, scorer_version, sentiment, polarity, components)])
+
+    def prune(self, max_age=None, max_entries=None, keep_version=None):
+        """Delete expired entries, entries from other scorer versions and the least recently used overflow
+
+        Returns the number of deleted rows.
+        """
+        connection = self._connection()
+        deleted = 0
+        with connection:
+            connection.execute('BEGIN IMMEDIATE')
+            if keep_version is not None:
+                deleted += connection.execute(
+                    'DELETE FROM sentiment_scores WHERE scorer_version != ?', (keep_version,)
+                ).rowcount
+            if max_age:
+                deleted += connection.execute(
+                    'DELETE FROM sentiment_scores WHERE created_at < ?', (time.time() - max_age,)
+                ).rowcount
+            if max_entries is not None:
+                deleted += connection.execute(
+                    'DELETE FROM sentiment_scores WHERE key IN ('
+                    'SELECT key FROM sentiment_scores ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)',
+                    (max_entries,),
+                ).rowcount
+        return deleted
+
+    def clear(self):
+        """Delete every cached score"""
+        connection = self._connection()
+        with connection:
+            connection.execute('DELETE FROM sentiment_scores')
+
+    def stats(self):
+        """Entry counts per scorer version, age range and file size"""
+        connection = self._connection()
+        total, oldest, newest = connection.execute(
+            'SELECT COUNT(*), MIN(created_at), MAX(created_at) FROM sentiment_scores'
+        ).fetchone()
+        versions = dict(connection.execute(
+            'SELECT scorer_version, COUNT(*) FROM sentiment_scores GROUP BY scorer_version'
+        ).fetchall())
+        return {
+            'path': self.path,
+            'entries': total,
+            'versions': versions,
+            'oldest': oldest,
+            'newest': newest,
+            'size_bytes': os.path.getsize(self.path) if os.path.exists(self.path) else 0,
+        }
+
+    def close(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is not None:
+            connection.close()
+            self._local.connection = None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Inspect and prune the persistent sentiment score cache')
+    parser.add_argument('--path', default=DEFAULT_PATH, help='SQLite cache file')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    subparsers.add_parser('stats', help='Show entry counts per scorer version')
+
+    prune_parser = subparsers.add_parser('prune', help='Delete expired or excess entries')
+    prune_parser.add_argument('--max-age', type=float, help='Delete entries older than this many seconds')
+    prune_parser.add_argument('--max-entries', type=int, help='Keep at most this many recently used entries')
+    prune_parser.add_argument('--keep-version', help='Delete entries from every other scorer version')
+
+    subparsers.add_parser('clear', help='Delete every entry')
+
+    args = parser.parse_args(argv)
+    cache = DiskScoreCache(args.path)
+
+    if args.command == 'stats':
+        stats = cache.stats()
+        print(f"📦 Cache file: {stats['path']} ({stats['size_bytes'] / 1024:.1f} KB)")
+        print(f"Entries: {stats['entries']}")
+        for version, count in sorted(stats['versions'].items()):
+            print(f"   - scorer version {version}: {count}")
+        if stats['entries']:
+            print(f"Oldest entry: {time.ctime(stats['oldest'])}")
+            print(f"Newest entry: {time.ctime(stats['newest'])}")
+    elif args.command == 'prune':
+        deleted = cache.prune(args.max_age, args.max_entries, args.keep_version)
+        print(f"🧹 Deleted {deleted} cached scores")
+    elif args.command == 'clear':
+        cache.clear()
+        print("🧹 Score cache cleared")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,192 +1,934 @@
+import atexit
+import hashlib
+import json
+import os
 import re
-import arabic_reshaper
-from bidi.algorithm import get_display
-import emoji
-import nltk
-from nltk.sentiment import SentimentIntensityAnalyzer
-from textblob import TextBlob
-
-
-# Arabic & English Sentiment Words
-ARABIC_POSITIVE_WORDS = {
-    'ممتاز', 'رائع', 'جميل', 'عظيم', 'مذهل', 'مفيد', 'جيد', 'حلو', 'لذيذ', 'مريح',
-    'سعيد', 'فرحان', 'مبسوط', 'متحمس', 'مشجع', 'ممتازة', 'رائعة', 'جميلة', 'عظيمة',
-    'مذهلة', 'مفيدة', 'جيدة', 'حلوة', 'لذيذة', 'مريحة', 'سعيدة', 'فرحانة', 'مبسوطة',
-    'متحمسة', 'مشجعة', 'أفضل', 'أحسن', 'أجمل', 'أروع', 'أمتع', 'ألذ', 'أحلى',
-    'سريع', 'سريعة', 'أسرع', 'أسرع', 'بيناسب', 'مناسب', 'مناسبة', 'أفضل', 'أحسن',
-    'ممتاز', 'رائع', 'جميل', 'عظيم', 'مذهل', 'مفيد', 'جيد', 'حلو', 'لذيذ', 'مريح',
-    'excellent', 'amazing', 'great', 'good', 'wonderful', 'fantastic', 'awesome',
-    'beautiful', 'nice', 'perfect', 'love', 'like', 'enjoy', 'happy', 'excited',
-    'brilliant', 'outstanding', 'superb', 'magnificent', 'splendid', 'marvelous',
-    'delightful', 'pleasing', 'satisfying', 'enjoyable', 'pleasurable', 'grateful',
-    'thankful', 'blessed', 'fortunate', 'lucky', 'successful', 'winning', 'victorious',
-    'fast', 'fastest', 'quick', 'quickest', 'speedy', 'rapid', 'swift', 'efficient',
-    'convenient', 'suitable', 'appropriate', 'ideal', 'perfect', 'best', 'optimal',
-    'affordable', 'cheap', 'inexpensive', 'reasonable', 'value', 'deal', 'offer',
-    'service', 'broadband', 'wifi', 'internet', 'connection', 'available', 'ready'
-}
-
-ARABIC_NEGATIVE_WORDS = {
-    'سيء', 'رديء', 'مزعج', 'مؤلم', 'مخيب', 'سيئة', 'رديئة', 'مزعجة', 'مؤلمة',
-    'مخيبة', 'أسوأ', 'أردأ', 'أمزعج', 'أمؤلم', 'أمخيب', 'مكروه', 'مبغوض', 'مقرف',
-    'مقزز', 'مثير للاشمئزاز', 'مخجل', 'مخز', 'مخيب للأمل', 'محبط', 'محبطة',
-    'bad', 'terrible', 'awful', 'horrible', 'disgusting', 'hate', 'dislike',
-    'annoying', 'frustrating', 'disappointing', 'sad', 'angry', 'upset', 'dreadful',
-    'atrocious', 'appalling', 'revolting', 'repulsive', 'nauseating', 'sickening',
-    'offensive', 'insulting', 'humiliating', 'embarrassing', 'shameful', 'disgraceful',
-    'unpleasant', 'uncomfortable', 'painful', 'hurtful', 'harmful', 'damaging',
-    'destructive', 'ruinous', 'catastrophic', 'devastating', 'crushing', 'overwhelming'
-}
-
-# Emoji sentiment score dictionary
-EMOJI_SENTIMENT = {
-    # Very Positive
-    '😍': 1.0, '🥰': 1.0, '❤️': 1.0, '💖': 1.0, '💕': 1.0, '💗': 1.0, '💓': 1.0,
-    '🤩': 0.9, '😊': 0.9, '😁': 0.9, '😄': 0.9, '🙌': 0.9, '👏': 0.9, '🎉': 0.9,
-    
-    # Positive
-    '😊': 0.8, '😂': 0.8, '😎': 0.8, '👍': 0.8, '😃': 0.8, '😆': 0.8, '😉': 0.8,
-    '😋': 0.8, '😌': 0.8, '😇': 0.8, '🤗': 0.8, '🤔': 0.6, '🤓': 0.7, '😏': 0.5,
-    
-    # Neutral
-    '😐': 0.0, '😑': 0.0, '😶': 0.0, '🤐': 0.0, '😯': 0.0, '😦': 0.0, '😧': 0.0,
-    '😮': 0.0, '😲': 0.0, '😴': 0.0, '🤤': 0.0, '😪': 0.0, '😵': 0.0, '🤢': 0.0,
-    
-    # Negative
-    '😢': -0.6, '😞': -0.6, '😔': -0.6, '😩': -0.6, '😤': -0.6, '😣': -0.6,
-    '😖': -0.6, '😫': -0.6, '😓': -0.6, '😥': -0.6, '😰': -0.6, '😨': -0.6,
-    
-    # Very Negative
-    '😡': -0.9, '😠': -0.9, '😤': -0.9, '😭': -0.9, '👎': -0.9, '💔': -1.0,
-    '😈': -0.8, '👿': -0.8, '😱': -0.8, '😨': -0.8, '😰': -0.8, '😥': -0.8,
-    
-    # Additional positive emojis
-    '✨': 0.8, '🌟': 0.8, '💫': 0.8, '⭐': 0.8, '🔥': 0.8, '💯': 0.9, '💪': 0.8,
-    '🏆': 0.9, '🎯': 0.8, '🎊': 0.8, '🎈': 0.7, '🎁': 0.8, '🎂': 0.7, '🍰': 0.7,
-    
-    # Additional negative emojis
-    '💩': -0.8, '👻': -0.3, '☠️': -0.9, '💀': -0.8, '👹': -0.8, '👺': -0.8,
-    '😈': -0.8, '👿': -0.8, '🤡': -0.5, '👽': -0.3, '🤖': -0.2, '👾': -0.2
-}
-
-# Initialize sentiment analyzers
+import threading
+import time
+from collections import OrderedDict
+from functools import lru_cache
+from types import MappingProxyType
+from typing import NamedTuple
+
+# NumPy, NLTK and TextBlob are imported on first use
+# (see _get_vader_analyzer, _get_textblob and warmup)
+# so importing this module stays cheap for app workers and CLI scripts.
+
+
+# Arabic orthographic normalization: hamza-carrying alef forms to bare alef, alef
+# maqsura to ya, taa marbuta to ha; diacritics (harakat, tanween, shadda, sukun,
+# superscript alef) and tatweel are dropped
+_ARABIC_NORMALIZATION = str.maketrans({
+    **dict.fromkeys('\u0622\u0623\u0625\u0671', '\u0627'),
+    '\u0649': '\u064a',
+    '\u0629': '\u0647',
+    **dict.fromkeys([chr(code) for code in range(0x064b, 0x0660)] + ['\u0670', '\u0640']),
+})
+
+# The same Arabic letter three or more times in a row ('رااااائع'); doubled letters
+# are left alone since they are regular spelling ('ممتاز')
+_ARABIC_ELONGATION = re.compile('([\u0621-\u064a])\\1{2,}')
+
+# Clitics stripped from a token when it does not match as written
+# ('والخدمة', 'بالتوفيق'), longest first
+_ARABIC_PREFIXES = ('وال', 'بال', 'فال', 'كال', 'لل', 'ال', 'و', 'ف', 'ب')
+
+def normalize_arabic(text):
+    """Fold Arabic spelling variants: alef forms, alef maqsura, taa marbuta, diacritics, tatweel and elongation"""
+    if text.isascii():
+        return text
+    return _ARABIC_ELONGATION.sub(r'\1', text.translate(_ARABIC_NORMALIZATION))
+
+def lexicon_key(word):
+    """Lookup key of one lowercased word: normalize_arabic() plus the feminine ending dropped
+
+    Taa marbuta is already folded to ha, so 'ممتازة' and 'ممتازه' both become 'ممتاز'.
+    Three-letter words keep their final ha.
+    """
+    word = normalize_arabic(word)
+    if len(word) > 3 and word[-1] == '\u0647':
+        return word[:-1]
+    return word
+
+@lru_cache(maxsize=65536)
+def _token_keys(word):
+    """Candidate lexicon keys of a non-ASCII token: as written, then without a leading clitic"""
+    key = lexicon_key(word)
+    for prefix in _ARABIC_PREFIXES:
+        if key.startswith(prefix) and len(key) - len(prefix) >= 2:
+            return key, lexicon_key(key[len(prefix):])
+    return key,
+
+class TokenLexicon:
+    """Lexicon of normalized words and phrases matched against word tokens by hash lookups
+
+    Entries are keyed with lexicon_key() when the lexicon is built and tokens
+    when they are looked up, so each token costs one or two set lookups
+    whatever the lexicon size. Multi-word entries match consecutive tokens.
+    Hashtag tokens are split on '_' so '#great_service' matches 'great' and 'service'.
+    """
+
+    def __init__(self, entries):
+        keys = set()
+        phrase_starts = set()
+        phrase_lengths = set()
+        for entry in entries:
+            parts = entry.lower().split()
+            if len(parts) == 1:
+                keys.add(lexicon_key(parts[0]))
+            elif parts:
+                phrase = tuple(lexicon_key(part) for part in parts)
+                keys.add(phrase)
+                phrase_starts.add(phrase[0])
+                phrase_lengths.add(len(phrase))
+        self.keys = frozenset(keys)
+        self._phrase_starts = frozenset(phrase_starts)
+        self._phrase_lengths = tuple(sorted(phrase_lengths))
+
+    def find(self, words):
+        """Return the set of entry keys found among lowercased word tokens"""
+        keys = self.keys
+        found = set()
+        sequence = []
+        for word in words:
+            if word.isascii() and '_' not in word:
+                # ASCII words are their own key
+                sequence.append(word)
+                continue
+            for part in word.split('_'):
+                if part.isascii():
+                    sequence.append(part)
+                    continue
+                candidates = _token_keys(part)
+                if len(candidates) > 1 and candidates[0] not in keys and candidates[1] in keys:
+                    found.add(candidates[1])
+                sequence.append(candidates[0])
+        found.update(keys.intersection(sequence))
+        if self._phrase_starts and not self._phrase_starts.isdisjoint(sequence):
+            starts = self._phrase_starts
+            for index, key in enumerate(sequence):
+                if key in starts:
+                    for length in self._phrase_lengths:
+                        phrase = tuple(sequence[index:index + length])
+                        if phrase in keys:
+                            found.add(phrase)
+        return found
+
+
+class LexiconBundle:
+    """Keyword and emoji lexicons of one lexicon data file, compiled for scoring
+
+    Bundles are never modified once built: reload_lexicons() compiles a new
+    one and swaps the module's reference to it. preprocess() stores the
+    active bundle on the SentimentDocument and scoring uses that one, so an
+    analysis that was in flight during a reload finishes on the old version.
+    """
+
+    __slots__ = ('version', 'digest', 'path', 'positive', 'negative', 'promotional', 'emoji_sentiment',
+                 '_keywords', '_positive_keys', '_negative_keys', '_promotional_keys', '_emoji_table')
+
+    def __init__(self, data, path=None):
+        for category in ('positive', 'negative', 'promotional'):
+            entries = data.get(category)
+            if not isinstance(entries, list) or not all(isinstance(entry, str) and entry.strip() for entry in entries):
+                raise ValueError(f"Lexicon {category!r} must be a list of non-empty strings")
+        emojis = data.get('emoji')
+        if not isinstance(emojis, dict) or not all(
+                isinstance(score, (int, float)) and -1.0 <= score <= 1.0 for score in emojis.values()):
+            raise ValueError("Lexicon 'emoji' must map emojis to scores between -1 and 1")
+        # Text is only searched for _EMOJI_CLUSTER_PATTERN clusters, so other entries could never match
+        unmatchable = [emoji_char for emoji_char in emojis if not _EMOJI_CLUSTER_PATTERN.fullmatch(emoji_char)]
+        if unmatchable:
+            raise ValueError(f"Lexicon 'emoji' entries {', '.join(map(ascii, unmatchable))} are not single emoji "
+                             f"clusters recognised in text")
+
+        self.version = str(data.get('version', ''))
+        self.path = path
+        self.positive = frozenset(data['positive'])
+        self.negative = frozenset(data['negative'])
+        self.promotional = frozenset(data['promotional'])
+        self.emoji_sentiment = MappingProxyType({emoji_char: float(score) for emoji_char, score in emojis.items()})
+        # Content hash: identifies the lexicons in cache keys and stored scorer versions
+        canonical = json.dumps([sorted(self.positive), sorted(self.negative), sorted(self.promotional),
+                                list(self.emoji_sentiment.items())], ensure_ascii=False)
+        self.digest = hashlib.sha1(canonical.encode('utf-8')).hexdigest()[:8]
+
+        # Categories share entries, so one lookup table serves all three and
+        # the found keys are split per category afterwards
+        self._keywords = TokenLexicon(self.positive | self.negative | self.promotional)
+        self._positive_keys = TokenLexicon(self.positive).keys
+        self._negative_keys = TokenLexicon(self.negative).keys
+        self._promotional_keys = TokenLexicon(self.promotional).keys
+        # emoji -> (position in emoji_sentiment, score)
+        self._emoji_table = MappingProxyType({
+            emoji_char: (index, score) for index, (emoji_char, score) in enumerate(self.emoji_sentiment.items())
+        })
+
+    def distinct_emojis(self, clusters):
+        """Return the distinct sentiment emojis among emoji clusters, in emoji_sentiment order"""
+        table = self._emoji_table
+        found = set()
+        for cluster in clusters:
+            if cluster in table:
+                found.add(cluster)
+            elif cluster[0] in table:
+                # Variation selector on an emoji that is listed without one
+                found.add(cluster[0])
+        return sorted(found, key=lambda emoji_char: table[emoji_char][0])
+
+    def average_emoji_score(self, emojis):
+        """Average sentiment of distinct emojis as returned by distinct_emojis"""
+        if not emojis:
+            return 0.0
+        table = self._emoji_table
+        total = 0.0
+        for emoji_char in emojis:
+            total += table[emoji_char][1]
+        return total / len(emojis)
+
+    def count_keywords(self, words):
+        """Count distinct positive, negative and promotional entries among lowercased word tokens"""
+        found = self._keywords.find(words)
+        if not found:
+            return 0, 0, 0
+        return (
+            len(found & self._positive_keys),
+            len(found & self._negative_keys),
+            len(found & self._promotional_keys),
+        )
+
+    def info(self):
+        """Version, digest, data file and entry counts, as reported by the reload endpoint and CLI"""
+        return {
+            'version': self.version,
+            'digest': self.digest,
+            'path': self.path,
+            'positive': len(self.positive),
+            'negative': len(self.negative),
+            'promotional': len(self.promotional),
+            'emoji': len(self.emoji_sentiment),
+        }
+
+    def __repr__(self):
+        return f"LexiconBundle(version={self.version!r}, digest={self.digest!r})"
+
+
+def load_lexicons(path):
+    """Read and compile the lexicon data file at path (JSON); raises OSError or ValueError"""
+    with open(path, encoding='utf-8') as f:
+        data = json.load(f)
+    if not isinstance(data, dict):
+        raise ValueError(f"{path}: expected a JSON object")
+    return LexiconBundle(data, path)
+
+
+# One emoji cluster: a pictograph from the symbol/emoji blocks plus an optional
+# variation selector. Skin-tone and ZWJ sequences are split into their components,
+# so every sentiment emoji inside them is still found, exactly like a substring check.
+_EMOJI_CLUSTER_PATTERN = re.compile('[\u2600-\u27bf\u2b00-\u2bff\U0001f000-\U0001faff]\ufe0f?')
+
+
+def find_emojis(text):
+    """Return the distinct sentiment emojis in text, in EMOJI_SENTIMENT order"""
+    return _lexicons.distinct_emojis(_EMOJI_CLUSTER_PATTERN.findall(text))
+
+
+def distinct_emojis(clusters):
+    """Return the distinct sentiment emojis among emoji clusters, in EMOJI_SENTIMENT order"""
+    return _lexicons.distinct_emojis(clusters)
+
+
+def average_emoji_score(emojis):
+    """Average sentiment of distinct emojis as returned by find_emojis"""
+    return _lexicons.average_emoji_score(emojis)
+
+
+def score_emojis(text):
+    """Return (average emoji sentiment, number of distinct sentiment emojis) for text"""
+    lexicons = _lexicons
+    found = lexicons.distinct_emojis(_EMOJI_CLUSTER_PATTERN.findall(text))
+    return lexicons.average_emoji_score(found), len(found)
+
+
+def count_keywords(words):
+    """Count distinct positive, negative and promotional lexicon entries among lowercased word tokens
+
+    words is usually SentimentDocument.words; a string is tokenized first.
+    """
+    if isinstance(words, str):
+        words = _scan(words.lower(), keep_tokens=False).words
+    return _lexicons.count_keywords(words)
+
+# Sentiment analyzers, created on first use
 vader_analyzer = None
-try:
-    # Try to initialize VADER analyzer without downloading
-    vader_analyzer = SentimentIntensityAnalyzer()
-    print("NLTK sentiment analyzer loaded successfully!")
-except Exception as e:
-    print(f"Error loading NLTK: {e}")
-    vader_analyzer = None
+_vader_loaded = False
+_textblob_class = None
+_pattern_polarity = None
+_lexicon_store = None
+_lexicon_store_loaded = False
+_linear_model = None
+_analyzer_lock = threading.RLock()
+
+def _get_lexicon_store():
+    """Shared memory-mapped lexicons (lexicon_store.py), or None when LEXICON_PATH is not set"""
+    global _lexicon_store, _lexicon_store_loaded
+    if not _lexicon_store_loaded:
+        with _analyzer_lock:
+            if not _lexicon_store_loaded:
+                _lexicon_store = None
+                if LEXICON_PATH:
+                    try:
+                        from lexicon_store import open_store
+                        _lexicon_store = open_store(LEXICON_PATH)
+                    except Exception as e:
+                        print(f"Error loading shared lexicons from {LEXICON_PATH}: {e}")
+                _lexicon_store_loaded = True
+    return _lexicon_store
+
+def _get_vader_analyzer():
+    """VADER analyzer, created once on first use (None if NLTK or its lexicon is unavailable)"""
+    global vader_analyzer, _vader_loaded
+    if not _vader_loaded:
+        with _analyzer_lock:
+            if not _vader_loaded:
+                try:
+                    # Try to initialize VADER analyzer without downloading
+                    from nltk.sentiment import SentimentIntensityAnalyzer
+                    store = _get_lexicon_store()
+                    if store is not None and 'vader' in store:
+                        # Use the shared read-only lexicon instead of parsing a private copy
+                        from nltk.sentiment.vader import VaderConstants
+                        vader_analyzer = SentimentIntensityAnalyzer.__new__(SentimentIntensityAnalyzer)
+                        vader_analyzer.lexicon = store['vader']
+                        vader_analyzer.constants = VaderConstants()
+                    else:
+                        vader_analyzer = SentimentIntensityAnalyzer()
+                    print("NLTK sentiment analyzer loaded successfully!")
+                except Exception as e:
+                    print(f"Error loading NLTK: {e}")
+                    vader_analyzer = None
+                _vader_loaded = True
+    return vader_analyzer
+
+def _get_textblob():
+    """TextBlob class, imported on first use"""
+    global _textblob_class
+    if _textblob_class is None:
+        with _analyzer_lock:
+            if _textblob_class is None:
+                from textblob import TextBlob
+                _textblob_class = TextBlob
+    return _textblob_class
+
+def _get_pattern_polarity():
+    """Native TextBlob-compatible polarity function (pattern_polarity), imported on first use"""
+    global _pattern_polarity
+    if _pattern_polarity is None:
+        with _analyzer_lock:
+            if _pattern_polarity is None:
+                from pattern_polarity import PatternPolarity, polarity
+                store = _get_lexicon_store()
+                if store is not None and 'pattern' in store:
+                    _pattern_polarity = PatternPolarity(lexicon=store['pattern']).polarity
+                else:
+                    _pattern_polarity = polarity
+    return _pattern_polarity
+
+def warmup():
+    """Load every analyzer and lexicon now instead of on the first request
+    
+    Servers can call this at startup (or after forking workers) so the first
+    analysis does not pay the loading cost. Returns the seconds spent.
+    """
+    start = time.perf_counter()
+    import numpy  # noqa: F401
+    _get_vader_analyzer()
+    # The polarity scorer loads its pattern lexicon on the first lookup
+    textblob_score("warm up")
+    component_scores(preprocess("warm up the analyzers 👍"))
+    return time.perf_counter() - start
 
 # Initialize sentiment analyzer
 sentiment_analyzer = None
 
-# Simple sentiment analysis using keyword matching
-def advanced_sentiment_analysis(text):
-    """Advanced sentiment analysis using NLTK VADER and TextBlob for comprehensive word understanding"""
-    if not text:
-        return "neutral", 0.0
+# Component weights: VADER 30%, TextBlob 25%, Emojis 25%, Keywords 20%
+VADER_WEIGHT = 0.3
+TEXTBLOB_WEIGHT = 0.25
+EMOJI_WEIGHT = 0.25
+KEYWORD_WEIGHT = 0.2
+
+# Order of the component scores in components tuples and arrays. vader and
+# textblob are None (NaN in arrays) when cascade mode skipped those scorers
+COMPONENT_NAMES = ('vader', 'textblob', 'emoji', 'keyword', 'promotional_count')
+
+# Boost per promotional indicator, polarity cap and positive/negative threshold
+PROMOTIONAL_BOOST = 0.1
+POLARITY_CAP = 0.9
+SENTIMENT_THRESHOLD = 0.05
+
+# Lexicon data file shipped with the code (SENTIMENT_CONFIG['lexicon_data_path'] in config.py
+# points elsewhere); its 'version' must be bumped with every change
+BUNDLED_LEXICON_DATA = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'lexicons', 'sentiment_words.json')
+
+# Fixed-width label dtype used by the batch API
+LABEL_DTYPE = '<U8'
+
+# Version of the scoring logic; bump whenever weights or scorers change so cached
+# scores from an older version are never reused. Lexicon changes are covered by
+# the lexicon digest in the cache keys (see _update_cache_variant)
+SCORER_VERSION = "6"
+
+# Score cache settings (CACHE_CONFIG in config.py)
+try:
+    from config import CACHE_CONFIG
+except ImportError:
+    CACHE_CONFIG = {
+        'enabled': True,
+        'timeout': 300,  # 5 minutes
+        'max_size': 1000,
+        'disk_path': None  # Persistent cross-worker cache disabled
+    }
+
+# TextBlob polarity implementation (SENTIMENT_CONFIG['polarity_scorer'] in config.py):
+# 'pattern' is the native port in pattern_polarity.py and returns the same scores
+# several times faster, 'textblob' is the reference implementation
+POLARITY_SCORERS = ('pattern', 'textblob')
+
+# Scorer (SENTIMENT_CONFIG['scorer'] in config.py): 'ensemble' combines VADER,
+# TextBlob, emojis and keywords; 'linear' is the hashed-feature model trained
+# with `python linear_model.py train` and saved at linear_model_path
+SCORERS = ('ensemble', 'linear')
+try:
+    from config import SENTIMENT_CONFIG
+    POLARITY_SCORER = SENTIMENT_CONFIG.get('polarity_scorer', 'pattern')
+    SCORER = SENTIMENT_CONFIG.get('scorer', 'ensemble')
+    LINEAR_MODEL_PATH = SENTIMENT_CONFIG.get('linear_model_path', 'sentiment_model.npz')
+    LEXICON_PATH = SENTIMENT_CONFIG.get('lexicon_path')
+    PROFILING = SENTIMENT_CONFIG.get('profiling', False)
+    CASCADE_BAND = SENTIMENT_CONFIG.get('cascade_band') if SENTIMENT_CONFIG.get('cascade') else None
+    CASCADE_AUDIT_EVERY = SENTIMENT_CONFIG.get('cascade_audit_every', 0)
+    LEXICON_DATA_PATH = SENTIMENT_CONFIG.get('lexicon_data_path') or BUNDLED_LEXICON_DATA
+    LEXICON_CHECK_INTERVAL = SENTIMENT_CONFIG.get('lexicon_check_interval', 30)
+except ImportError:
+    POLARITY_SCORER = 'pattern'
+    SCORER = 'ensemble'
+    LINEAR_MODEL_PATH = 'sentiment_model.npz'
+    LEXICON_PATH = None  # Every process builds its own lexicon dicts
+    PROFILING = False  # Per-stage timings (enable_profiling)
+    CASCADE_BAND = None  # Cascade mode off: VADER and TextBlob always run
+    CASCADE_AUDIT_EVERY = 0
+    LEXICON_DATA_PATH = BUNDLED_LEXICON_DATA
+    LEXICON_CHECK_INTERVAL = 30  # Seconds between checks of the lexicon data file (0 = never)
+
+# Keyword and emoji lexicons, compiled from LEXICON_DATA_PATH at import. A
+# broken configured file falls back to the bundled one so workers still start
+def _file_signature(path):
+    stat = os.stat(path)
+    return stat.st_mtime_ns, stat.st_size
+
+try:
+    _lexicon_signature = _file_signature(LEXICON_DATA_PATH)
+    _lexicons = load_lexicons(LEXICON_DATA_PATH)
+except (OSError, ValueError) as e:
+    if LEXICON_DATA_PATH == BUNDLED_LEXICON_DATA:
+        raise
+    print(f"Could not load the sentiment lexicons from {LEXICON_DATA_PATH}, using the bundled ones: {e}")
+    LEXICON_DATA_PATH = BUNDLED_LEXICON_DATA
+    _lexicon_signature = _file_signature(LEXICON_DATA_PATH)
+    _lexicons = load_lexicons(LEXICON_DATA_PATH)
+
+# Entries of the active bundle, for reference; scoring reads the bundle itself
+ARABIC_POSITIVE_WORDS = _lexicons.positive
+ARABIC_NEGATIVE_WORDS = _lexicons.negative
+PROMOTIONAL_INDICATORS = _lexicons.promotional
+EMOJI_SENTIMENT = _lexicons.emoji_sentiment
+
+_lexicon_reload_lock = threading.Lock()
+_lexicon_next_check = 0.0
+
+def get_lexicons():
+    """The active LexiconBundle"""
+    return _lexicons
+
+def reload_lexicons(path=None):
+    """Compile the lexicon data file at path (default LEXICON_DATA_PATH) and make it the active bundle
+
+    The new bundle is built while scoring goes on with the old one, then
+    swapped in with a single reference assignment; analyses already in
+    flight finish on the bundle they started with. Cached scores are keyed by
+    the lexicon digest, so scores from the old lexicons are not served again.
+    Raises OSError or ValueError, leaving the active bundle in place, when the
+    file cannot be read or is invalid. Returns (previous bundle, new bundle).
+    """
+    global LEXICON_DATA_PATH, _lexicons, _lexicon_signature
+    global ARABIC_POSITIVE_WORDS, ARABIC_NEGATIVE_WORDS, PROMOTIONAL_INDICATORS, EMOJI_SENTIMENT
+    path = path or LEXICON_DATA_PATH
+    with _lexicon_reload_lock:
+        signature = _file_signature(path)
+        bundle = load_lexicons(path)
+        previous = _lexicons
+        # The bundle before the cache key suffix: a key computed just before
+        # the swap can then only store new scores under the retired suffix
+        _lexicons = bundle
+        _update_cache_variant()
+        LEXICON_DATA_PATH, _lexicon_signature = path, signature
+        ARABIC_POSITIVE_WORDS, ARABIC_NEGATIVE_WORDS = bundle.positive, bundle.negative
+        PROMOTIONAL_INDICATORS, EMOJI_SENTIMENT = bundle.promotional, bundle.emoji_sentiment
+    print(f"📚 Sentiment lexicons {previous.version} ({previous.digest}) -> {bundle.version} ({bundle.digest})")
+    return previous, bundle
+
+def _check_lexicon_file():
+    """Reload the lexicons in a background thread when their data file changed
+
+    Called from the analysis entry points at most every LEXICON_CHECK_INTERVAL
+    seconds, so every worker process (gunicorn workers, SentimentPool
+    processes) picks up a new file without a restart.
+    """
+    global _lexicon_next_check
+    _lexicon_next_check = time.monotonic() + LEXICON_CHECK_INTERVAL
+    try:
+        changed = _file_signature(LEXICON_DATA_PATH) != _lexicon_signature
+    except OSError:
+        return
+    if changed and not _lexicon_reload_lock.locked():
+        threading.Thread(target=_reload_changed_lexicons, name='lexicon-reload', daemon=True).start()
+
+def _reload_changed_lexicons():
+    global _lexicon_signature
+    path = LEXICON_DATA_PATH
+    try:
+        reload_lexicons(path)
+    except (OSError, ValueError) as e:
+        print(f"Could not reload the sentiment lexicons from {path}, keeping version {_lexicons.version}: {e}")
+        # Retried once the file changes again
+        try:
+            _lexicon_signature = _file_signature(path)
+        except OSError:
+            pass
+
+def configure_lexicon_store(path):
+    """Use the compiled lexicon file at path (built on first use if missing), or private dicts if None
+
+    Analyzers that were already loaded are reloaded on their next use.
+    """
+    global LEXICON_PATH, _lexicon_store, _lexicon_store_loaded, vader_analyzer, _vader_loaded, _pattern_polarity
+    with _analyzer_lock:
+        LEXICON_PATH = path
+        _lexicon_store = None
+        _lexicon_store_loaded = False
+        vader_analyzer = None
+        _vader_loaded = False
+        _pattern_polarity = None
+
+def set_scorer(name, model_path=None):
+    """Select the scorer ('ensemble' or 'linear'); 'linear' loads the model at model_path or LINEAR_MODEL_PATH
+
+    Scores from the two scorers, and from different model files, are cached
+    under different keys.
+    """
+    global SCORER, LINEAR_MODEL_PATH, _linear_model, _linear_model_digest
+    if name not in SCORERS:
+        raise ValueError(f"Unknown scorer {name!r}; expected one of {SCORERS}")
+    with _analyzer_lock:
+        if name == 'linear':
+            import linear_model
+            path = model_path or LINEAR_MODEL_PATH
+            model = linear_model.load(path)
+            LINEAR_MODEL_PATH, _linear_model, _linear_model_digest = path, model, model.digest
+        SCORER = name
+        _update_cache_variant()
+
+def set_polarity_scorer(name):
+    """Select the TextBlob polarity implementation ('pattern' or 'textblob')"""
+    global POLARITY_SCORER
+    if name not in POLARITY_SCORERS:
+        raise ValueError(f"Unknown polarity scorer {name!r}; expected one of {POLARITY_SCORERS}")
+    POLARITY_SCORER = name
+
+# Opt-in per-stage profiling. Every stage of an analysis (preprocess, vader,
+# textblob, emoji, keywords, or linear with the linear scorer) runs through _stage(), which only reads the clock
+# when profile hooks are registered; hooks are called as hook(stage, seconds)
+PROFILE_STAGES = ('preprocess', 'vader', 'textblob', 'emoji', 'keywords', 'linear')
+
+_profile_hooks = ()
+_profile_hooks_lock = threading.Lock()
+
+def add_profile_hook(hook):
+    """Call hook(stage, seconds) after every analysis stage"""
+    global _profile_hooks
+    with _profile_hooks_lock:
+        if hook not in _profile_hooks:
+            _profile_hooks = _profile_hooks + (hook,)
+
+def remove_profile_hook(hook):
+    global _profile_hooks
+    with _profile_hooks_lock:
+        _profile_hooks = tuple(h for h in _profile_hooks if h is not hook)
+
+def _stage(name, function, argument):
+    """function(argument), timed as stage name when profiling is enabled"""
+    hooks = _profile_hooks
+    if not hooks:
+        return function(argument)
+    start = time.perf_counter()
+    try:
+        return function(argument)
+    finally:
+        elapsed = time.perf_counter() - start
+        for hook in hooks:
+            hook(name, elapsed)
+
+class StageProfile:
+    """Profile hook that accumulates call counts and seconds per stage"""
     
-    # Clean the text
-    cleaned_text = clean_text(text)
-    if not cleaned_text:
-        return "neutral", 0.0
+    def __init__(self):
+        self._stages = {}
+        self._lock = threading.Lock()
     
-    # Initialize scores
-    vader_score = 0.0
-    textblob_score = 0.0
-    emoji_score = 0.0
-    emoji_count = 0
-    keyword_score = 0.0
+    def __call__(self, stage, seconds):
+        with self._lock:
+            entry = self._stages.get(stage)
+            if entry is None:
+                self._stages[stage] = [1, seconds]
+            else:
+                entry[0] += 1
+                entry[1] += seconds
     
-    # Analyze emojis first
-    for emoji_char, score in EMOJI_SENTIMENT.items():
-        if emoji_char in text:
-            emoji_score += score
-            emoji_count += 1
+    def reset(self):
+        with self._lock:
+            self._stages.clear()
     
-    # Calculate average emoji sentiment if emojis found
-    if emoji_count > 0:
-        emoji_score = emoji_score / emoji_count
+    def stats(self):
+        """{stage: {'calls', 'seconds', 'mean_us'}}, in PROFILE_STAGES order"""
+        with self._lock:
+            stages = {name: tuple(entry) for name, entry in self._stages.items()}
+        order = [name for name in PROFILE_STAGES if name in stages] + sorted(set(stages) - set(PROFILE_STAGES))
+        return {
+            name: {
+                'calls': stages[name][0],
+                'seconds': stages[name][1],
+                'mean_us': stages[name][1] / stages[name][0] * 1e6,
+            }
+            for name in order
+        }
+
+_stage_profile = StageProfile()
+
+def enable_profiling(reset=False):
+    """Start accumulating per-stage timings (see get_profile_stats)"""
+    if reset:
+        _stage_profile.reset()
+    add_profile_hook(_stage_profile)
+
+def disable_profiling():
+    """Stop accumulating per-stage timings; collected stats are kept"""
+    remove_profile_hook(_stage_profile)
+
+def reset_profile():
+    _stage_profile.reset()
+
+def get_profile_stats():
+    """Whether profiling is enabled and the cumulative calls and time per stage"""
+    return {'enabled': _stage_profile in _profile_hooks, 'stages': _stage_profile.stats()}
+
+if PROFILING:
+    enable_profiling()
+
+def keyword_score(positive_count, negative_count):
+    """Convert positive/negative keyword counts into a score between -0.9 and 0.9"""
+    if positive_count > 0 or negative_count > 0:
+        score = (positive_count - negative_count) / max(positive_count + negative_count, 1)
+        return max(-0.9, min(0.9, score))
+    return 0.0
+
+def vader_score(cleaned_text):
+    """VADER compound score (-1 to 1) for cleaned text"""
+    analyzer = _get_vader_analyzer()
+    if not analyzer:
+        return 0.0
+    try:
+        vader_scores = analyzer.polarity_scores(cleaned_text)
+        return vader_scores['compound']  # Compound score ranges from -1 to 1
+    except Exception as e:
+        print(f"VADER analysis error: {e}")
+        return 0.0
+
+def textblob_score(cleaned_text):
+    """TextBlob polarity (-1 to 1) for cleaned text, computed by the selected POLARITY_SCORER"""
+    try:
+        if POLARITY_SCORER == 'textblob':
+            blob = _get_textblob()(cleaned_text)
+            return blob.sentiment.polarity  # Ranges from -1 to 1
+        return _get_pattern_polarity()(cleaned_text)
+    except Exception as e:
+        print(f"TextBlob analysis error: {e}")
+        return 0.0
+
+def english_weight(document):
+    """Weight of the English-only scorers (VADER and TextBlob) for a document's script
     
-    # Analyze keywords for Arabic and English
-    text_lower = text.lower()
-    positive_count = 0
-    negative_count = 0
+    Arabic text skips them, mixed text blends them by its share of Latin
+    letters, Latin text and text without letters (emoticons) use them fully.
+    """
+    if document.script == "arabic":
+        return 0.0
+    if document.script == "mixed":
+        return document.latin_share
+    return 1.0
+
+def english_scores(document):
+    """(vader, textblob) scores of a document, weighted by english_weight()"""
+    weight = english_weight(document)
+    if not weight:
+        return 0.0, 0.0
+    return (_stage('vader', vader_score, document.cleaned) * weight,
+            _stage('textblob', textblob_score, document.cleaned) * weight)
+
+# Cascade mode: the cheap emoji, keyword and promotional scores run first and
+# VADER/TextBlob are skipped (counted as 0.0) when that partial score is
+# already further than CASCADE_BAND beyond the positive/negative threshold.
+# Scores differ slightly from full scoring, so cache keys include the band
+_cache_variant = ""
+_linear_model_digest = None
+
+def _update_cache_variant():
+    """Set the cache key suffix for the current scorer, lexicons and cascade settings
+
+    The linear scorer's suffix names the lexicons too: its emoji features are
+    the emojis found with the active emoji lexicon.
+    """
+    global _cache_variant
+    if SCORER == 'linear':
+        _cache_variant = f"+linear:{_linear_model_digest}+lex:{_lexicons.digest}"
+    elif CASCADE_BAND is not None:
+        _cache_variant = f"+lex:{_lexicons.digest}+cascade{CASCADE_BAND!r}"
+    else:
+        _cache_variant = f"+lex:{_lexicons.digest}"
+
+class CascadeStats:
+    """Early-exit and audit counters of cascade mode
     
-    # Check for positive keywords
-    for word in ARABIC_POSITIVE_WORDS:
-        if word.lower() in text_lower:
-            positive_count += 1
+    Texts that would run VADER/TextBlob are 'eligible'; every
+    audit_every-th early exit is also fully scored to measure how often the
+    early label agrees with the full one.
+    """
     
-    # Check for negative keywords
-    for word in ARABIC_NEGATIVE_WORDS:
-        if word.lower() in text_lower:
-            negative_count += 1
+    def __init__(self, audit_every=0):
+        self.audit_every = audit_every
+        self._lock = threading.Lock()
+        self.reset()
     
-    # Calculate keyword score
-    if positive_count > 0 or negative_count > 0:
-        keyword_score = (positive_count - negative_count) / max(positive_count + negative_count, 1)
-        keyword_score = max(-0.9, min(0.9, keyword_score))
+    def reset(self):
+        with self._lock:
+            self.eligible = self.early_exits = self.audited = self.agreed = 0
     
-    # Use NLTK VADER for English text analysis
-    if vader_analyzer:
-        try:
-            vader_scores = vader_analyzer.polarity_scores(cleaned_text)
-            vader_score = vader_scores['compound']  # Compound score ranges from -1 to 1
-        except Exception as e:
-            print(f"VADER analysis error: {e}")
-            vader_score = 0.0
+    def record(self, early_exit):
+        """Count one eligible text; returns True when this early exit should be audited"""
+        with self._lock:
+            self.eligible += 1
+            if not early_exit:
+                return False
+            self.early_exits += 1
+            return bool(self.audit_every) and self.early_exits % self.audit_every == 0
+    
+    def record_audit(self, agreed):
+        with self._lock:
+            self.audited += 1
+            self.agreed += bool(agreed)
+    
+    def stats(self):
+        with self._lock:
+            return {
+                'eligible': self.eligible,
+                'early_exits': self.early_exits,
+                'early_exit_rate': self.early_exits / self.eligible if self.eligible else 0.0,
+                'audited': self.audited,
+                'agreement_rate': self.agreed / self.audited if self.audited else None,
+            }
+
+_cascade_stats = CascadeStats(CASCADE_AUDIT_EVERY)
+
+def scorer_version():
+    """SCORER_VERSION plus the scorer, lexicon and cascade settings, as stored with scored database rows"""
+    return f"{SCORER_VERSION}{_cache_variant}"
+
+def configure_cascade(enabled=True, band=None, audit_every=None):
+    """Enable cascade mode with the given uncertainty band (default 0.15), or disable it"""
+    global CASCADE_BAND
+    CASCADE_BAND = (0.15 if band is None else float(band)) if enabled else None
+    _update_cache_variant()
+    if audit_every is not None:
+        _cascade_stats.audit_every = audit_every
+    _cascade_stats.reset()
+
+def get_cascade_stats():
+    """Cascade settings plus early-exit and audit counters since it was configured"""
+    return {'enabled': CASCADE_BAND is not None, 'band': CASCADE_BAND, **_cascade_stats.stats()}
+
+def cascade_english_scores(document, emoji_score, keyword, promotional_count):
+    """english_scores(document), or (None, None) when cascade mode decides the text from the cheap scores
+    
+    The skipped scores count as 0.0 in the combined score but are kept apart
+    from real zeros in the stored components.
+
+    Only clear positives and negatives exit early: a partial score near the
+    thresholds, or in the neutral range between them, always gets the full scorers.
+    """
+    band = CASCADE_BAND
+    if band is None or not english_weight(document):
+        return english_scores(document)
+    partial = weighted_score(0.0, 0.0, emoji_score, keyword, promotional_count)
+    early_exit = abs(partial) > SENTIMENT_THRESHOLD + band
+    audit = _cascade_stats.record(early_exit)
+    if not early_exit:
+        return english_scores(document)
+    if audit:
+        vader, textblob = english_scores(document)
+        full_label = combine_scores(vader, textblob, emoji_score, keyword, promotional_count)[0]
+        _cascade_stats.record_audit(full_label == combine_scores(0.0, 0.0, emoji_score, keyword, promotional_count)[0])
+    return None, None
+
+_update_cache_variant()
+
+if CASCADE_BAND is not None:
+    configure_cascade(True, CASCADE_BAND)
+
+def evaluate_cascade(texts, band=0.15):
+    """Score texts with full scoring and in cascade mode, reporting what the band trades
     
-    # Use TextBlob for additional analysis
+    Returns the early-exit rate, label agreement, polarity deltas and scoring
+    time of both modes. Texts are preprocessed once, outside the timings, and
+    the score caches are bypassed. The cascade settings are restored
+    afterwards (with fresh counters).
+    """
+    documents = [document for document in (preprocess(text) for text in texts) if document.cleaned]
+    previous_band, previous_audit = CASCADE_BAND, _cascade_stats.audit_every
     try:
-        blob = TextBlob(cleaned_text)
-        textblob_score = blob.sentiment.polarity  # Ranges from -1 to 1
-    except Exception as e:
-        print(f"TextBlob analysis error: {e}")
-        textblob_score = 0.0
+        configure_cascade(False)
+        start = time.perf_counter()
+        full = [combine_scores(*component_scores(document)) for document in documents]
+        full_seconds = time.perf_counter() - start
+        
+        configure_cascade(True, band, audit_every=0)
+        start = time.perf_counter()
+        fast = [combine_scores(*component_scores(document)) for document in documents]
+        cascade_seconds = time.perf_counter() - start
+        stats = _cascade_stats.stats()
+    finally:
+        configure_cascade(previous_band is not None, previous_band, previous_audit)
+    
+    deltas = [abs(a[1] - b[1]) for a, b in zip(full, fast)]
+    return {
+        'band': band,
+        'texts': len(documents),
+        'eligible': stats['eligible'],
+        'early_exits': stats['early_exits'],
+        'early_exit_rate': stats['early_exits'] / len(documents) if documents else 0.0,
+        'label_agreement': sum(a[0] == b[0] for a, b in zip(full, fast)) / len(documents) if documents else 1.0,
+        'mean_polarity_delta': sum(deltas) / len(deltas) if deltas else 0.0,
+        'max_polarity_delta': max(deltas, default=0.0),
+        'full_seconds': full_seconds,
+        'cascade_seconds': cascade_seconds,
+        'speedup': full_seconds / cascade_seconds if cascade_seconds else 1.0,
+    }
+
+def component_scores(document):
+    """Return (vader, textblob, emoji, keyword, promotional_count) component scores for a SentimentDocument"""
+    # The lexicons the document was preprocessed with, even if they were reloaded since
+    lexicons = document.lexicons or _lexicons
     
+    # Analyze emojis first (average sentiment of the emojis found)
+    emoji_score = _stage('emoji', lexicons.average_emoji_score, document.emojis)
+    
+    # Look the Arabic and English keywords up token by token
+    positive_count, negative_count, promotional_count = _stage('keywords', lexicons.count_keywords, document.words)
+    keyword = keyword_score(positive_count, negative_count)
+    
+    vader, textblob = cascade_english_scores(document, emoji_score, keyword, promotional_count)
+    return (
+        vader,
+        textblob,
+        emoji_score,
+        keyword,
+        promotional_count,
+    )
+
+def weighted_score(vader, textblob, emoji_score, keyword, promotional_count):
+    """Weighted sum of the component scores with the promotional boost, before thresholds
+    
+    vader and textblob may be None (skipped by cascade mode) and then count as 0.0.
+    """
+    vader = 0.0 if vader is None else vader
+    textblob = 0.0 if textblob is None else textblob
     # Combine scores with weights
     # VADER: 30%, TextBlob: 25%, Emojis: 25%, Keywords: 20%
-    combined_score = (vader_score * 0.3) + (textblob_score * 0.25) + (emoji_score * 0.25) + (keyword_score * 0.2)
-    
-    # Context-aware adjustments for promotional content
-    text_lower = text.lower()
+    combined_score = (vader * VADER_WEIGHT) + (textblob * TEXTBLOB_WEIGHT) + (emoji_score * EMOJI_WEIGHT) + (keyword * KEYWORD_WEIGHT)
     
-    # Check for promotional indicators (positive boost)
-    promotional_indicators = [
-        'fastest', 'best', 'perfect', 'ideal', 'optimal', 'excellent', 'amazing',
-        'great', 'wonderful', 'fantastic', 'awesome', 'brilliant', 'outstanding',
-        'superb', 'magnificent', 'splendid', 'marvelous', 'delightful', 'pleasing',
-        'satisfying', 'enjoyable', 'pleasurable', 'grateful', 'thankful', 'blessed',
-        'fortunate', 'lucky', 'successful', 'winning', 'victorious', 'fast', 'quick',
-        'speedy', 'rapid', 'swift', 'efficient', 'convenient', 'suitable', 'appropriate',
-        'affordable', 'cheap', 'inexpensive', 'reasonable', 'value', 'deal', 'offer',
-        'service', 'broadband', 'wifi', 'internet', 'connection', 'available', 'ready',
-        'سريع', 'سريعة', 'أسرع', 'بيناسب', 'مناسب', 'مناسبة', 'أفضل', 'أحسن', 'ممتاز',
-        'رائع', 'جميل', 'عظيم', 'مذهل', 'مفيد', 'جيد', 'حلو', 'لذيذ', 'مريح'
-    ]
-    
-    promotional_count = sum(1 for word in promotional_indicators if word in text_lower)
+    # Context-aware adjustments for promotional content (positive boost)
     if promotional_count > 0:
         # Boost positive sentiment for promotional content
-        combined_score += (promotional_count * 0.1)
-        combined_score = min(0.9, combined_score)  # Cap at 0.9
+        combined_score += (promotional_count * PROMOTIONAL_BOOST)
+        combined_score = min(POLARITY_CAP, combined_score)  # Cap at 0.9
+    return combined_score
+
+def combine_scores(vader, textblob, emoji_score, keyword, promotional_count):
+    """Combine component scores into (sentiment, polarity)"""
+    combined_score = weighted_score(vader, textblob, emoji_score, keyword, promotional_count)
     
     # Determine sentiment and polarity
-    if combined_score > 0.05:  # Lowered threshold for positive
+    if combined_score > SENTIMENT_THRESHOLD:  # Lowered threshold for positive
         sentiment = "positive"
-        polarity = min(0.9, combined_score)
-    elif combined_score < -0.05:  # Lowered threshold for negative
+        polarity = min(POLARITY_CAP, combined_score)
+    elif combined_score < -SENTIMENT_THRESHOLD:  # Lowered threshold for negative
         sentiment = "negative"
-        polarity = max(-0.9, combined_score)
+        polarity = max(-POLARITY_CAP, combined_score)
     else:
         sentiment = "neutral"
         polarity = 0.0
     
     return sentiment, polarity
 
+def combine_score_arrays(vader, textblob, emoji_scores, keyword, promotional_count,
+                         weights=None, threshold=None, boost=None, cap=None):
+    """Vectorized combine_scores over NumPy arrays of component scores.
+    
+    Returns (labels, polarities) arrays; every element equals the result of
+    combine_scores for the same components. weights (vader, textblob, emoji,
+    keyword), threshold, boost and cap default to the module settings and can
+    be overridden to try another weighting on stored components.
+    """
+    import numpy as np
+    
+    vader_weight, textblob_weight, emoji_weight, keyword_weight = weights or (
+        VADER_WEIGHT, TEXTBLOB_WEIGHT, EMOJI_WEIGHT, KEYWORD_WEIGHT)
+    threshold = SENTIMENT_THRESHOLD if threshold is None else threshold
+    boost = PROMOTIONAL_BOOST if boost is None else boost
+    cap = POLARITY_CAP if cap is None else cap
+    
+    combined = (vader * vader_weight) + (textblob * textblob_weight) + (emoji_scores * emoji_weight) + (keyword * keyword_weight)
+    
+    # Promotional boost, capped at 0.9, only where promotional indicators were found
+    promotional = promotional_count > 0
+    combined = np.where(promotional, np.minimum(cap, combined + (promotional_count * boost)), combined)
+    
+    positive = combined > threshold
+    negative = combined < -threshold
+    labels = np.where(positive, "positive", np.where(negative, "negative", "neutral")).astype(LABEL_DTYPE)
+    polarities = np.where(positive, np.minimum(cap, combined),
+                          np.where(negative, np.maximum(-cap, combined), 0.0))
+    return labels, polarities
+
+def advanced_sentiment_analysis(text):
+    """Advanced sentiment analysis using NLTK VADER and TextBlob for comprehensive word understanding
+    
+    Accepts raw text or an already preprocessed SentimentDocument.
+    """
+    document = text if isinstance(text, SentimentDocument) else _stage('preprocess', preprocess, text)
+    if not document.cleaned:
+        return "neutral", 0.0
+    
+    return combine_scores(*component_scores(document))
+
 def simple_sentiment_analysis(text):
     """Fallback sentiment analysis using keyword matching and emoji analysis"""
     if not text:
@@ -204,18 +946,10 @@ def simple_sentiment_analysis(text):
     positive_count = sum(1 for word in positive_words if word in text_lower)
     negative_count = sum(1 for word in negative_words if word in text_lower)
     
-    # Analyze emojis
-    emoji_score = 0.0
-    emoji_count = 0
-    
-    for emoji_char, score in EMOJI_SENTIMENT.items():
-        if emoji_char in text:
-            emoji_score += score
-            emoji_count += 1
+    # Analyze emojis (average sentiment of the emojis found)
+    emoji_score, emoji_count = score_emojis(text)
     
-    # Calculate average emoji sentiment if emojis found
     if emoji_count > 0:
-        emoji_score = emoji_score / emoji_count
         # Convert emoji score to count (positive emojis add to positive count, negative to negative)
         if emoji_score > 0:
             positive_count += abs(emoji_score) * 2  # Weight emojis more heavily
@@ -235,75 +969,796 @@ def simple_sentiment_analysis(text):
     
     return sentiment, polarity
 
+class Token(NamedTuple):
+    """One token of a text, with its character span"""
+    kind: str           # 'url', 'hashtag', 'mention', 'number', 'word', 'emoji' or 'punct'
+    text: str
+    start: int
+    end: int
+
+# Alternatives are tried in order at each position; whitespace is skipped and
+# shows up as gaps between token spans. Words stop where a URL starts, so a URL
+# glued to the preceding word is still recognized. Arabic diacritics are not \w,
+# so they are allowed inside words explicitly ('مُمْتَاز' is one word)
+_WORD_CHAR = '[\\w\u064b-\u065f\u0670]'
+_TOKEN_PATTERN = re.compile(
+    r"(?P<url>https?://[A-Za-z0-9\-._~:/?#\[\]@!$&'()*+,;=%]+)"
+    r'|(?P<hashtag>#' + _WORD_CHAR + '+)'
+    r'|(?P<mention>@\w+)'
+    r'|(?P<number>\d+(?:[.,]\d+)*(?!\w))'
+    r'|(?P<word>' + _WORD_CHAR + '+?(?=https?://)|' + _WORD_CHAR + '+)'
+    r'|(?P<emoji>' + _EMOJI_CLUSTER_PATTERN.pattern + ')'
+    r'|(?P<punct>[^\w\s])'
+)
+
+def tokenize(text):
+    """Split text into typed Tokens in a single scan"""
+    if not text:
+        return []
+    return [Token(match.lastgroup, match.group(), match.start(), match.end())
+            for match in _TOKEN_PATTERN.finditer(str(text))]
+
+_new_tuple = tuple.__new__
+
+class _Scan(NamedTuple):
+    tokens: list
+    cleaned: str        # before display reshaping
+    words: list
+    emoji_clusters: list
+    hashtags: list
+    mentions: list
+
+def _scan(text, keep_tokens=True):
+    """Tokenize text and collect everything preprocess() needs in the same pass
+    
+    The cleaned text drops URLs and mentions, strips '#' from hashtags and
+    collapses the whitespace between tokens to single spaces.
+    """
+    tokens = []
+    pieces = []
+    words = []
+    emoji_clusters = []
+    hashtags = []
+    mentions = []
+    end = 0
+    for match in _TOKEN_PATTERN.finditer(text):
+        kind = match.lastgroup
+        value = match.group()
+        start = match.start()
+        if keep_tokens:
+            # tuple.__new__ skips the Python-level NamedTuple constructor
+            tokens.append(_new_tuple(Token, (kind, value, start, match.end())))
+        if kind == 'url' or kind == 'mention':
+            if kind == 'mention':
+                mentions.append(value[1:])
+            end = match.end()
+            continue
+        if kind == 'word' or kind == 'number':
+            words.append(value.lower())
+        elif kind == 'emoji':
+            emoji_clusters.append(value)
+        elif kind == 'hashtag':
+            value = value[1:]
+            hashtags.append(value)
+            words.append(value.lower())
+        if pieces and start > end:
+            pieces.append(' ')
+        pieces.append(value)
+        end = match.end()
+    return _Scan(tokens, ''.join(pieces), words, emoji_clusters, hashtags, mentions)
+
 def clean_text(text):
-    """Clean and normalize text for sentiment analysis"""
+    """Clean and normalize text for sentiment analysis
+    
+    URLs and mentions are removed, hashtags keep their text and whitespace is
+    collapsed, all from a single tokenizer pass. Emojis are kept and Arabic
+    stays in logical order; reshaping for display happens at render time
+    (the arabic_display template filter in app.py).
+    """
     if not text:
         return ""
     
-    # Convert to string if not already
+    return _scan(str(text), keep_tokens=False).cleaned
+
+# Runs of Arabic or Latin letters, counted in a single pass by script_profile()
+_SCRIPT_RUNS = re.compile(
+    '(?P<arabic>[\u0600-\u06ff\u0750-\u077f\u08a0-\u08ff\ufb50-\ufdff\ufe70-\ufeff]+)'
+    '|(?P<latin>[A-Za-z\u00c0-\u024f]+)'
+)
+
+# Texts whose minority script has at least this share of the letters are 'mixed'
+MIXED_SCRIPT_SHARE = 0.2
+
+# Post.detected_language code recorded for each script
+SCRIPT_LANGUAGES = {'arabic': 'ar', 'latin': 'en', 'mixed': 'mixed'}
+
+def script_profile(text):
+    """Return (script, latin_share) from the Arabic and Latin letters of text
+    
+    script is 'arabic', 'latin', 'mixed' or 'none' (no letters); latin_share
+    is the fraction of those letters that are Latin.
+    """
+    arabic = latin = 0
+    for match in _SCRIPT_RUNS.finditer(text):
+        if match.lastgroup == 'latin':
+            latin += match.end() - match.start()
+        else:
+            arabic += match.end() - match.start()
+    if not arabic and not latin:
+        return "none", 0.0
+    latin_share = latin / (arabic + latin)
+    if latin_share < MIXED_SCRIPT_SHARE:
+        return "arabic", latin_share
+    if latin_share > 1.0 - MIXED_SCRIPT_SHARE:
+        return "latin", latin_share
+    return "mixed", latin_share
+
+def detect_script(text):
+    """Classify text as 'arabic', 'latin', 'mixed' or 'none' from its letters"""
+    return script_profile(text)[0]
+
+def detect_language(text):
+    """Language code stored as Post.detected_language: 'ar', 'en', 'mixed', or None without letters
+    
+    URLs and mentions are ignored, like in the analysis itself.
+    """
+    if not text:
+        return None
+    return SCRIPT_LANGUAGES.get(detect_script(_scan(str(text), keep_tokens=False).cleaned))
+
+class SentimentDocument(NamedTuple):
+    """Immutable preprocessed text consumed by every scorer
+    
+    Built once per analysis by preprocess(), so a text is cleaned and
+    lowercased exactly once however many scorers look at it.
+    """
+    raw: str            # original text
+    cleaned: str        # clean_text() output, used by VADER and TextBlob
+    lowered: str        # lowercased original text
+    tokens: tuple       # typed Tokens from tokenize()
+    words: tuple        # lowercased word, number and hashtag tokens (hashtags without '#'), used for keywords
+    emojis: tuple       # distinct sentiment emojis, in EMOJI_SENTIMENT order
+    hashtags: tuple     # hashtag names without '#'
+    mentions: tuple     # mentioned usernames without '@'
+    script: str         # 'arabic', 'latin', 'mixed' or 'none', from script_profile()
+    latin_share: float  # fraction of the letters that are Latin
+    lexicons: object = None  # LexiconBundle the emojis were found with, also used for keywords
+
+_EMPTY_DOCUMENT = SentimentDocument("", "", "", (), (), (), (), (), "none", 0.0)
+
+def preprocess(text):
+    """Tokenize text once and derive everything the scorers need, returning a SentimentDocument"""
+    if not text:
+        return _EMPTY_DOCUMENT
+    
     text = str(text)
+    lexicons = _lexicons
+    scan = _scan(text)
+    # URLs and mentions do not count towards the script
+    script, latin_share = script_profile(scan.cleaned)
+    return SentimentDocument(
+        raw=text,
+        cleaned=scan.cleaned,
+        lowered=text.lower(),
+        tokens=tuple(scan.tokens),
+        words=tuple(scan.words),
+        emojis=tuple(lexicons.distinct_emojis(scan.emoji_clusters)),
+        hashtags=tuple(scan.hashtags),
+        mentions=tuple(scan.mentions),
+        script=script,
+        latin_share=latin_share,
+        lexicons=lexicons,
+    )
+
+def _score_document(document):
+    """Score a preprocessed document, returning (sentiment, polarity, components)
+    
+    components is (vader, textblob, emoji, keyword, promotional_count), or
+    None when the linear scorer or the simple fallback analysis was used.
+    """
+    if not document.cleaned:
+        return "neutral", 0.0, None
+    
+    if SCORER == 'linear':
+        sentiment, polarity = _stage('linear', _linear_model.score, document)
+        return sentiment, polarity, None
     
-    # Handle Arabic text
-    text = arabic_reshaper.reshape(text)
-    text = get_display(text)
+    # Try advanced analysis first (NLTK + TextBlob + Emojis)
+    if _get_vader_analyzer():
+        components = component_scores(document)
+        sentiment, polarity = combine_scores(*components)
+        return sentiment, polarity, components
     
-    # Keep emojis for sentiment analysis (don't demojize)
-    # text = emoji.demojize(text)  # Commented out to preserve emojis
+    # Fallback to simple analysis
+    sentiment, polarity = simple_sentiment_analysis(document.cleaned)
+    return sentiment, polarity, None
+
+class ScoreCache:
+    """Thread-safe bounded LRU cache of analysis results
+    
+    Keys are a hash of the normalized text plus scorer_version(). Entries older
+    than timeout seconds (if set) count as misses and are evicted.
+    """
+    
+    def __init__(self, max_size=1000, timeout=None):
+        self.max_size = max_size
+        self.timeout = timeout
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
     
-    # Remove URLs
-    text = re.sub(r'http[s]?://(?:[a-zA-Z]|[0-9]|[$-_@.&+]|[!*\\(\\),]|(?:%[0-9a-fA-F][0-9a-fA-F]))+', '', text)
+    @staticmethod
+    def key(text):
+        """Cache key for a text: leading/trailing whitespace never changes its score"""
+        normalized = str(text).strip()
+        payload = f"{SCORER_VERSION}{_cache_variant}\x00{normalized}".encode('utf-8', 'surrogatepass')
+        return hashlib.blake2b(payload, digest_size=16).digest()
     
-    # Remove hashtags but keep the text
-    text = re.sub(r'#(\w+)', r'\1', text)
+    def get(self, key):
+        """Return the cached value for key, or None on a miss"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and self.timeout and time.monotonic() - entry[1] > self.timeout:
+                del self._entries[key]
+                self.evictions += 1
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
     
-    # Remove mentions
-    text = re.sub(r'@(\w+)', '', text)
+    def put(self, key, value):
+        """Store value under key, evicting the least recently used entries"""
+        if self.max_size <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (value, time.monotonic())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
     
-    # Remove extra whitespace
-    text = re.sub(r'\s+', ' ', text).strip()
+    def resize(self, max_size):
+        """Change the maximum number of entries"""
+        with self._lock:
+            self.max_size = max_size
+            while len(self._entries) > max(max_size, 0):
+                self._entries.popitem(last=False)
+                self.evictions += 1
     
-    return text
+    def clear(self):
+        """Drop all entries and reset counters"""
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = self.evictions = 0
+    
+    def stats(self):
+        """Hit/miss/eviction counters and current size"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'enabled': _score_cache is self,
+                'size': len(self._entries),
+                'max_size': self.max_size,
+                'timeout': self.timeout,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+            }
 
-def analyze_sentiment(text):
-    """Analyze sentiment using advanced analysis and return sentiment and polarity score"""
+_score_cache = None
+
+def configure_cache(enabled=None, max_size=None, timeout=None):
+    """Enable, disable or resize the in-process score cache"""
+    global _score_cache
+    if enabled is None:
+        enabled = CACHE_CONFIG.get('enabled', True)
+    if not enabled:
+        _score_cache = None
+        return None
+    if max_size is None:
+        max_size = CACHE_CONFIG.get('max_size', 1000)
+    if timeout is None:
+        timeout = CACHE_CONFIG.get('timeout')
+    if _score_cache is None:
+        _score_cache = ScoreCache(max_size, timeout)
+    else:
+        _score_cache.timeout = timeout
+        _score_cache.resize(max_size)
+    return _score_cache
+
+def get_cache_stats():
+    """Counters of the in-process score cache (empty dict when disabled)"""
+    cache = _score_cache
+    return cache.stats() if cache is not None else {}
+
+def clear_cache():
+    """Drop every cached score"""
+    cache = _score_cache
+    if cache is not None:
+        cache.clear()
+
+configure_cache()
+
+# Persistent score cache shared by all workers (see score_cache.py)
+_disk_cache = None
+
+def configure_disk_cache(path=None, max_age=None, max_entries=None):
+    """Enable the persistent SQLite score cache at path, or disable it when path is None"""
+    global _disk_cache
+    if path is None:
+        _disk_cache = None
+        return None
+    from score_cache import DiskScoreCache
+    _disk_cache = DiskScoreCache(path, max_age=max_age, max_entries=max_entries)
+    return _disk_cache
+
+if CACHE_CONFIG.get('enabled', True) and CACHE_CONFIG.get('disk_path'):
+    configure_disk_cache(CACHE_CONFIG['disk_path'], CACHE_CONFIG.get('disk_max_age'),
+                         CACHE_CONFIG.get('disk_max_entries'))
+
+def _disk_lookup(keys):
+    """Cached (sentiment, polarity, components) by key from the persistent cache; errors count as misses"""
+    disk = _disk_cache
+    if disk is None or not keys:
+        return {}
     try:
-        # Clean the text
-        cleaned_text = clean_text(text)
-        
-        if not cleaned_text:
-            return "neutral", 0.0
-        
-        # Try advanced analysis first (NLTK + TextBlob + Emojis)
-        if vader_analyzer:
-            sentiment, polarity = advanced_sentiment_analysis(text)
-        else:
-            # Fallback to simple analysis
-            sentiment, polarity = simple_sentiment_analysis(cleaned_text)
-        
-        return sentiment, polarity
-        
+        return disk.get_many(keys)
     except Exception as e:
-        print(f"Error in sentiment analysis: {e}")
-        return "neutral", 0.0
+        print(f"Score cache read error: {e}")
+        return {}
 
-def get_sentiment_confidence(text):
-    """Get sentiment confidence score for visualization"""
+def _disk_store(entries):
+    """Write (key, sentiment, polarity, components, script) entries to the persistent cache"""
+    disk = _disk_cache
+    if disk is None or not entries:
+        return
+    # The full version (lexicon digest, cascade band, linear model) that the
+    # keys are built from, so `score_cache.py prune --keep-version` can drop
+    # the entries of retired settings
+    version = scorer_version()
     try:
-        cleaned_text = clean_text(text)
-        if not cleaned_text:
-            return 0.0
-        
-        # Use the same analysis method as analyze_sentiment
-        if vader_analyzer:
-            sentiment, polarity = advanced_sentiment_analysis(text)
-        else:
-            sentiment, polarity = simple_sentiment_analysis(cleaned_text)
-        
-        return abs(polarity)
-        
+        disk.put_many((key, version, sentiment, polarity, components)
+                      for key, sentiment, polarity, components, _ in entries)
     except Exception as e:
-        print(f"Error getting sentiment confidence: {e}")
-        return 0.0
+        print(f"Score cache write error: {e}")
+
+class SentimentResult:
+    """Outcome of analyzing one text
+    
+    confidence is abs(polarity). components is (vader, textblob, emoji,
+    keyword, promotional_count), or None for empty texts, the linear scorer
+    and the simple fallback analysis. script is the script_profile() class that routed the
+    text. elapsed is the wall time of the analysis in seconds and cached tells
+    whether the scores came from a score cache.
+    """
+    
+    __slots__ = ('label', 'polarity', 'confidence', 'components', 'script', 'elapsed', 'cached')
+    
+    COMPONENT_NAMES = COMPONENT_NAMES
+    
+    def __init__(self, label, polarity, components=None, script="none", elapsed=0.0, cached=False):
+        self.label = label
+        self.polarity = polarity
+        self.confidence = abs(polarity)
+        self.components = components
+        self.script = script
+        self.elapsed = elapsed
+        self.cached = cached
+    
+    @property
+    def language(self):
+        """Language code for Post.detected_language, like detect_language()"""
+        return SCRIPT_LANGUAGES.get(self.script)
+    
+    def component_dict(self):
+        """Component scores by name, or an empty dict when none were computed"""
+        return dict(zip(self.COMPONENT_NAMES, self.components)) if self.components else {}
+    
+    def as_tuple(self):
+        """(label, polarity), as returned by analyze_sentiment"""
+        return self.label, self.polarity
+    
+    def to_dict(self):
+        return {
+            'sentiment': self.label,
+            'polarity': self.polarity,
+            'confidence': self.confidence,
+            'components': self.component_dict(),
+            'script': self.script,
+            'elapsed': self.elapsed,
+            'cached': self.cached,
+        }
+    
+    def __repr__(self):
+        return (f"SentimentResult(label={self.label!r}, polarity={self.polarity!r}, "
+                f"confidence={self.confidence!r}, components={self.components!r}, script={self.script!r})")
+
+def _scored_document(text):
+    """Preprocess and score text, returning (sentiment, polarity, components, script)"""
+    document = _stage('preprocess', preprocess, text)
+    return _score_document(document) + (document.script,)
+
+def _text_script(text):
+    """detect_script() of text as preprocess() sees it, for scores read back from the persistent cache"""
+    return detect_script(_scan(str(text), keep_tokens=False).cleaned)
+
+def _cached_scores(text):
+    """(sentiment, polarity, components, script, cached) without error handling, served from the score caches when possible
+    
+    In-process cache entries hold (sentiment, polarity, components, script).
+    The persistent cache does not store the script, so for its entries it is
+    worked out again from the text (here and in analyze_sentiment_batch).
+    """
+    if not text:
+        return "neutral", 0.0, None, "none", False
+    if LEXICON_CHECK_INTERVAL and time.monotonic() >= _lexicon_next_check:
+        _check_lexicon_file()
+    
+    cache = _score_cache
+    if cache is None and _disk_cache is None:
+        return _scored_document(text) + (False,)
+    
+    key = ScoreCache.key(text)
+    entry = cache.get(key) if cache is not None else None
+    if entry is not None:
+        return entry + (True,)
+    
+    entry = _disk_lookup([key]).get(key)
+    cached = entry is not None
+    if cached:
+        entry += (_text_script(text),)
+    else:
+        entry = _scored_document(text)
+        _disk_store([(key,) + entry])
+    
+    if cache is not None:
+        cache.put(key, entry)
+    return entry + (cached,)
+
+def analyze(text):
+    """Analyze sentiment once and return a SentimentResult with confidence, component scores and script"""
+    start = time.perf_counter()
+    try:
+        sentiment, polarity, components, script, cached = _cached_scores(text)
+    except Exception as e:
+        print(f"Error in sentiment analysis: {e}")
+        sentiment, polarity, components, script, cached = "neutral", 0.0, None, "none", False
+    return SentimentResult(sentiment, polarity, components, script, time.perf_counter() - start, cached)
+
+def analyze_sentiment(text):
+    """Analyze sentiment using advanced analysis and return sentiment and polarity score"""
+    return analyze(text).as_tuple()
+
+def analyze_sentiment_batch(texts, components=False, languages=False):
+    """Analyze a batch of texts and return (labels, polarities) NumPy arrays
+
+    Each component (VADER, TextBlob, emojis, keywords) runs over the whole
+    batch, then weights, promotional boost and thresholds are applied as
+    vectorized array operations. Element i equals analyze_sentiment(texts[i]).
+    
+    With components=True a third (len(texts), 5) float array holds the
+    COMPONENT_NAMES scores of every text, NaN where there are none (empty
+    texts, the linear scorer and the simple fallback analysis).
+    
+    With languages=True a list of the language code of every text follows,
+    as SentimentResult.language gives it for one text (and detect_language()
+    without analyzing), so callers need not scan the texts again.
+    """
+    labels, polarities, component_array, scripts = _analyze_batch(texts)
+    result = (labels, polarities)
+    if components:
+        result += (component_array,)
+    if languages:
+        result += ([SCRIPT_LANGUAGES.get(script) for script in scripts],)
+    return result
+
+def _analyze_batch(texts):
+    """analyze_sentiment_batch() returning (labels, polarities, components, scripts)
+    
+    scripts is a list of the script_profile() class of every text.
+    """
+    import numpy as np
+
+    texts = list(texts)
+    if LEXICON_CHECK_INTERVAL and time.monotonic() >= _lexicon_next_check:
+        _check_lexicon_file()
+    labels = np.full(len(texts), "neutral", dtype=LABEL_DTYPE)
+    polarities = np.zeros(len(texts))
+    component_array = np.full((len(texts), len(COMPONENT_NAMES)), np.nan)
+    scripts = ["none"] * len(texts)
+    cache = _score_cache
+    use_keys = cache is not None or _disk_cache is not None
+
+    # Look every text up in the in-process cache first
+    pending = {}
+    for i, text in enumerate(texts):
+        if not text:
+            continue
+        key = ScoreCache.key(text) if use_keys else None
+        if cache is not None:
+            result = cache.get(key)
+            if result is not None:
+                labels[i], polarities[i] = result[:2]
+                if result[2] is not None:
+                    component_array[i] = result[2]
+                scripts[i] = result[3]
+                continue
+        pending[i] = key
+
+    # Then the persistent cache for the remaining ones
+    disk_hits = _disk_lookup([key for key in pending.values() if key is not None])
+    for i, key in list(pending.items()):
+        result = disk_hits.get(key)
+        if result is not None:
+            labels[i], polarities[i] = result[:2]
+            if result[2] is not None:
+                component_array[i] = result[2]
+            # The persistent cache does not store the script
+            scripts[i] = _text_script(texts[i])
+            if cache is not None:
+                cache.put(key, result + (scripts[i],))
+            del pending[i]
+
+    # Preprocess every remaining text once; texts that clean to nothing stay neutral
+    index = []
+    documents = []
+    for i, key in pending.items():
+        try:
+            document = _stage('preprocess', preprocess, texts[i])
+        except Exception as e:
+            print(f"Error in sentiment analysis: {e}")
+            continue
+        scripts[i] = document.script
+        if document.cleaned:
+            index.append(i)
+            documents.append(document)
+        elif key is not None:
+            _store_results(cache, [(key, "neutral", 0.0, None, document.script)])
+
+    if not index:
+        return labels, polarities, component_array, scripts
+
+    keys = [pending[i] for i in index]
+    if SCORER == 'linear':
+        labels[index], polarities[index] = _stage('linear', _linear_model.predict, documents)
+        if use_keys:
+            _store_results(cache, [(key, str(labels[i]), float(polarities[i]), None, document.script)
+                                   for key, i, document in zip(keys, index, documents)])
+        return labels, polarities, component_array, scripts
+    
+    if not _get_vader_analyzer():
+        # Fallback to simple analysis, one text at a time
+        for i, document in zip(index, documents):
+            labels[i], polarities[i] = simple_sentiment_analysis(document.cleaned)
+        if use_keys:
+            _store_results(cache, [(key, str(labels[i]), float(polarities[i]), None, document.script)
+                                   for key, i, document in zip(keys, index, documents)])
+        return labels, polarities, component_array, scripts
+
+    # Lexicon components on the original texts, then English model components on
+    # the cleaned texts, routed by script (and by the cheap scores in cascade mode)
+    emoji_list = [_stage('emoji', document.lexicons.average_emoji_score, document.emojis) for document in documents]
+    keyword_counts = [_stage('keywords', document.lexicons.count_keywords, document.words) for document in documents]
+    keyword_list = [keyword_score(positive, negative) for positive, negative, _ in keyword_counts]
+    english = np.array([
+        cascade_english_scores(document, emoji_score, keyword, promotional)
+        for document, emoji_score, keyword, (_, _, promotional) in zip(documents, emoji_list, keyword_list, keyword_counts)
+    ], dtype=np.float64)
+    # Scores skipped by cascade mode are NaN here and count as 0.0 when combined
+    vader, textblob = english[:, 0], english[:, 1]
+    emoji_scores = np.array(emoji_list, dtype=np.float64)
+    keyword = np.array(keyword_list, dtype=np.float64)
+    promotional_count = np.array([promotional for _, _, promotional in keyword_counts], dtype=np.int64)
+
+    labels[index], polarities[index] = combine_score_arrays(np.nan_to_num(vader), np.nan_to_num(textblob),
+                                                            emoji_scores, keyword, promotional_count)
+    component_array[index] = np.column_stack((vader, textblob, emoji_scores, keyword, promotional_count))
+
+    if use_keys:
+        _store_results(cache, [
+            (key, str(labels[i]), float(polarities[i]),
+             (_optional_score(vader[j]), _optional_score(textblob[j]), float(emoji_scores[j]), float(keyword[j]),
+              int(promotional_count[j])),
+             documents[j].script)
+            for j, (key, i) in enumerate(zip(keys, index))
+        ])
+    return labels, polarities, component_array, scripts
+
+def _optional_score(value):
+    """float(value), or None for NaN (a scorer that did not run)"""
+    return None if value != value else float(value)
+
+def _store_results(cache, entries):
+    """Put freshly scored (key, sentiment, polarity, components, script) entries into both score caches"""
+    if cache is not None:
+        for key, sentiment, polarity, components, script in entries:
+            cache.put(key, (sentiment, polarity, components, script))
+    _disk_store(entries)
+
+def _init_pool_worker():
+    """Load lexicons and analyzers once when a pool worker starts"""
+    warmup()
+
+def _score_chunk(texts, components=False):
+    """Pool worker task: score one chunk of texts"""
+    return analyze_sentiment_batch(texts, components)
+
+def _chunk_bounds(texts, target_chars, max_texts):
+    """Split texts into contiguous (start, end) chunks of roughly target_chars characters"""
+    bounds = []
+    start = 0
+    chars = 0
+    for i, text in enumerate(texts):
+        chars += len(text) if isinstance(text, str) else 1
+        if chars >= target_chars or i + 1 - start >= max_texts:
+            bounds.append((start, i + 1))
+            start = i + 1
+            chars = 0
+    if start < len(texts):
+        bounds.append((start, len(texts)))
+    return bounds
+
+class SentimentPool:
+    """Score large batches across CPU cores with a ProcessPoolExecutor
+
+    Texts are split into chunks sized by total text length, so a chunk of
+    long transcripts holds fewer texts than a chunk of short comments, and
+    every worker gets several chunks for load balancing. Results come back
+    in input order and match analyze_sentiment_batch exactly.
+    """
+
+    def __init__(self, workers=None, chunk_chars=20000, max_chunk_size=1000, min_parallel=64, mp_context=None):
+        self.workers = workers or os.cpu_count() or 1
+        self.chunk_chars = chunk_chars
+        self.max_chunk_size = max_chunk_size
+        self.min_parallel = min_parallel
+        self._mp_context = mp_context
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None:
+                from concurrent.futures import ProcessPoolExecutor
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=self._mp_context,
+                    initializer=_init_pool_worker,
+                )
+            return self._executor
+
+    def chunk(self, texts):
+        """Chunk boundaries for texts, aiming for at least four chunks per worker"""
+        total_chars = sum(len(text) if isinstance(text, str) else 1 for text in texts)
+        target_chars = max(1, min(self.chunk_chars, total_chars // (self.workers * 4)))
+        return _chunk_bounds(texts, target_chars, self.max_chunk_size)
+
+    def submit(self, texts):
+        """Start scoring texts in the pool; returns futures of (labels, polarities), in order"""
+        executor = self._get_executor()
+        return [executor.submit(_score_chunk, texts[start:end]) for start, end in self.chunk(texts)]
+
+    def submit_chunk(self, texts, components=False):
+        """Score texts as a single chunk in one worker; returns a future of analyze_sentiment_batch's result"""
+        return self._get_executor().submit(_score_chunk, list(texts), components)
+
+    def analyze(self, texts):
+        """Score texts across the pool, returning (labels, polarities) in input order"""
+        texts = list(texts)
+        if len(texts) < self.min_parallel or self.workers == 1:
+            return analyze_sentiment_batch(texts)
+
+        import numpy as np
+
+        futures = self.submit(texts)
+        results = [future.result() for future in futures]
+        return (np.concatenate([labels for labels, _ in results]).astype(LABEL_DTYPE),
+                np.concatenate([polarities for _, polarities in results]))
+
+    def shutdown(self, wait=True):
+        """Stop the worker processes; the pool restarts on next use"""
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=wait, cancel_futures=not wait)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.shutdown()
+
+_shared_pool = None
+_shared_pool_lock = threading.Lock()
+
+def get_sentiment_pool(workers=None):
+    """Process-wide SentimentPool shared by the Flask app and CLI tools"""
+    global _shared_pool
+    with _shared_pool_lock:
+        if _shared_pool is None:
+            _shared_pool = SentimentPool(workers)
+            atexit.register(shutdown_sentiment_pool)
+        return _shared_pool
+
+def shutdown_sentiment_pool(wait=True):
+    """Shut down the shared pool (registered with atexit; safe to call more than once)"""
+    global _shared_pool
+    with _shared_pool_lock:
+        pool, _shared_pool = _shared_pool, None
+    if pool is not None:
+        pool.shutdown(wait=wait)
+
+def _result_rows(result, components):
+    """Per-text tuples of an analyze_sentiment_batch result, as analyze_stream yields them"""
+    if not components:
+        return zip(result[0].tolist(), result[1].tolist())
+    labels, polarities, component_array = result
+    # Rows without an emoji score have no components at all
+    rows = [None if row[2] != row[2] else tuple(_optional_score(value) for value in row[:4]) + (int(row[4]),)
+            for row in component_array.tolist()]
+    return zip(labels.tolist(), polarities.tolist(), rows)
+
+def analyze_stream(texts, batch_size=1000, pool=None, max_pending=None, components=False):
+    """Score an iterable of texts of any length, yielding (label, polarity) per text in input order
+    
+    Texts are pulled lazily and scored in batches of batch_size with
+    analyze_sentiment_batch, or in a SentimentPool when pool is one (True
+    uses get_sentiment_pool()). At most max_pending batches (default: two per
+    pool worker) are in flight; the next batch is only read from texts once
+    the consumer has taken the results of the oldest one, so memory stays
+    bounded by max_pending * batch_size texts whatever the input size.
+    
+    With components=True, (label, polarity, components) is yielded instead,
+    components being the COMPONENT_NAMES scores or None (see SentimentResult).
+    """
+    from collections import deque
+    from itertools import islice
+    
+    if batch_size < 1:
+        raise ValueError("batch_size must be at least 1")
+    iterator = iter(texts)
+    
+    if pool is None or pool is False:
+        while True:
+            batch = list(islice(iterator, batch_size))
+            if not batch:
+                return
+            result = analyze_sentiment_batch(batch, components)
+            del batch
+            yield from _result_rows(result, components)
+    
+    if pool is True:
+        pool = get_sentiment_pool()
+    if max_pending is None:
+        max_pending = 2 * pool.workers
+    pending = deque()
+    try:
+        while True:
+            while len(pending) < max(1, max_pending):
+                batch = list(islice(iterator, batch_size))
+                if not batch:
+                    break
+                pending.append(pool.submit_chunk(batch, components))
+            if not pending:
+                return
+            yield from _result_rows(pending.popleft().result(), components)
+    finally:
+        # The consumer stopped early or scoring failed: drop queued batches
+        for future in pending:
+            future.cancel()
+
+def get_sentiment_confidence(text):
+    """Get sentiment confidence score for visualization
+    
+    Prefer analyze(text).confidence when the label or polarity is needed too.
+    """
+    return analyze(text).confidence
 
 def get_sentiment_color(sentiment, confidence=1.0):
     """Get color for sentiment visualization"""
@@ -318,3 +1773,303 @@ def get_sentiment_bar_width(polarity):
     """Convert polarity to bar width percentage"""
     # Convert polarity (-1 to 1) to percentage (0 to 100)
     return abs(polarity) * 100
+
+def read_records(path):
+    """Yield each record of a .jsonl or .csv file as a dict; other files give {'text': line} per line
+    
+    A JSON line that is not an object raises ValueError naming the line.
+    """
+    import csv
+    
+    with open(path, encoding='utf-8', newline='') as f:
+        if path.endswith('.jsonl'):
+            for number, line in enumerate(f, 1):
+                if not line.strip():
+                    continue
+                try:
+                    record = json.loads(line)
+                except ValueError as e:
+                    raise ValueError(f"{path}:{number}: invalid JSON: {e}") from None
+                if not isinstance(record, dict):
+                    raise ValueError(f"{path}:{number}: expected a JSON object, got {type(record).__name__}")
+                yield record
+        elif path.endswith('.csv'):
+            yield from csv.DictReader(f)
+        else:
+            for line in f:
+                yield {'text': line.rstrip('\n')}
+
+def read_texts(path, field='text'):
+    """Yield the texts of a file: one per line, the field of each JSON line (.jsonl) or a CSV column (.csv)"""
+    if not path.endswith(('.jsonl', '.csv')):
+        field = 'text'
+    for record in read_records(path):
+        yield record.get(field) or ""
+
+# Columns score_file() adds to every record
+SCORE_COLUMNS = ('sentiment', 'polarity', 'confidence',
+                 'vader_score', 'textblob_score', 'emoji_score', 'keyword_score', 'promotional_count')
+OUTPUT_FORMATS = ('csv', 'jsonl', 'parquet')
+
+class _CsvWriter:
+    """CSV output; the columns are those of the first record
+    
+    Later records may leave columns empty, but a field the first record does
+    not have raises ValueError rather than being dropped.
+    """
+    
+    def __init__(self, path):
+        self._file = open(path, 'w', encoding='utf-8', newline='')
+        self._writer = None
+        self._fields = None
+        self._written = 0
+    
+    def write(self, rows):
+        import csv
+        
+        if self._writer is None and rows:
+            self._fields = frozenset(rows[0])
+            self._writer = csv.DictWriter(self._file, fieldnames=list(rows[0]), restval='')
+            self._writer.writeheader()
+        for row in rows:
+            self._written += 1
+            if not self._fields.issuperset(row):
+                extra = ', '.join(sorted(set(row) - self._fields))
+                raise ValueError(f"Record {self._written} has fields the first record lacks ({extra}); "
+                                 f"write JSONL or Parquet instead")
+            self._writer.writerow(row)
+    
+    def close(self):
+        self._file.close()
+
+class _JsonlWriter:
+    """JSON Lines output, one object per record"""
+    
+    def __init__(self, path):
+        self._file = open(path, 'w', encoding='utf-8')
+    
+    def write(self, rows):
+        self._file.writelines(json.dumps(row, ensure_ascii=False) + '\n' for row in rows)
+    
+    def close(self):
+        self._file.close()
+
+class _ParquetWriter:
+    """Parquet output (needs pyarrow), one row group per batch; the schema is that of the first batch"""
+    
+    def __init__(self, path):
+        try:
+            import pyarrow
+            import pyarrow.parquet
+        except ImportError:
+            raise ValueError("Parquet output needs pyarrow (pip install pyarrow)") from None
+        self._pyarrow = pyarrow
+        self._path = path
+        self._writer = None
+    
+    def write(self, rows):
+        if self._writer is None:
+            table = self._pyarrow.Table.from_pylist(rows)
+            self._writer = self._pyarrow.parquet.ParquetWriter(self._path, table.schema)
+        else:
+            table = self._pyarrow.Table.from_pylist(rows, schema=self._writer.schema)
+        self._writer.write_table(table)
+    
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+
+_OUTPUT_WRITERS = {'csv': _CsvWriter, 'jsonl': _JsonlWriter, 'parquet': _ParquetWriter}
+
+def score_file(input_path, output_path, field='text', output_format=None, workers=None, batch_size=1000,
+               progress_every=100000):
+    """Score every record of a text, .csv or .jsonl file and write it with its scores to output_path
+    
+    Records are streamed through analyze_stream, across a SentimentPool of
+    workers processes (default: one per core; 1 scores in this process), so
+    memory stays bounded whatever the input size. Each output record is the
+    input record plus SCORE_COLUMNS; component scores are empty where the
+    scorer has none. output_format is 'csv', 'jsonl' or 'parquet', by default
+    taken from the output file extension. Returns the number of records,
+    seconds taken and label counts.
+    """
+    from collections import deque
+    
+    output_format = output_format or os.path.splitext(output_path)[1].lstrip('.').lower()
+    if output_format not in OUTPUT_FORMATS:
+        raise ValueError(f"Unknown output format {output_format!r}; expected one of {OUTPUT_FORMATS}")
+    if batch_size < 1:
+        raise ValueError("batch_size must be at least 1")
+    workers = workers or os.cpu_count() or 1
+    if not input_path.endswith(('.jsonl', '.csv')):
+        field = 'text'
+    
+    # Records wait here between handing their text to analyze_stream and
+    # getting its scores back, in the same order
+    waiting = deque()
+    
+    def texts():
+        for record in read_records(input_path):
+            waiting.append(record)
+            text = record.get(field)
+            yield '' if text is None else str(text)
+    
+    writer = _OUTPUT_WRITERS[output_format](output_path)
+    pool = SentimentPool(workers) if workers > 1 else None
+    counts = {'positive': 0, 'negative': 0, 'neutral': 0}
+    done = 0
+    start = time.perf_counter()
+    try:
+        rows = []
+        for label, polarity, components in analyze_stream(texts(), batch_size, pool, components=True):
+            row = waiting.popleft()
+            row.update(zip(SCORE_COLUMNS, (label, polarity, abs(polarity)) + (components or (None,) * 5)))
+            rows.append(row)
+            counts[label] += 1
+            done += 1
+            if len(rows) >= batch_size:
+                writer.write(rows)
+                rows = []
+            if progress_every and done % progress_every == 0:
+                elapsed = time.perf_counter() - start
+                print(f"🔄 {done} texts ({done / elapsed:.0f} texts/sec)", flush=True)
+        if rows:
+            writer.write(rows)
+    finally:
+        writer.close()
+        if pool is not None:
+            pool.shutdown()
+    return {'texts': done, 'seconds': time.perf_counter() - start, 'workers': workers, 'labels': counts}
+
+def profile_file(path, field='text', limit=None, batch=False):
+    """Score the texts of path with profiling enabled and the score caches disabled
+    
+    Meant for the profile command: the caches stay disabled afterwards.
+    Returns (texts scored, wall seconds, per-stage stats).
+    """
+    from itertools import islice
+    
+    texts = list(islice(read_texts(path, field), limit))
+    configure_cache(enabled=False)
+    configure_disk_cache(None)
+    warmup()
+    was_enabled = _stage_profile in _profile_hooks
+    enable_profiling(reset=True)
+    try:
+        start = time.perf_counter()
+        if batch:
+            analyze_sentiment_batch(texts)
+        else:
+            for text in texts:
+                analyze_sentiment(text)
+        elapsed = time.perf_counter() - start
+    finally:
+        if not was_enabled:
+            disable_profiling()
+    return len(texts), elapsed, _stage_profile.stats()
+
+def main(argv=None):
+    import argparse
+    
+    parser = argparse.ArgumentParser(prog='python -m sentiment', description='Sentiment engine tools')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    profile_parser = subparsers.add_parser('profile', help='Print a per-stage time breakdown for a sample file')
+    profile_parser.add_argument('path', help='Text file (one text per line), .jsonl or .csv file')
+    profile_parser.add_argument('--field', default='text', help='JSON field or CSV column holding the text')
+    profile_parser.add_argument('--limit', type=int, help='Score at most this many texts')
+    profile_parser.add_argument('--batch', action='store_true', help='Use analyze_sentiment_batch')
+    cascade_parser = subparsers.add_parser('cascade', help='Compare cascade mode with full scoring on a sample file')
+    cascade_parser.add_argument('path', help='Text file (one text per line), .jsonl or .csv file')
+    cascade_parser.add_argument('--field', default='text', help='JSON field or CSV column holding the text')
+    cascade_parser.add_argument('--limit', type=int, help='Score at most this many texts')
+    cascade_parser.add_argument('--band', type=float, nargs='+', default=[0.05, 0.1, 0.15, 0.2, 0.3],
+                                help='Uncertainty bands to evaluate')
+    score_parser = subparsers.add_parser('score', help='Score a text, .csv or .jsonl file into a CSV, JSONL or Parquet file')
+    score_parser.add_argument('input', help='Text file (one text per line), .jsonl or .csv file')
+    score_parser.add_argument('output', help='Output .csv, .jsonl or .parquet file (Parquet needs pyarrow)')
+    score_parser.add_argument('--field', default='text', help='JSON field or CSV column holding the text')
+    score_parser.add_argument('--format', choices=OUTPUT_FORMATS, help='Output format (default: from the output extension)')
+    score_parser.add_argument('--workers', type=int, help='Worker processes (default: one per core; 1 = no pool)')
+    score_parser.add_argument('--batch-size', type=int, default=1000, help='Texts per batch sent to a worker')
+    lexicons_parser = subparsers.add_parser('lexicons', help='Check a lexicon data file and optionally install it')
+    lexicons_parser.add_argument('path', nargs='?', help='Lexicon JSON file (default: the configured one)')
+    lexicons_parser.add_argument('--install', action='store_true',
+                                 help='Atomically replace the configured lexicon file with path; running workers '
+                                      'reload it within lexicon_check_interval seconds')
+    args = parser.parse_args(argv)
+    
+    if args.command == 'profile':
+        count, elapsed, stages = profile_file(args.path, args.field, args.limit, args.batch)
+        staged = sum(stage['seconds'] for stage in stages.values())
+        print(f"⏱️ {count} texts in {elapsed:.2f}s ({count / elapsed if elapsed else 0:.0f} texts/sec)")
+        print(f"{'stage':<12} {'calls':>8} {'total ms':>10} {'mean us':>9} {'share':>7}")
+        for name, stage in stages.items():
+            share = stage['seconds'] / elapsed if elapsed else 0.0
+            print(f"{name:<12} {stage['calls']:>8} {stage['seconds'] * 1000:>10.1f} {stage['mean_us']:>9.1f} {share:>7.1%}")
+        other = elapsed - staged
+        print(f"{'other':<12} {'':>8} {other * 1000:>10.1f} {'':>9} {(other / elapsed if elapsed else 0.0):>7.1%}")
+    elif args.command == 'cascade':
+        from itertools import islice
+        
+        texts = list(islice(read_texts(args.path, args.field), args.limit))
+        warmup()
+        print(f"{'band':>6} {'early exit':>11} {'agreement':>10} {'mean |dp|':>10} {'max |dp|':>9} {'speedup':>8}")
+        for band in args.band:
+            result = evaluate_cascade(texts, band)
+            print(f"{band:>6.2f} {result['early_exit_rate']:>11.1%} {result['label_agreement']:>10.1%} "
+                  f"{result['mean_polarity_delta']:>10.4f} {result['max_polarity_delta']:>9.3f} {result['speedup']:>7.2f}x")
+    elif args.command == 'score':
+        try:
+            result = score_file(args.input, args.output, args.field, args.format, args.workers, args.batch_size)
+        except (OSError, ValueError) as e:
+            raise SystemExit(f"❌ {e}")
+        count, elapsed = result['texts'], result['seconds']
+        print(f"✅ Scored {count} texts in {elapsed:.1f}s ({count / elapsed if elapsed else 0:.0f} texts/sec, "
+              f"{result['workers']} worker{'s' if result['workers'] != 1 else ''}) -> {args.output}")
+        print("   " + ", ".join(f"{count} {label}" for label, count in result['labels'].items()))
+    elif args.command == 'lexicons':
+        path = args.path or LEXICON_DATA_PATH
+        start = time.perf_counter()
+        try:
+            bundle = load_lexicons(path)
+        except (OSError, ValueError) as e:
+            raise SystemExit(f"❌ {path}: {e}")
+        elapsed = time.perf_counter() - start
+        active = _lexicons
+        print(f"📚 {path}: version {bundle.version} ({bundle.digest}), compiled in {elapsed * 1000:.1f} ms")
+        for category in ('positive', 'negative', 'promotional'):
+            new, old = getattr(bundle, category), getattr(active, category)
+            print(f"   {category:<12} {len(new):>5} entries ({len(new - old):+d} / {-len(old - new):+d})")
+        new, old = bundle.emoji_sentiment, active.emoji_sentiment
+        changed = sum(1 for emoji_char in new if emoji_char in old and old[emoji_char] != new[emoji_char])
+        print(f"   {'emoji':<12} {len(new):>5} entries ({len(new.keys() - old.keys()):+d} / "
+              f"{-len(old.keys() - new.keys()):+d}, {changed} rescored)")
+        if args.install:
+            if os.path.abspath(path) == os.path.abspath(LEXICON_DATA_PATH):
+                raise SystemExit(f"❌ {path} is already the configured lexicon file")
+            if bundle.digest != active.digest and bundle.version == active.version:
+                print(f"⚠️ The lexicons changed but the version is still {bundle.version}")
+            with open(path, 'rb') as f:
+                content = f.read()
+            temporary = f"{LEXICON_DATA_PATH}.{os.getpid()}.tmp"
+            with open(temporary, 'wb') as f:
+                f.write(content)
+            os.replace(temporary, LEXICON_DATA_PATH)
+            print(f"✅ Installed as {LEXICON_DATA_PATH}; workers reload it within {LEXICON_CHECK_INTERVAL}s "
+                  f"(or POST /admin/lexicons/reload)")
+
+if SCORER == 'linear':
+    # Loaded at import (this imports NumPy) so the cache keys carry the model
+    # digest; last, as linear_model imports names from this module
+    try:
+        set_scorer('linear')
+    except (OSError, ValueError) as e:
+        print(f"Could not load the linear sentiment model, using the ensemble: {e}")
+        SCORER = 'ensemble'
+
+
+if __name__ == "__main__":
+    # Run the importable module's main(), so pool workers unpickle tasks from
+    # the sentiment module rather than from this __main__ copy
+    import sentiment
+    sentiment.main()
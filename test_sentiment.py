@@ -0,0 +1,912 @@
+#!/usr/bin/env python3
+"""
+Tests for the sentiment analysis engine (run with pytest or directly)
+"""
+
+from sentiment import (
+    ARABIC_NEGATIVE_WORDS,
+    ARABIC_POSITIVE_WORDS,
+    EMOJI_SENTIMENT,
+    PROMOTIONAL_INDICATORS,
+    ScoreCache,
+    SentimentPool,
+    SentimentResult,
+    analyze,
+    analyze_sentiment,
+    analyze_sentiment_batch,
+    analyze_stream,
+    clean_text,
+    clear_cache,
+    configure_cache,
+    configure_disk_cache,
+    count_keywords,
+    detect_language,
+    get_cache_stats,
+    get_sentiment_confidence,
+    normalize_arabic,
+    preprocess,
+    score_emojis,
+    script_profile,
+    set_polarity_scorer,
+    textblob_score,
+    tokenize,
+)
+
+SAMPLE_TEXTS = [
+    "Amazing new technology! This is incredible! 🚀 #innovation",
+    "This is really frustrating, nothing is working 😤",
+    "MTC يقدم خدمات رائعة في التحول الرقمي! 🚀 #تحول_رقمي #تقنية",
+    "هذا مثير للاشمئزاز ومخيب للأمل",
+    "I'm already likely to be ready for the fastest deal",
+    "",
+]
+
+EMOJI_TEXTS = [
+    "Love working with this team! ❤️",
+    "heart without a variation selector ❤ only",
+    "skull ☠️ and bare ☠",
+    "family 👨‍❤️‍👨 and thumbs 👍🏽",
+    "😍🥰💖 💔💩 ⭐✨🌟 😤😤",
+    "no emoji at all",
+]
+
+
+def test_count_keywords_matches_every_entry_as_a_token():
+    """Each lexicon entry is found on its own; words merely containing one are not"""
+    for lexicon, position in ((ARABIC_POSITIVE_WORDS, 0), (ARABIC_NEGATIVE_WORDS, 1), (PROMOTIONAL_INDICATORS, 2)):
+        for word in lexicon:
+            # a phrase also counts its words that are entries themselves
+            assert count_keywords(word)[position] >= 1, word
+    assert count_keywords("I'm already likely to be ready for the fastest deal") == (3, 0, 3)
+    assert count_keywords(preprocess("#great_service @bestdeal").words) == (2, 0, 2)
+
+
+def test_arabic_spelling_variants_share_lexicon_entries():
+    """Alef, alef maqsura, taa marbuta, diacritics, tatweel, elongation and clitics are folded"""
+    assert normalize_arabic("أَفْضَلُ") == "افضل"
+    assert normalize_arabic("إلى مستشفى") == "الي مستشفي"
+    assert normalize_arabic("رااااائعـــة") == "رائعه"
+    assert normalize_arabic("ممتاز great") == "ممتاز great"
+    for text in ("ممتاز", "ممتازة", "ممتازه", "مُمْتَاز", "ممـــتاز", "والممتاز"):
+        assert count_keywords(text) == (1, 0, 1), text
+    assert count_keywords("افضل واحسن خدمه") == (2, 0, 2)
+    assert count_keywords("الخدمة مخيبة للأمل") == (0, 2, 0)
+
+
+def test_score_emojis_matches_dictionary_scan():
+    """Single-pass emoji scanner gives the same average as checking every emoji"""
+    for text in EMOJI_TEXTS:
+        scores = [score for emoji_char, score in EMOJI_SENTIMENT.items() if emoji_char in text]
+        expected = (sum(scores) / len(scores), len(scores)) if scores else (0.0, 0)
+        assert score_emojis(text) == expected
+
+
+def test_score_emojis_handles_variation_selectors():
+    """'❤️' and '☠️' need their variation selector, as in EMOJI_SENTIMENT"""
+    assert score_emojis("❤️") == (1.0, 1)
+    assert score_emojis("❤") == (0.0, 0)
+    assert score_emojis("☠️") == (-0.9, 1)
+
+
+def test_analyze_sentiment_batch_matches_single_text():
+    """Batch results are exactly the single-text results, in input order"""
+    texts = SAMPLE_TEXTS + EMOJI_TEXTS + [None, "   "]
+    configure_cache(enabled=False)
+    try:
+        labels, polarities = analyze_sentiment_batch(texts)
+        assert len(labels) == len(polarities) == len(texts)
+        for text, label, polarity in zip(texts, labels, polarities):
+            assert analyze_sentiment(text) == (label, polarity)
+    finally:
+        configure_cache()
+
+
+def test_analyze_sentiment_batch_returns_languages_from_every_path(tmp_path):
+    """languages=True gives detect_language() of each text, scored or served from either cache"""
+    texts = SAMPLE_TEXTS + ["great service 😍 خدمة رائعة", "@bob https://example.com", "", None]
+    expected = [detect_language(text) for text in texts]
+    configure_disk_cache(str(tmp_path / "scores.sqlite3"))
+    try:
+        clear_cache()
+        for _ in range(2):
+            labels, polarities, languages = analyze_sentiment_batch(texts, languages=True)
+            assert languages == expected
+        # Persistent cache hits, then in-process hits of what they loaded
+        clear_cache()
+        assert analyze_sentiment_batch(texts, components=True, languages=True)[3] == expected
+        assert analyze(texts[2]).language == expected[2]
+    finally:
+        configure_disk_cache(None)
+        clear_cache()
+
+
+def test_analyze_sentiment_batch_empty():
+    labels, polarities = analyze_sentiment_batch([])
+    assert len(labels) == 0 and len(polarities) == 0
+
+
+def test_preprocess_builds_document_once():
+    """Document carries cleaned/lowered text, emojis, hashtags, mentions and script"""
+    document = preprocess("Great day @bob #MTC رائع 😍")
+    assert document.cleaned.startswith("Great day MTC")
+    assert document.lowered == "great day @bob #mtc رائع 😍"
+    assert document.emojis == ("😍",)
+    assert document.hashtags == ("MTC",)
+    assert document.mentions == ("bob",)
+    assert document.tokens == tuple(tokenize("Great day @bob #MTC رائع 😍"))
+    assert document.words == ("great", "day", "mtc", "رائع")
+    assert document.script == "mixed"
+    assert preprocess("").cleaned == "" and preprocess(None).script == "none"
+
+
+def test_tokenize_tags_token_kinds_with_spans():
+    text = "Love it!! 😍 #MTC @bob 3.5 https://example.com/a?b=c~d"
+    tokens = tokenize(text)
+    assert [(token.kind, token.text) for token in tokens] == [
+        ("word", "Love"), ("word", "it"), ("punct", "!"), ("punct", "!"), ("emoji", "😍"),
+        ("hashtag", "#MTC"), ("mention", "@bob"), ("number", "3.5"), ("url", "https://example.com/a?b=c~d"),
+    ]
+    assert all(text[token.start:token.end] == token.text for token in tokens)
+
+
+def test_arabic_display_filter_reshapes_only_arabic_text():
+    """The template filter reshapes Arabic into visual order, caches it, and passes other text through"""
+    import pytest
+
+    # Needs the app's dependencies and a config.py
+    app = pytest.importorskip("app")
+
+    app.arabic_display.cache_clear()
+    text = "خدمة رائعة MTC"
+    shaped = app.arabic_display(text)
+    assert shaped != text and shaped.endswith("ﺔﻌﺋﺍﺭ ﺔﻣﺪﺧ")
+    assert all("\ufe70" <= char <= "\ufeff" for char in shaped if app.ARABIC_LETTERS.match(char))
+    assert app.arabic_display(text) is shaped
+    assert app.arabic_display.cache_info().hits == 1
+
+    english = "Great service 😍"
+    assert app.arabic_display(english) is english
+    assert app.arabic_display("") == "" and app.arabic_display(None) is None
+    assert app.app.jinja_env.filters["arabic_display"] is app.arabic_display
+    assert app.app.jinja_env.from_string("{{ text|arabic_display }}").render(text=text) == shaped
+
+
+def test_clean_text_removes_whole_urls_and_mentions():
+    assert clean_text("check https://example.com/path?a=b&c=d~x now @someone #happy") == "check now happy"
+    # A URL glued to the preceding word is still removed, emojis after it are kept
+    assert clean_text("greathttp://t.co/x🚀 day") == "great🚀 day"
+    assert clean_text("mail me at happy@good.com") == "mail me at happy.com"
+    assert clean_text("  spaced\n\tout  ") == "spaced out"
+    # Arabic stays in logical order, without presentation forms
+    assert clean_text("خدمة رائعة @mtc #تقنية") == "خدمة رائعة تقنية"
+
+
+def test_analyze_returns_result_with_components_and_confidence():
+    configure_cache(enabled=False)
+    try:
+        for text in SAMPLE_TEXTS + EMOJI_TEXTS:
+            result = analyze(text)
+            assert result.as_tuple() == analyze_sentiment(text)
+            assert result.confidence == abs(result.polarity) == get_sentiment_confidence(text)
+            assert result.elapsed >= 0.0 and not result.cached
+        result = analyze("Amazing new technology! 😍")
+        assert set(result.component_dict()) == set(SentimentResult.COMPONENT_NAMES)
+        assert result.component_dict()['emoji'] > 0
+        assert analyze("").components is None and analyze("").component_dict() == {}
+    finally:
+        configure_cache()
+
+
+def test_cached_results_keep_components(tmp_path):
+    text = "Components survive the score caches 👍 great"
+    clear_cache()
+    configure_disk_cache(str(tmp_path / "scores.sqlite3"))
+    try:
+        first = analyze(text)
+        second = analyze(text)
+        assert not first.cached and second.cached
+        assert second.components == first.components
+        clear_cache()
+        from_disk = analyze(text)
+        assert from_disk.cached and from_disk.components == first.components
+        # Entries carry the full scorer version, lexicon digest included
+        from sentiment import _disk_cache, scorer_version
+        assert set(_disk_cache.stats()["versions"]) == {scorer_version()}
+        assert "+lex:" in scorer_version()
+    finally:
+        configure_disk_cache(None)
+
+
+def test_script_profile_counts_letter_share():
+    assert script_profile("great day") == ("latin", 1.0)
+    assert script_profile("يوم رائع")[0] == "arabic"
+    assert script_profile("MTC يقدم خدمات رائعة في التحول الرقمي")[0] == "arabic"
+    assert script_profile("great day رائع") == ("mixed", 8 / 12)
+    assert script_profile("😍 123 !!") == ("none", 0.0)
+    # URLs and mentions are not part of the analyzed text
+    assert detect_language("رائع جدا https://example.com/some/long/path @someone") == "ar"
+    assert detect_language("great day") == "en" and detect_language("🔥") is None
+
+
+def test_arabic_text_skips_english_scorers(monkeypatch):
+    import sentiment
+
+    def fail(text):
+        raise AssertionError("English scorers should not run on Arabic text")
+
+    document = preprocess("MTC يقدم خدمات رائعة! 😍 #تقنية")
+    monkeypatch.setattr(sentiment, "vader_score", fail)
+    monkeypatch.setattr(sentiment, "textblob_score", fail)
+    vader, textblob, emoji, keyword, _ = sentiment.component_scores(document)
+    assert (vader, textblob) == (0.0, 0.0) and emoji > 0 and keyword > 0
+
+
+def test_mixed_text_blends_english_scores_by_latin_share():
+    import sentiment
+
+    document = preprocess("What a wonderful and amazing day رائع جدا")
+    assert document.script == "mixed"
+    vader, textblob, *_ = sentiment.component_scores(document)
+    assert vader == sentiment.vader_score(document.cleaned) * document.latin_share
+    assert textblob == sentiment.textblob_score(document.cleaned) * document.latin_share
+    assert analyze(document.raw).language == "mixed"
+
+
+def test_profile_hooks_record_each_stage():
+    import sentiment
+
+    calls = []
+    hook = lambda stage, seconds: calls.append((stage, seconds))  # noqa: E731
+    configure_cache(enabled=False)
+    sentiment.add_profile_hook(hook)
+    try:
+        analyze("Great service today 😍 رائع")
+    finally:
+        sentiment.remove_profile_hook(hook)
+        configure_cache()
+    assert [stage for stage, _ in calls] == ["preprocess", "emoji", "keywords", "vader", "textblob"]
+    assert all(seconds >= 0 for _, seconds in calls)
+
+    calls.clear()
+    analyze_sentiment("No hooks, no timings")
+    assert calls == []
+
+
+def test_profile_stats_accumulate_and_profile_file(tmp_path):
+    import sentiment
+
+    sample = tmp_path / "sample.jsonl"
+    sample.write_text('{"text": "Love it 😍"}\n{"text": "يوم سيء"}\n\n{"text": "meh"}\n', encoding="utf-8")
+    try:
+        count, elapsed, stages = sentiment.profile_file(str(sample))
+        assert count == 3 and elapsed > 0
+        assert stages["preprocess"]["calls"] == 3
+        # The Arabic text skips the English scorers
+        assert stages["vader"]["calls"] == stages["textblob"]["calls"] == 2
+        assert sentiment.get_profile_stats() == {"enabled": False, "stages": stages}
+    finally:
+        sentiment.reset_profile()
+        configure_cache()
+
+
+def test_cascade_skips_english_scorers_for_clear_texts(monkeypatch):
+    import sentiment
+
+    clear = "great service 😍🥰 amazing and excellent value, fastest deal"
+    uncertain = "the update was fine I guess"
+    full_label = analyze_sentiment(clear)[0]
+    original = sentiment.CASCADE_BAND
+    calls = []
+    english_scores = sentiment.english_scores
+    monkeypatch.setattr(sentiment, "english_scores", lambda document: calls.append(document.raw) or english_scores(document))
+    sentiment.configure_cascade(True, band=0.1, audit_every=1)
+    try:
+        assert analyze_sentiment(clear)[0] == full_label
+        analyze_sentiment(uncertain)
+        labels, _ = analyze_sentiment_batch([clear + " !", uncertain + " ?"])
+        # Clear texts only run the English scorers for the audit
+        assert calls == [clear, uncertain, clear + " !", uncertain + " ?"]
+        stats = sentiment.get_cascade_stats()
+        assert stats["enabled"] and stats["band"] == 0.1
+        assert (stats["eligible"], stats["early_exits"], stats["audited"]) == (4, 2, 2)
+        assert stats["agreement_rate"] == 1.0
+    finally:
+        sentiment.configure_cascade(original is not None, original, 0)
+
+
+def test_cascade_records_skipped_english_scores_as_missing():
+    """Early exits report and store no VADER/TextBlob scores rather than zeros"""
+    import math
+
+    import models
+    import sentiment
+
+    text = "great great amazing 😍😍 best deal"
+    full = analyze(text)
+    original = sentiment.CASCADE_BAND
+    sentiment.configure_cascade(True, band=0.1)
+    try:
+        result = analyze(text)
+        assert result.components[:2] == (None, None) and result.components[2:] == full.components[2:]
+        assert result.as_tuple() == sentiment.combine_scores(0.0, 0.0, *full.components[2:])
+        labels, polarities, components = analyze_sentiment_batch([text + " !"], components=True)
+        assert math.isnan(components[0][0]) and math.isnan(components[0][1])
+        assert components[0][2] == full.components[2]
+        assert list(sentiment.analyze_stream([text + " ?"], components=True))[0][2][:2] == (None, None)
+    finally:
+        sentiment.configure_cascade(original is not None, original, 0)
+    comment = models.Comment()
+    comment.set_components(components[0])
+    assert (comment.vader_score, comment.textblob_score, comment.emoji_score) == (None, None, full.components[2])
+
+
+def test_cascade_uses_separate_cache_keys_and_evaluates():
+    import sentiment
+
+    plain_key = ScoreCache.key("great 😍")
+    try:
+        sentiment.configure_cascade(True, band=0.2)
+        assert ScoreCache.key("great 😍") != plain_key
+        result = sentiment.evaluate_cascade(SAMPLE_TEXTS + EMOJI_TEXTS + POLARITY_TEXTS, band=0.2)
+        assert result["texts"] > 0 and 0.0 <= result["early_exit_rate"] <= 1.0
+        assert 0.0 <= result["label_agreement"] <= 1.0
+        # The previous cascade settings are restored
+        assert sentiment.get_cascade_stats()["band"] == 0.2
+    finally:
+        sentiment.configure_cascade(False)
+    assert ScoreCache.key("great 😍") == plain_key
+
+
+def test_linear_model_trains_saves_and_scores(tmp_path):
+    import json
+
+    import linear_model
+    import sentiment
+
+    positive = ["great service, love it 😍", "amazing team and excellent support", "ممتاز جدا شكرا 👍"]
+    negative = ["terrible app, hate it 😡", "awful support, really disappointing", "خدمة سيئة ومخيب للأمل 💔"]
+    neutral = ["the store opens at nine", "new update released today", "الاجتماع يوم الاثنين"]
+    texts = (positive + negative + neutral) * 20
+    labels = (["positive"] * 3 + ["negative"] * 3 + ["neutral"] * 3) * 20
+    model = linear_model.train(texts, labels, feature_bits=12, epochs=10)
+    assert model.metadata["training_accuracy"] == 1.0
+    path = str(tmp_path / "model.npz")
+    model.save(path)
+
+    ensemble_key = ScoreCache.key("great service")
+    clear_cache()
+    try:
+        sentiment.set_scorer("linear", path)
+        assert ScoreCache.key("great service") != ensemble_key
+        result = analyze("great service, love it 😍")
+        assert result.label == "positive" and result.polarity > 0.05 and result.components is None
+        assert analyze("terrible app, hate it 😡").label == "negative"
+        probe = texts[:9] + ["", "unseen words only"]
+        expected = [analyze_sentiment(text) for text in probe]
+        clear_cache()
+        batch_labels, batch_polarities = analyze_sentiment_batch(probe)
+        assert list(zip(batch_labels.tolist(), batch_polarities.tolist())) == expected
+
+        # Emoji features depend on the emoji lexicon, so a reload changes the version and cache keys
+        with open(sentiment.BUNDLED_LEXICON_DATA, encoding="utf-8") as f:
+            data = json.load(f)
+        del data["emoji"]["😍"]
+        lexicon_path = tmp_path / "lexicons.json"
+        lexicon_path.write_text(json.dumps(data, ensure_ascii=False), encoding="utf-8")
+        linear_version, linear_key = sentiment.scorer_version(), ScoreCache.key("great service")
+        sentiment.reload_lexicons(str(lexicon_path))
+        assert sentiment.scorer_version() != linear_version and ScoreCache.key("great service") != linear_key
+        assert "😍" not in sentiment.preprocess("love it 😍").emojis
+    finally:
+        sentiment.reload_lexicons(sentiment.BUNDLED_LEXICON_DATA)
+        sentiment.set_scorer("ensemble")
+        clear_cache()
+    assert ScoreCache.key("great service") == ensemble_key
+    assert linear_model.load(path).n_features == 4096
+
+
+def test_linear_scorer_from_config_loads_at_import(tmp_path):
+    """SENTIMENT_CONFIG['scorer'] = 'linear' loads the model on import, or falls back to the ensemble"""
+    import os
+    import subprocess
+    import sys
+
+    import linear_model
+
+    model = linear_model.train(["great service 😍", "awful support 💔", "opens at nine"] * 5,
+                               ["positive", "negative", "neutral"] * 5, feature_bits=10, epochs=5)
+    model.save(str(tmp_path / "model.npz"))
+    repo = os.path.dirname(os.path.abspath(__file__))
+    script = "import sentiment; print(sentiment.SCORER, sentiment.scorer_version())"
+    for model_path, scorer in (("model.npz", "linear"), ("missing.npz", "ensemble")):
+        (tmp_path / "config.py").write_text(
+            f"SENTIMENT_CONFIG = {{'scorer': 'linear', 'linear_model_path': {model_path!r}}}\n", encoding="utf-8")
+        completed = subprocess.run([sys.executable, "-c", script], cwd=tmp_path, capture_output=True, text=True,
+                                   env={**os.environ, "PYTHONPATH": f"{tmp_path}{os.pathsep}{repo}"}, timeout=300)
+        assert completed.returncode == 0, completed.stderr
+        assert completed.stdout.splitlines()[-1].startswith(f"{scorer} ")
+
+
+def test_rescore_updates_stale_rows_and_overall_sentiment(tmp_path):
+    import sqlalchemy
+
+    import models
+    import rescore
+    from aggregation import aggregate_post
+    from sentiment import scorer_version
+
+    engine = sqlalchemy.create_engine(f"sqlite:///{tmp_path / 'app.db'}")
+    # A database from before scorer_version existed
+    with engine.begin() as connection:
+        connection.execute(sqlalchemy.text(
+            "CREATE TABLE post (id INTEGER PRIMARY KEY, post_id VARCHAR(100), caption TEXT, sentiment VARCHAR(20), "
+            "polarity FLOAT, hashtag VARCHAR(100), created_at DATETIME, source VARCHAR(20), media_url VARCHAR(500), "
+            "permalink VARCHAR(500), like_count INTEGER, comments_count INTEGER, video_url VARCHAR(500), "
+            "video_transcript TEXT, video_duration INTEGER, detected_language VARCHAR(10), tweet_text TEXT, "
+            "author_username VARCHAR(100), retweet_count INTEGER, reply_count INTEGER, overall_sentiment VARCHAR(20), "
+            "overall_polarity FLOAT)"))
+    models.db.metadata.create_all(engine)
+    models.add_missing_columns(engine)
+    posts, comments = models.Post.__table__, models.Comment.__table__
+    assert "scorer_version" in {column["name"] for column in sqlalchemy.inspect(engine).get_columns("post")}
+
+    with engine.begin() as connection:
+        connection.execute(posts.insert(), [
+            {"id": 1, "post_id": "a", "caption": "great service 😍", "sentiment": "neutral", "polarity": 0.0, "hashtag": "mtc"},
+            {"id": 2, "post_id": "b", "caption": "ignored", "tweet_text": "terrible app 😡", "source": "twitter",
+             "sentiment": "neutral", "polarity": 0.0, "hashtag": "mtc"},
+            {"id": 3, "post_id": "c", "caption": "fine", "sentiment": "neutral", "polarity": 0.0, "hashtag": "mtc",
+             "scorer_version": scorer_version()},
+        ])
+        connection.execute(comments.insert(), [
+            {"post_id": 1, "comment_text": text, "sentiment": "neutral", "polarity": 0.0}
+            for text in ("awful 😡", "really bad 💔", "love it 😍")
+        ])
+        connection.execute(posts.update().where(posts.c.id < 3).values(scorer_version=None))
+        # A tweet's overall also covers its replies, which are not stored as comments
+        connection.execute(posts.update().where(posts.c.id == 2).values(overall_sentiment="positive",
+                                                                         overall_polarity=0.6))
+        connection.execute(comments.update().values(scorer_version="0"))
+
+    assert rescore.rescore(engine, batch_size=2, checkpoint=2) == {"comments": 3, "posts": 2}
+    with engine.connect() as connection:
+        rows = {row.id: row for row in connection.execute(sqlalchemy.select(posts))}
+        comment_rows = connection.execute(sqlalchemy.select(comments).order_by(comments.c.id)).all()
+    assert [row.sentiment for row in comment_rows] == ["negative", "negative", "positive"]
+    assert (rows[1].sentiment, rows[1].overall_sentiment) == ("positive", "negative")
+    assert rows[1].overall_polarity == sum(row.polarity for row in comment_rows) / 3
+    assert (rows[2].sentiment, rows[2].overall_sentiment, rows[2].overall_polarity) == ("negative", "positive", 0.6)
+    # Rows already at the current version are left alone, and a second run has nothing to do
+    assert rows[3].sentiment == "neutral"
+    assert {row.scorer_version for row in rows.values()} == {scorer_version()}
+    assert rescore.rescore(engine) == {"comments": 0, "posts": 0}
+    assert aggregate_post(["neutral", "positive"], [0.0, 0.5]) == ("positive", 0.25)
+
+
+def test_reload_lexicons_swaps_bundles_atomically(tmp_path):
+    import json
+
+    import pytest
+
+    import sentiment
+
+    with open(sentiment.BUNDLED_LEXICON_DATA, encoding="utf-8") as f:
+        data = json.load(f)
+    data["version"] = "test"
+    data["negative"].append("laggy")
+    data["emoji"]["🐢"] = -0.5
+    path = tmp_path / "lexicons.json"
+    path.write_text(json.dumps(data, ensure_ascii=False), encoding="utf-8")
+
+    text = "so laggy 🐢"
+    old_version = sentiment.scorer_version()
+    assert sentiment.count_keywords(text) == (0, 0, 0)
+    assert sentiment.analyze_sentiment(text) == ("neutral", 0.0)
+    in_flight = sentiment.preprocess(text)
+    try:
+        previous, bundle = sentiment.reload_lexicons(str(path))
+        assert (previous.version, bundle.version) == ("1", "test")
+        assert sentiment.get_lexicons() is bundle and sentiment.scorer_version() != old_version
+        assert sentiment.count_keywords(text) == (0, 1, 0)
+        # A document preprocessed before the swap is scored with the old lexicons
+        assert sentiment.component_scores(in_flight)[2:] == (0.0, 0.0, 0)
+        # The cached neutral score is not served for the new lexicons
+        result = sentiment.analyze(text)
+        assert result.label == "negative" and not result.cached
+        labels, _ = sentiment.analyze_sentiment_batch([text])
+        assert labels.tolist() == ["negative"]
+
+        # An invalid file leaves the active bundle in place
+        path.write_text('{"positive": "not a list"}', encoding="utf-8")
+        with pytest.raises(ValueError):
+            sentiment.reload_lexicons(str(path))
+        # Emojis outside the recognised ranges could never match
+        for emoji_char in ("⌛", "‼", "😍😍", "x"):
+            path.write_text(json.dumps({**data, "emoji": {emoji_char: 0.5}}, ensure_ascii=False), encoding="utf-8")
+            with pytest.raises(ValueError, match="not single emoji clusters"):
+                sentiment.reload_lexicons(str(path))
+        assert sentiment.get_lexicons() is bundle
+    finally:
+        sentiment.reload_lexicons(sentiment.BUNDLED_LEXICON_DATA)
+    assert sentiment.scorer_version() == old_version
+    assert sentiment.analyze_sentiment(text) == ("neutral", 0.0)
+
+
+def test_changed_lexicon_file_is_reloaded_in_the_background(tmp_path, monkeypatch):
+    import json
+    import os
+    import threading
+
+    import sentiment
+
+    with open(sentiment.BUNDLED_LEXICON_DATA, encoding="utf-8") as f:
+        data = json.load(f)
+    path = tmp_path / "lexicons.json"
+    path.write_text(json.dumps(data, ensure_ascii=False), encoding="utf-8")
+    try:
+        sentiment.reload_lexicons(str(path))
+        data["version"] = "2"
+        data["positive"].append("snappy")
+        path.write_text(json.dumps(data, ensure_ascii=False), encoding="utf-8")
+        os.utime(path, ns=(0, 0))
+        monkeypatch.setattr(sentiment, "_lexicon_next_check", 0.0)
+        sentiment.analyze_sentiment("snappy")
+        for thread in threading.enumerate():
+            if thread.name == "lexicon-reload":
+                thread.join()
+        assert sentiment.get_lexicons().version == "2"
+        assert sentiment.count_keywords("snappy") == (1, 0, 0)
+    finally:
+        sentiment.reload_lexicons(sentiment.BUNDLED_LEXICON_DATA)
+
+
+def test_score_file_streams_records_with_component_scores(tmp_path):
+    import csv
+    import json
+
+    import sentiment
+
+    source = tmp_path / "captions.csv"
+    with open(source, "w", encoding="utf-8", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=["id", "caption"])
+        writer.writeheader()
+        writer.writerows({"id": i, "caption": text} for i, text in enumerate(SAMPLE_TEXTS + ["", "🙂"]))
+    output = tmp_path / "scored.jsonl"
+    result = sentiment.score_file(str(source), str(output), field="caption", workers=1, batch_size=3)
+
+    rows = [json.loads(line) for line in output.read_text(encoding="utf-8").splitlines()]
+    assert result["texts"] == len(rows) == len(SAMPLE_TEXTS) + 2
+    assert sum(result["labels"].values()) == len(rows)
+    for row in rows:
+        expected = analyze(row["caption"])
+        assert (row["id"], row["sentiment"], row["polarity"]) == (str(rows.index(row)), expected.label, expected.polarity)
+        assert row["confidence"] == expected.confidence
+        components = tuple(row[column] for column in sentiment.SCORE_COLUMNS[3:])
+        assert components == (expected.components or (None,) * 5)
+
+
+def test_score_file_rejects_non_object_lines_and_unknown_csv_columns(tmp_path):
+    import pytest
+
+    import sentiment
+
+    source = tmp_path / "captions.jsonl"
+    source.write_text('{"text": "great"}\n\n[1, 2]\n', encoding="utf-8")
+    with pytest.raises(ValueError, match=r"captions.jsonl:3: expected a JSON object"):
+        sentiment.score_file(str(source), str(tmp_path / "scored.jsonl"), workers=1)
+
+    source.write_text('{"text": "great"}\n{"text": "awful", "id": 7}\n', encoding="utf-8")
+    with pytest.raises(ValueError, match=r"Record 2 has fields the first record lacks \(id\)"):
+        sentiment.score_file(str(source), str(tmp_path / "scored.csv"), workers=1, batch_size=1)
+
+
+def test_score_cli_runs_a_pool_without_importing_the_app(tmp_path):
+    import json
+    import os
+    import subprocess
+    import sys
+
+    source = tmp_path / "captions.jsonl"
+    source.write_text("".join(json.dumps({"text": text}) + "\n" for text in SAMPLE_TEXTS * 20), encoding="utf-8")
+    output = tmp_path / "scored.csv"
+    script = (
+        "import sys, sentiment\n"
+        f"sentiment.main(['score', {str(source)!r}, {str(output)!r}, '--workers', '2', '--batch-size', '16'])\n"
+        "assert not {'flask', 'sqlalchemy', 'models', 'app'} & set(sys.modules), sorted(sys.modules)\n"
+    )
+    completed = subprocess.run([sys.executable, "-c", script], cwd=os.path.dirname(os.path.abspath(__file__)),
+                               capture_output=True, text=True, timeout=300)
+    assert completed.returncode == 0, completed.stderr
+    assert f"Scored {len(SAMPLE_TEXTS) * 20} texts" in completed.stdout
+    lines = output.read_text(encoding="utf-8").splitlines()
+    assert lines[0].startswith("text,sentiment,polarity,confidence,vader_score")
+    assert len(lines) == len(SAMPLE_TEXTS) * 20 + 1
+
+
+def test_aggregation_strategies_over_many_posts():
+    import random
+
+    import numpy as np
+    import pytest
+
+    from aggregation import aggregate, aggregate_post
+
+    rng = random.Random(3)
+    index = [rng.randrange(50) for _ in range(500)]
+    labels = [rng.choice(("positive", "negative", "neutral")) for _ in index]
+    polarities = [rng.uniform(-1, 1) for _ in index]
+    overall_labels, overall_polarities = aggregate(index, labels, polarities, 52, strategy="majority",
+                                                   fallback_labels=["neutral"] * 51 + ["negative"],
+                                                   fallback_polarities=[0.0] * 51 + [-0.5])
+    for post in range(50):
+        # The dict count the dashboard used to do for every post
+        counts = {"positive": 0, "negative": 0, "neutral": 0}
+        post_polarities = []
+        for group, label, polarity in zip(index, labels, polarities):
+            if group == post:
+                counts[label] += 1
+                post_polarities.append(polarity)
+        assert overall_labels[post] == max(counts, key=counts.get)
+        assert overall_polarities[post] == pytest.approx(sum(post_polarities) / len(post_polarities))
+    # Posts without comments keep their fallback
+    assert (overall_labels[51], overall_polarities[51]) == ("negative", -0.5)
+
+    assert aggregate_post(["positive", "negative", "negative"], [0.9, -0.1, -0.1], strategy="mean") == \
+        ("positive", pytest.approx(0.7 / 3))
+    # One well-liked comment outweighs two unliked ones
+    assert aggregate_post(["positive", "negative", "negative"], [0.5, -0.2, -0.2], strategy="engagement",
+                          engagement=[10, 0, 0])[0] == "positive"
+    assert aggregate_post(["positive", "negative", "negative"], [0.5, -0.2, -0.2])[0] == "negative"
+    assert aggregate_post([], [], fallback=("positive", 0.4)) == ("positive", 0.4)
+    assert isinstance(aggregate([], [], [], 3)[0], np.ndarray)
+    with pytest.raises(ValueError):
+        aggregate_post(["positive"], [0.5], strategy="median")
+
+
+def test_reweight_recombines_stored_components(tmp_path):
+    import sqlalchemy
+
+    import models
+    import rescore
+    import reweight
+    import numpy as np
+
+    from aggregation import aggregate_post
+    from sentiment import combine_score_arrays, combine_scores
+
+    engine = sqlalchemy.create_engine(f"sqlite:///{tmp_path / 'app.db'}")
+    models.db.metadata.create_all(engine)
+    posts, comments = models.Post.__table__, models.Comment.__table__
+    with engine.begin() as connection:
+        connection.execute(posts.insert(), [
+            {"id": 1, "post_id": "a", "caption": "great service 😍", "sentiment": "neutral", "polarity": 0.0, "hashtag": "mtc"},
+            {"id": 2, "post_id": "b", "caption": "ok I guess", "sentiment": "neutral", "polarity": 0.0, "hashtag": "mtc"},
+            {"id": 3, "post_id": "c", "caption": "great great amazing 😍😍 best deal", "source": "twitter",
+             "sentiment": "neutral", "polarity": 0.0, "hashtag": "mtc"},
+        ])
+        connection.execute(comments.insert(), [
+            {"post_id": 1, "comment_text": text, "sentiment": "neutral", "polarity": 0.0}
+            for text in ("awful 😡", "nice 🙂", "love it 😍")
+        ])
+        # The tweet's overall also covers its replies, which are not stored as comments
+        connection.execute(posts.update().where(posts.c.id == 3).values(overall_sentiment="negative",
+                                                                         overall_polarity=-0.4))
+    rescore.rescore(engine, force=True)
+    with engine.connect() as connection:
+        stored = connection.execute(sqlalchemy.select(comments).order_by(comments.c.id)).all()
+    result = analyze("awful 😡")
+    assert abs(stored[0].vader_score - result.components[0]) < 1e-6
+    assert combine_scores(*(getattr(stored[0], column) for column in models.COMPONENT_COLUMNS))[0] == "negative"
+
+    # The current weighting changes nothing
+    report = reweight.reweight(engine, apply=True)
+    assert report["written"] == 0 and report["comments"]["changed"] == 0
+    assert report["posts"]["overall_changed"] == 0
+
+    # Emoji-only weighting with a wide neutral band: a dry run reports, apply writes
+    weights = (0.0, 0.0, 1.0, 0.0)
+    report = reweight.reweight(engine, weights, threshold=0.6)
+    assert report["comments"]["rows"] == 3 and report["written"] == 0
+    with engine.connect() as connection:
+        assert connection.execute(sqlalchemy.select(comments.c.sentiment).where(comments.c.id == 2)).scalar() != "neutral"
+    report = reweight.reweight(engine, weights, threshold=0.6, apply=True)
+    assert report["written"] > 0
+    with engine.connect() as connection:
+        rows = connection.execute(sqlalchemy.select(comments).order_by(comments.c.id)).all()
+        post = connection.execute(sqlalchemy.select(posts).where(posts.c.id == 1)).one()
+    expected, _ = combine_score_arrays(*np.array([[getattr(row, column) for column in models.COMPONENT_COLUMNS]
+                                                  for row in stored]).T, weights=weights, threshold=0.6)
+    assert [row.sentiment for row in rows] == expected.tolist()
+    assert {row.scorer_version for row in rows} == {reweight.weighting_version(weights, 0.6, 0.1, 0.9)}
+    assert len(reweight.weighting_version(weights, 0.6, 0.1, 0.9)) <= comments.c.scorer_version.type.length
+    assert post.overall_sentiment == aggregate_post([row.sentiment for row in rows],
+                                                    [row.polarity for row in rows])[0]
+    assert reweight.reweight(engine, weights, threshold=0.6, apply=True)["written"] == 0
+    with engine.connect() as connection:
+        tweet = connection.execute(sqlalchemy.select(posts).where(posts.c.id == 3)).one()
+    assert (tweet.sentiment, tweet.overall_sentiment, tweet.overall_polarity) == ("positive", "negative", -0.4)
+
+
+def test_score_cache_lru_eviction_and_counters():
+    """Least recently used entries are evicted once max_size is reached"""
+    cache = ScoreCache(max_size=2)
+    first, second, third = (ScoreCache.key(text) for text in ("a", "b", "c"))
+    cache.put(first, ("positive", 0.5))
+    cache.put(second, ("negative", -0.5))
+    assert cache.get(first) == ("positive", 0.5)
+    cache.put(third, ("neutral", 0.0))
+    assert cache.get(second) is None
+    assert (cache.hits, cache.misses, cache.evictions) == (1, 1, 1)
+
+
+def test_score_cache_key_normalizes_whitespace():
+    assert ScoreCache.key("  Great post!\n") == ScoreCache.key("Great post!")
+    assert ScoreCache.key("Great post!") != ScoreCache.key("great post!")
+
+
+def test_analyze_sentiment_is_served_from_cache():
+    text = "Cached caption, great service! 👍"
+    first = analyze_sentiment(text)
+    hits = get_cache_stats()['hits']
+    assert analyze_sentiment(text) == first
+    assert get_cache_stats()['hits'] == hits + 1
+
+
+def test_disk_cache_skips_rescoring(tmp_path, monkeypatch):
+    """Scores found in the persistent cache are returned without running the scorers"""
+    import sentiment
+
+    text = "Fastest broadband in town, amazing service 🔥"
+    configure_disk_cache(str(tmp_path / "scores.sqlite3"))
+    try:
+        expected = analyze_sentiment(text)
+        clear_cache()
+
+        def fail(document):
+            raise AssertionError("scorers should not run on a cache hit")
+
+        monkeypatch.setattr(sentiment, "component_scores", fail)
+        assert analyze_sentiment(text) == expected
+        clear_cache()
+        labels, polarities = analyze_sentiment_batch([text])
+        assert (labels[0], polarities[0]) == expected
+    finally:
+        configure_disk_cache(None)
+
+
+def test_sentiment_pool_returns_results_in_input_order():
+    texts = [f"{text} #{i}" for i, text in enumerate(SAMPLE_TEXTS * 20)] + [None, ""]
+    with SentimentPool(workers=2, chunk_chars=200, min_parallel=0) as pool:
+        labels, polarities = pool.analyze(texts)
+    expected_labels, expected_polarities = analyze_sentiment_batch(texts)
+    assert labels.tolist() == expected_labels.tolist()
+    assert polarities.tolist() == expected_polarities.tolist()
+
+
+def test_sentiment_pool_chunks_by_text_length():
+    pool = SentimentPool(workers=2, chunk_chars=100, max_chunk_size=50)
+    short_chunks = pool.chunk(["ok"] * 200)
+    long_chunks = pool.chunk(["a much longer transcript " * 4] * 200)
+    assert len(long_chunks) > len(short_chunks)
+    assert short_chunks[0][0] == 0 and long_chunks[-1][1] == 200
+
+
+class _CountingTexts:
+    """Iterable of texts that records how many were pulled"""
+
+    def __init__(self, texts):
+        self.texts = texts
+        self.pulled = 0
+
+    def __iter__(self):
+        for text in self.texts:
+            self.pulled += 1
+            yield text
+
+
+def test_analyze_stream_matches_batch_in_order():
+    texts = [f"{text} {i}" for i, text in enumerate(SAMPLE_TEXTS * 5)] + [None, ""]
+    labels, polarities = analyze_sentiment_batch(texts)
+    expected = list(zip(labels.tolist(), polarities.tolist()))
+    assert list(analyze_stream(iter(texts), batch_size=7)) == expected
+    with SentimentPool(workers=2) as pool:
+        assert list(analyze_stream(iter(texts), batch_size=4, pool=pool, max_pending=3)) == expected
+
+
+def test_analyze_stream_bounds_texts_in_flight():
+    source = _CountingTexts([f"great text number {i} 👍" for i in range(200)])
+    for consumed, _ in enumerate(analyze_stream(source, batch_size=10), 1):
+        assert source.pulled - consumed < 10
+    assert source.pulled == 200
+
+    source = _CountingTexts([f"bad text number {i} 😡" for i in range(200)])
+    with SentimentPool(workers=2) as pool:
+        for consumed, _ in enumerate(analyze_stream(source, batch_size=10, pool=pool, max_pending=2), 1):
+            assert source.pulled - consumed < 2 * 10
+    assert source.pulled == 200
+
+
+def test_import_does_not_load_heavy_dependencies():
+    """NLTK, TextBlob, NumPy, arabic_reshaper and bidi load on first use only"""
+    import subprocess
+    import sys
+
+    code = (
+        "import sys, sentiment; "
+        "print(sorted(m for m in ('nltk', 'textblob', 'numpy', 'arabic_reshaper', 'bidi') if m in sys.modules))"
+    )
+    output = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True).stdout
+    assert output.strip() == "[]"
+
+
+POLARITY_TEXTS = [
+    "This product is really not very good at all!!",
+    "I absolutely love it :) best purchase ever",
+    "Terrible service, never again. The staff were rude.",
+    "It isn't bad, it's not a terrible idea... (!)",
+    "The U.S. office said \"great\" twice, e.g. at 3.5 p.m.",
+    "Well : - ) that was incredibly , surprisingly awful :'(",
+    "Honestly?! The worst. Ever.\n\nBut the new update is wonderful <3 xD",
+    "“Smart quotes” and ‘single ones’ don't change the sad ending",
+    "really really really happy!!! 😊 #happy @user http://example.com/good.html",
+    "meh",
+    "",
+]
+
+
+def test_pattern_polarity_matches_textblob():
+    """The native polarity scorer reproduces TextBlob's reference scores"""
+    from textblob import TextBlob
+
+    from pattern_polarity import polarity
+
+    texts = POLARITY_TEXTS + SAMPLE_TEXTS + EMOJI_TEXTS + [text.upper() for text in POLARITY_TEXTS]
+    for text in texts:
+        assert abs(polarity(text) - TextBlob(text).sentiment.polarity) <= 1e-12, text
+
+
+def test_textblob_score_uses_selected_scorer():
+    import sentiment
+
+    text = "not a very good day, but a great evening!"
+    original = sentiment.POLARITY_SCORER
+    try:
+        set_polarity_scorer('textblob')
+        reference = textblob_score(text)
+        set_polarity_scorer('pattern')
+        assert textblob_score(text) == reference
+    finally:
+        set_polarity_scorer(original)
+
+
+def test_compact_lexicon_matches_source_dict(tmp_path):
+    from lexicon_store import LexiconStore, build
+
+    lexicon = {"good": 1.9, "bad": -2.5, "naïve": 0.3, "ok": 0.0}
+    rows = {"well": (0.5, 1.0, 1.0), "badly": (-0.7, 1.0, 1.0)}
+    store = LexiconStore(build({"single": lexicon, "rows": rows}, str(tmp_path / "lexicons.bin")))
+    assert dict(store["single"]) == lexicon
+    assert dict(store["rows"]) == rows
+    assert "naïve" in store["single"] and "naive" not in store["single"]
+    assert store["single"].get("missing", -1) == -1 and store["single"].get(None) is None
+
+
+def test_shared_lexicons_give_identical_scores(tmp_path):
+    import sentiment
+    from sentiment import component_scores, configure_lexicon_store
+
+    texts = SAMPLE_TEXTS + EMOJI_TEXTS + POLARITY_TEXTS
+    original = sentiment.LEXICON_PATH
+    try:
+        expected = [component_scores(preprocess(text)) for text in texts]
+        configure_lexicon_store(str(tmp_path / "lexicons.bin"))
+        assert [component_scores(preprocess(text)) for text in texts] == expected
+        assert sentiment._get_lexicon_store() is not None
+    finally:
+        configure_lexicon_store(original)
+
+
+if __name__ == "__main__":
+    import pytest
+
+    raise SystemExit(pytest.main([__file__, "-q"]))